@@ -20,7 +20,13 @@ setup(
     author_email='tim@floorplanner.com',
     url='https://github.com/timknip/pyswf',
 
-    install_requires = ["lxml>=3.3.0", "Pillow>=2.3.0", "pylzma>=0.4.6", "six"],
+    install_requires = ["lxml>=3.3.0", "Pillow>=2.3.0", "six"],
+    extras_require = {
+        # LZMA ('ZWS') files use the stdlib lzma module on Python 3
+        ':python_version < "3.3"': ["pylzma>=0.4.6"],
+        # vectorised lossless bitmap decoding (swf.bitmap)
+        'numpy': ["numpy"],
+    },
     packages=find_packages(),
     license = "MIT",
     classifiers=[
@@ -0,0 +1,177 @@
+"""
+Asset fingerprints and a duplicate index across SWFs
+"""
+from __future__ import absolute_import
+import hashlib
+import sqlite3
+import struct
+from .stream import SWFMemoryStream, SWFWriter
+from .tag import DefinitionTag, TagDefineBits, TagDefineBitsLossless, TagDefineBinaryData, \
+    TagDefineFont, TagDefineVideoStream, TagFactory, TagJPEGTables, _has_character_id
+
+# definition tags that never hold the id of another character
+_WITHOUT_REFERENCES = (TagDefineBits, TagDefineBitsLossless, TagDefineBinaryData,
+    TagDefineFont, TagDefineVideoStream, TagJPEGTables)
+
+def asset_fingerprints(swf):
+    """
+    Return {characterId: fingerprint} for the definition tags of swf.
+
+    A fingerprint is the SHA-1 (hex) of the tag type and the tag content
+    without its own characterId, in which every id of another character
+    (a shape placed by a sprite, the font of a text, the bitmap of a
+    fill...) is replaced by the fingerprint of that character, in the
+    order the ids appear. Equal assets get equal fingerprints under
+    different characterIds, also when the characters they use are
+    numbered differently. DefineBits tags include the JPEGTables. The
+    content is read from the parsed bytes (see Tag.raw_bytes); modified
+    tags are encoded again.
+    """
+    tags = dict((t.characterId, t) for t in swf.tags
+                if isinstance(t, DefinitionTag) and t.characterId >= 0)
+    jpeg_tables = [t for t in swf.tags if isinstance(t, TagJPEGTables)]
+    fingerprints = {}
+
+    def fingerprint(character_id, pending):
+        if character_id in fingerprints:
+            return fingerprints[character_id]
+        tag = tags.get(character_id)
+        if tag is None or character_id in pending:
+            # imported, or part of a cycle
+            return 'missing'
+        pending.add(character_id)
+        h = hashlib.sha1(('%d\n' % tag.type).encode())
+        content = bytes(_content(tag))
+        pos = 2 if _has_character_id(type(tag)) else 0
+        for offset in _references(tag, content):
+            reference = struct.unpack('<H', content[offset:offset + 2])[0]
+            h.update(content[pos:offset])
+            h.update(('\n%s\n' % fingerprint(reference, pending)).encode())
+            pos = offset + 2
+        h.update(content[pos:])
+        if type(tag) == TagDefineBits and jpeg_tables:
+            h.update(_content(jpeg_tables[0]))
+        pending.discard(character_id)
+        fingerprints[character_id] = h.hexdigest()
+        return fingerprints[character_id]
+
+    for character_id in tags:
+        fingerprint(character_id, set())
+    return fingerprints
+
+def _content(tag):
+    """ The content bytes of tag (without the tag header) """
+    content = tag.raw_bytes(header=False)
+    if content is None:
+        writer = SWFWriter()
+        tag.publish(writer, tag.version)
+        content = writer.getvalue()
+    return content
+
+class _ReferenceStream(SWFMemoryStream):
+    """ Memory stream that records where ids of other characters are read """
+    def __init__(self, buf):
+        self.references = []
+        super(_ReferenceStream, self).__init__(buf)
+
+    def readCharacterId(self):
+        self.reset_bits_pending()
+        self.references.append(self.tell())
+        return self.readUI16()
+
+def _references(tag, content):
+    """
+    The offsets of the ids of other characters in content, the content
+    of tag, found by parsing it again (as the tag was parsed, with the
+    version of its class)
+    """
+    if isinstance(tag, _WITHOUT_REFERENCES):
+        return []
+    parsed = TagFactory.create(tag.type)
+    stream = _ReferenceStream(content)
+    parsed.parse(stream, len(content), parsed.version)
+    return stream.references
+
+class SWFAssetIndex(object):
+    """
+    Persistent index of the asset fingerprints of many SWFs (see
+    asset_fingerprints), kept in an SQLite database
+
+    Every asset is recorded with the name of the SWF it was found in and
+    its characterId there, so assets that were seen before (and e.g.
+    converted already) can be looked up by fingerprint. Several
+    processes can share one database.
+
+    @param path: the database file, created if missing.
+    """
+    def __init__(self, path):
+        self.path = path
+        self._db = sqlite3.connect(path, timeout=60)
+        with self._db:
+            self._db.execute(
+                'CREATE TABLE IF NOT EXISTS assets ('
+                'fingerprint TEXT NOT NULL, swf TEXT NOT NULL, '
+                'character_id INTEGER NOT NULL, tag_type INTEGER NOT NULL, '
+                'PRIMARY KEY (swf, character_id))')
+            self._db.execute(
+                'CREATE INDEX IF NOT EXISTS assets_fingerprint ON assets (fingerprint)')
+
+    def add(self, name, swf):
+        """
+        Record the assets of the SWF swf under name, replacing what was
+        recorded under name before. Returns {characterId: fingerprint}
+        of the assets that no other SWF in the index has.
+        """
+        fingerprints = swf.asset_fingerprints()
+        types = dict((t.characterId, t.type) for t in swf.tags
+                     if isinstance(t, DefinitionTag) and t.characterId in fingerprints)
+        new = {}
+        with self._db:
+            self._db.execute('DELETE FROM assets WHERE swf = ?', (name,))
+            for character_id, fingerprint in sorted(fingerprints.items()):
+                if fingerprint not in self and fingerprint not in new.values():
+                    new[character_id] = fingerprint
+            self._db.executemany('INSERT INTO assets VALUES (?, ?, ?, ?)',
+                [(fingerprint, name, character_id, types[character_id])
+                 for character_id, fingerprint in fingerprints.items()])
+        return new
+
+    def remove(self, name):
+        """ Forget the assets recorded under name """
+        with self._db:
+            self._db.execute('DELETE FROM assets WHERE swf = ?', (name,))
+
+    def lookup(self, fingerprint):
+        """ Return the (name, characterId) pairs recorded for fingerprint """
+        return self._db.execute(
+            'SELECT swf, character_id FROM assets WHERE fingerprint = ? '
+            'ORDER BY rowid', (fingerprint,)).fetchall()
+
+    def duplicates(self):
+        """
+        Generator for (fingerprint, [(name, characterId), ...]) of the
+        assets recorded more than once
+        """
+        rows = self._db.execute(
+            'SELECT fingerprint FROM assets GROUP BY fingerprint '
+            'HAVING COUNT(*) > 1 ORDER BY fingerprint').fetchall()
+        for (fingerprint,) in rows:
+            yield fingerprint, self.lookup(fingerprint)
+
+    def __contains__(self, fingerprint):
+        return self._db.execute('SELECT 1 FROM assets WHERE fingerprint = ? LIMIT 1',
+                                (fingerprint,)).fetchone() is not None
+
+    def __len__(self):
+        """ The number of distinct assets """
+        return self._db.execute('SELECT COUNT(DISTINCT fingerprint) FROM assets').fetchone()[0]
+
+    def close(self):
+        """ Closes the database """
+        self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
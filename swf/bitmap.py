@@ -0,0 +1,124 @@
+"""
+Lossless bitmap decoding
+
+Turns the inflated pixel data of DefineBitsLossless(2) tags into RGBA
+bytes. Uses NumPy when it is installed and falls back to bytearray
+slicing (which still works a row or a channel at a time) otherwise.
+"""
+from __future__ import absolute_import
+import struct
+from six.moves import range
+from .consts import BitmapFormat
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+def decode_lossless(data, bitmap_format, width, height, color_table_size=0, alpha=False):
+    """
+    Decode the inflated ZLIBBITMAPDATA of a lossless bitmap.
+
+    @param data: the inflated bytes (colormap and/or pixels).
+    @param bitmap_format: a BitmapFormat value.
+    @param color_table_size: BitmapColorTableSize (colormapped images only).
+    @param alpha: True for DefineBitsLossless2 (RGBA colormaps, ARGB pixels).
+    @return: width * height * 4 bytes of RGBA pixels.
+
+    Colormap indices beyond the colormap give transparent black.
+    """
+    if bitmap_format == BitmapFormat.BIT_8:
+        decode = _decode_colormapped
+    elif bitmap_format == BitmapFormat.BIT_15:
+        decode = _decode_pix15
+    elif bitmap_format == BitmapFormat.BIT_24:
+        decode = _decode_pix24
+    else:
+        raise Exception("unhandled bitmap format! %s %d" % (BitmapFormat.tostring(bitmap_format), bitmap_format))
+    if width == 0 or height == 0:
+        return b''
+    return decode(data, width, height, color_table_size, alpha)
+
+def _padded(row_bytes):
+    """ Rows are padded to a 32 bit boundary """
+    return (row_bytes + 3) & ~3
+
+def _colormap(data, color_table_size, alpha):
+    """ Return the colormap as 256 RGBA entries (bytes) and its size in data """
+    entry_size = 4 if alpha else 3
+    count = color_table_size + 1
+    size = count * entry_size
+    table = bytearray(data[:size])
+    if len(table) < size:
+        raise ValueError("colormap truncated")
+    if not alpha:
+        rgba = bytearray(count * 4)
+        rgba[0::4] = table[0::3]
+        rgba[1::4] = table[1::3]
+        rgba[2::4] = table[2::3]
+        rgba[3::4] = b'\xff' * count
+        table = rgba
+    table += bytearray(4 * (256 - count))
+    return bytes(table), size
+
+def _decode_colormapped(data, width, height, color_table_size, alpha):
+    table, offset = _colormap(data, color_table_size, alpha)
+    pitch = _padded(width)
+    if numpy is not None:
+        # one 32 bit lookup per pixel keeps the RGBA byte order
+        palette = numpy.frombuffer(table, numpy.uint32)
+        indices = numpy.frombuffer(data, numpy.uint8, pitch * height, offset)
+        return palette.take(indices.reshape(height, pitch)[:, :width]).tobytes()
+    view = memoryview(data)
+    if len(view) < offset + pitch * height:
+        raise ValueError("bitmap data truncated")
+    indices = b''.join([view[offset + y * pitch:offset + y * pitch + width].tobytes()
+                        for y in range(height)])
+    out = bytearray(width * height * 4)
+    for channel in range(4):
+        out[channel::4] = indices.translate(table[channel::4])
+    return bytes(out)
+
+def _decode_pix15(data, width, height, color_table_size, alpha):
+    # PIX15: UB[1] reserved, UB[5] red, UB[5] green, UB[5] blue
+    pitch = _padded(width * 2)
+    if numpy is not None:
+        rows = numpy.frombuffer(data, '>u2', pitch * height // 2).reshape(height, pitch // 2)
+        pixels = rows[:, :width].astype(numpy.uint16)
+        out = numpy.empty((height, width, 4), numpy.uint8)
+        for channel, shift in enumerate((10, 5, 0)):
+            c = (pixels >> shift) & 0x1f
+            out[:, :, channel] = (c << 3) | (c >> 2)
+        out[:, :, 3] = 0xff
+        return out.tobytes()
+    view = memoryview(data)
+    if len(view) < pitch * height:
+        raise ValueError("bitmap data truncated")
+    # 5 to 8 bit channel values
+    scale = [(c << 3) | (c >> 2) for c in range(32)]
+    row_format = struct.Struct('>%dH' % width)
+    out = bytearray()
+    for y in range(height):
+        for v in row_format.unpack_from(view, y * pitch):
+            out += bytearray((scale[(v >> 10) & 0x1f], scale[(v >> 5) & 0x1f], scale[v & 0x1f], 0xff))
+    return bytes(out)
+
+def _decode_pix24(data, width, height, color_table_size, alpha):
+    # PIX24: UI8 reserved, red, green, blue; ARGB for DefineBitsLossless2.
+    # 4 bytes per pixel, so rows need no padding.
+    count = width * height
+    if numpy is not None:
+        pixels = numpy.frombuffer(data, numpy.uint8, count * 4).reshape(count, 4)
+        out = pixels[:, (1, 2, 3, 0)].copy()
+        if not alpha:
+            out[:, 3] = 0xff
+        return out.tobytes()
+    pixels = bytearray(data[:count * 4])
+    if len(pixels) < count * 4:
+        raise ValueError("bitmap data truncated")
+    out = bytearray(count * 4)
+    out[0::4] = pixels[1::4]
+    out[1::4] = pixels[2::4]
+    out[2::4] = pixels[3::4]
+    out[3::4] = pixels[0::4] if alpha else b'\xff' * count
+    return bytes(out)
@@ -0,0 +1,441 @@
+"""
+On-disk cache of parsed SWFs
+"""
+from __future__ import absolute_import
+import array
+import hashlib
+import importlib
+import os
+import struct
+import sys
+import tempfile
+import zlib
+from io import BytesIO
+from six import PY2, integer_types, text_type
+from . import __version__
+
+_MAGIC = b'PYSWFC2\n'
+_replace = getattr(os, 'replace', os.rename)
+
+class SWFCache(object):
+    """
+    Cache of parsed SWFs (header and tag tree) in a directory
+
+    Entries are keyed by the SHA-1 of the SWF file bytes, the pyswf
+    version and the parse options, and stored zlib compressed in a
+    data-only format (see _Encoder): loading an entry only creates
+    builtin values and instances of the pyswf tag and data classes and
+    sets their attributes, it doesn't run any code from the entry.
+    Writes go to a temporary file that is renamed into place, so several
+    processes can share one directory: readers see either a complete
+    entry or none. Hits touch the entry, and once the directory grows
+    beyond max_size bytes the least recently used entries are removed.
+
+    @param directory: the cache directory, created if missing.
+    @param max_size: size limit of all entries together, in bytes.
+    """
+    SUFFIX = '.swfc'
+
+    def __init__(self, directory, max_size=512 * 1024 * 1024):
+        self.directory = directory
+        self.max_size = max_size
+        if not os.path.isdir(directory):
+            try:
+                os.makedirs(directory)
+            except OSError:
+                # created concurrently
+                if not os.path.isdir(directory):
+                    raise
+
+    def key(self, f, options=None):
+        """
+        Return the cache key for the SWF in f, a file object or SWFStream
+        (read from its current position to the end; the position is
+        restored), parsed with options, a dict of parse options.
+        """
+        h = hashlib.sha1()
+        h.update(('pyswf %s\n' % __version__).encode())
+        for name in sorted(options or ()):
+            h.update(('%s=%s\n' % (name, _option_repr(options[name]))).encode())
+        pos = f.tell()
+        while True:
+            chunk = f.read(1024 * 1024)
+            if not chunk:
+                break
+            h.update(chunk)
+        f.seek(pos)
+        return h.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + self.SUFFIX)
+
+    def get(self, key):
+        """ Return the cached (header, tags) for key, or None """
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                raw = f.read()
+        except (IOError, OSError):
+            return None
+        try:
+            if not raw.startswith(_MAGIC):
+                raise ValueError("not a pyswf cache entry")
+            value = _decode(zlib.decompress(raw[len(_MAGIC):]))
+        except Exception:
+            # unreadable entry (e.g. from an incompatible version)
+            self._remove(path)
+            return None
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+        return value
+
+    def put(self, key, header, tags):
+        """
+        Store the parsed header and tags under key. Nothing is stored if
+        they hold values the entry format has no encoding for.
+        """
+        encoder = _Encoder()
+        try:
+            encoder.encode((header, tags))
+        except TypeError:
+            return
+        raw = _MAGIC + zlib.compress(encoder.getvalue())
+        fd, temp_path = tempfile.mkstemp(suffix='.tmp', dir=self.directory)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(raw)
+            _replace(temp_path, self._path(key))
+        except Exception:
+            self._remove(temp_path)
+            raise
+        self.evict()
+
+    def evict(self):
+        """ Remove least recently used entries until max_size is respected """
+        entries = []
+        total = 0
+        for name in os.listdir(self.directory):
+            if not name.endswith(self.SUFFIX):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+            total += st.st_size
+        entries.sort()
+        for mtime, size, path in entries:
+            if total <= self.max_size:
+                break
+            self._remove(path)
+            total -= size
+
+    def clear(self):
+        """ Remove all entries """
+        for name in os.listdir(self.directory):
+            if name.endswith(self.SUFFIX):
+                self._remove(os.path.join(self.directory, name))
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+def _option_repr(value):
+    """ Stable text for parse option values (tag classes by name) """
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return '(%s)' % ','.join(sorted(_option_repr(v) for v in value))
+    if isinstance(value, type):
+        return '%s.%s' % (value.__module__, value.__name__)
+    return repr(value)
+
+# the value codes of the entry format
+(_NONE, _TRUE, _FALSE, _INT, _FLOAT, _BYTES, _STR, _STR_REF, _LIST, _TUPLE,
+ _DICT, _SET, _FROZENSET, _BYTEARRAY, _ARRAY, _BYTESIO, _OBJECT, _CLASS,
+ _REF) = range(19)
+
+_DOUBLE = struct.Struct('<d')
+
+def _allowed_bases():
+    """ The classes whose (pyswf) subclasses entries can hold """
+    from .actions import Action
+    from .data import _dumb_repr
+    from .filters import Filter
+    from .movie import SWFHeader
+    from .tag import Tag
+    return (Tag, _dumb_repr, Filter, Action, SWFHeader)
+
+def _slot_names(cls):
+    return frozenset(name for c in cls.__mro__ for name in c.__dict__.get('__slots__', ()))
+
+class _Encoder(object):
+    """
+    Writes a value in the entry format: a type code, then the value.
+
+    Numbers are (zigzag) varints or doubles, strings and bytes are
+    length prefixed, strings seen before are written as their index.
+    Containers and objects seen before are written as a reference to
+    the index they got when first written, so shared and cyclic
+    structures are kept. Objects are written as their class (module and
+    name, the first time) and their attributes as a dict: the state
+    of tags (see Tag.__getstate__), the attributes of data classes.
+    Only the classes of _allowed_bases can be written.
+    """
+    def __init__(self):
+        self._out = []
+        self._strings = {}
+        self._classes = {}
+        self._memo = {}
+        # the memoised values, so their ids stay unique
+        self._keep = []
+        self._bases = _allowed_bases()
+
+    def getvalue(self):
+        return b''.join(self._out)
+
+    def _uint(self, value):
+        out = bytearray()
+        while value > 0x7f:
+            out.append((value & 0x7f) | 0x80)
+            value >>= 7
+        out.append(value)
+        self._out.append(bytes(out))
+
+    def _code(self, code):
+        self._out.append(struct.pack('B', code))
+
+    def _remember(self, value):
+        """ Returns True (after writing a reference) if value was written before """
+        index = self._memo.get(id(value))
+        if index is not None:
+            self._code(_REF)
+            self._uint(index)
+            return True
+        self._memo[id(value)] = len(self._keep)
+        self._keep.append(value)
+        return False
+
+    def _class(self, cls):
+        if not (isinstance(cls, type) and issubclass(cls, self._bases)):
+            raise TypeError("can't cache instances of %r" % (cls,))
+        index = self._classes.get(cls)
+        if index is None:
+            self._classes[cls] = len(self._classes)
+            self._uint(0)
+            self._string(cls.__module__)
+            self._string(cls.__name__)
+        else:
+            self._uint(index + 1)
+
+    def _string(self, value):
+        index = self._strings.get(value)
+        if index is not None:
+            self._code(_STR_REF)
+            self._uint(index)
+            return
+        self._strings[value] = len(self._strings)
+        data = value.encode('utf-8')
+        self._code(_STR)
+        self._uint(len(data))
+        self._out.append(data)
+
+    def encode(self, value):
+        if value is None:
+            self._code(_NONE)
+        elif value is True:
+            self._code(_TRUE)
+        elif value is False:
+            self._code(_FALSE)
+        elif isinstance(value, integer_types):
+            self._code(_INT)
+            self._uint(value << 1 if value >= 0 else ((-value) << 1) - 1)
+        elif isinstance(value, float):
+            self._code(_FLOAT)
+            self._out.append(_DOUBLE.pack(value))
+        elif isinstance(value, text_type):
+            self._string(value)
+        elif isinstance(value, (bytes, memoryview)):
+            value = bytes(value)
+            self._code(_BYTES)
+            self._uint(len(value))
+            self._out.append(value)
+        elif isinstance(value, (list, tuple, set, frozenset, dict)):
+            if self._remember(value):
+                return
+            self._code({list: _LIST, tuple: _TUPLE, set: _SET, frozenset: _FROZENSET,
+                        dict: _DICT}[type(value)])
+            self._uint(len(value))
+            if isinstance(value, dict):
+                for k, v in value.items():
+                    self.encode(k)
+                    self.encode(v)
+            else:
+                for item in value:
+                    self.encode(item)
+        elif isinstance(value, bytearray):
+            self._code(_BYTEARRAY)
+            self._uint(len(value))
+            self._out.append(bytes(value))
+        elif isinstance(value, array.array):
+            data = value.tostring() if PY2 else value.tobytes()
+            self._code(_ARRAY)
+            self._string(value.typecode)
+            self._uint(len(data))
+            self._out.append(data)
+        elif isinstance(value, BytesIO):
+            data = value.getvalue()
+            self._code(_BYTESIO)
+            self._uint(len(data))
+            self._out.append(data)
+        elif isinstance(value, type):
+            self._code(_CLASS)
+            self._class(value)
+        else:
+            cls = type(value)
+            if self._remember(value):
+                return
+            self._code(_OBJECT)
+            self._class(cls)
+            if hasattr(value, '_attributes'):
+                state = value._attributes()
+            elif isinstance(value, self._bases[0]):
+                # tags leave out what can't be stored
+                state = value.__getstate__()
+            else:
+                state = dict(value.__dict__)
+            self.encode(state)
+
+def _decode(data):
+    """ Returns the value written by _Encoder to data """
+    view = memoryview(data)
+    pos = [0]
+    strings = []
+    classes = []
+    memo = []
+    bases = _allowed_bases()
+    slots = {}
+
+    def uint():
+        value = shift = 0
+        i = pos[0]
+        while True:
+            b = view[i]
+            if PY2:
+                b = ord(b)
+            i += 1
+            value |= (b & 0x7f) << shift
+            if b < 0x80:
+                break
+            shift += 7
+        pos[0] = i
+        return value
+
+    def chunk():
+        n = uint()
+        start = pos[0]
+        if start + n > len(view):
+            raise ValueError("truncated cache entry")
+        pos[0] = start + n
+        return view[start:start + n].tobytes()
+
+    def read_class():
+        index = uint()
+        if index > 0:
+            return classes[index - 1]
+        module = decode()
+        name = decode()
+        if not (module == 'swf' or module.startswith('swf.')):
+            raise ValueError("class %s.%s is not a pyswf class" % (module, name))
+        cls = getattr(sys.modules.get(module) or importlib.import_module(module), name)
+        if not (isinstance(cls, type) and issubclass(cls, bases)):
+            raise ValueError("class %s.%s can't be cached" % (module, name))
+        classes.append(cls)
+        return cls
+
+    def decode():
+        code = view[pos[0]]
+        if PY2:
+            code = ord(code)
+        pos[0] += 1
+        if code == _NONE:
+            return None
+        if code == _TRUE:
+            return True
+        if code == _FALSE:
+            return False
+        if code == _INT:
+            value = uint()
+            return -((value + 1) >> 1) if value & 1 else value >> 1
+        if code == _FLOAT:
+            value = _DOUBLE.unpack_from(view, pos[0])[0]
+            pos[0] += 8
+            return value
+        if code == _STR:
+            value = chunk().decode('utf-8')
+            strings.append(value)
+            return value
+        if code == _STR_REF:
+            return strings[uint()]
+        if code == _BYTES:
+            return chunk()
+        if code == _REF:
+            return memo[uint()]
+        if code in (_LIST, _DICT, _SET):
+            value = {_LIST: list, _DICT: dict, _SET: set}[code]()
+            memo.append(value)
+            n = uint()
+            if code == _DICT:
+                for i in range(n):
+                    k = decode()
+                    value[k] = decode()
+            elif code == _LIST:
+                for i in range(n):
+                    value.append(decode())
+            else:
+                for i in range(n):
+                    value.add(decode())
+            return value
+        if code in (_TUPLE, _FROZENSET):
+            index = len(memo)
+            memo.append(None)
+            n = uint()
+            items = [decode() for i in range(n)]
+            memo[index] = value = tuple(items) if code == _TUPLE else frozenset(items)
+            return value
+        if code == _BYTEARRAY:
+            return bytearray(chunk())
+        if code == _ARRAY:
+            value = array.array(str(decode()))
+            data = chunk()
+            value.fromstring(data) if PY2 else value.frombytes(data)
+            return value
+        if code == _BYTESIO:
+            return BytesIO(chunk())
+        if code == _CLASS:
+            return read_class()
+        if code == _OBJECT:
+            cls = read_class()
+            value = cls.__new__(cls)
+            memo.append(value)
+            state = decode()
+            if not isinstance(state, dict):
+                raise ValueError("bad object state")
+            names = slots.get(cls)
+            if names is None:
+                names = slots[cls] = _slot_names(cls)
+            for k, v in state.items():
+                if k in names:
+                    object.__setattr__(value, k, v)
+                else:
+                    value.__dict__[k] = v
+            return value
+        raise ValueError("bad value code %d" % code)
+
+    value = decode()
+    if pos[0] != len(view):
+        raise ValueError("trailing bytes in cache entry")
+    return value
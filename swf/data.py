@@ -1,14 +1,33 @@
 from __future__ import absolute_import
 from .consts import *
 from .utils import *
+from array import array
 from six.moves import map
 from six.moves import range
 
 class _dumb_repr(object):
+    """
+    Base of the data classes. They declare their attributes in
+    __slots__, so instances have no __dict__ of their own.
+    """
+    __slots__ = ()
+
+    def _attributes(self):
+        """ Returns the attributes that are set as a dict, base class slots first """
+        attributes = {}
+        for cls in reversed(type(self).__mro__):
+            for name in cls.__dict__.get('__slots__', ()):
+                if not name.startswith('__') and hasattr(self, name):
+                    attributes[name] = getattr(self, name)
+        attributes.update(getattr(self, '__dict__', {}))
+        return attributes
+
     def __repr__(self):
-        return '<%s %r>' % (self.__class__.__name__, self.__dict__)
+        return '<%s %r>' % (self.__class__.__name__, self._attributes())
 
 class SWFRawTag(_dumb_repr):
+    __slots__ = ('header', 'pos_content')
+
     def __init__(self, s=None):
         if not s is None:
             self.parse(s)
@@ -17,11 +36,18 @@ class SWFRawTag(_dumb_repr):
         pos = s.tell()
         self.header = s.readtag_header()
         self.pos_content = s.tell()
-        s.f.seek(pos)
-        #self.bytes = s.f.read(self.header.tag_length())
-        #s.f.seek(self.pos_content)
+        s.seek(pos)
+
+    def write(self, data):
+        """ Copies this tag from data.source, the stream it was read from """
+        if data.source is None:
+            raise ValueError("raw tags can only be copied from the stream they were read from")
+        data.write(data.source.read_at(self.pos_content - self.header.header_length,
+                                       self.header.tag_length))
 
 class SWFStraightEdge(_dumb_repr):
+    __slots__ = ('start', 'to', 'line_style_idx', 'fill_style_idx')
+
     def __init__(self, start, to, line_style_idx, fill_style_idx):
         self.start = start
         self.to = to
@@ -32,6 +58,8 @@ class SWFStraightEdge(_dumb_repr):
         return SWFStraightEdge(self.to, self.start, self.line_style_idx, new_fill_idx)
 
 class SWFCurvedEdge(SWFStraightEdge):
+    __slots__ = ('control',)
+
     def __init__(self, start, control, to, line_style_idx, fill_style_idx):
         super(SWFCurvedEdge, self).__init__(start, to, line_style_idx, fill_style_idx)
         self.control = control
@@ -39,9 +67,46 @@ class SWFCurvedEdge(SWFStraightEdge):
     def reverse_with_new_fillstyle(self, new_fill_idx):
         return SWFCurvedEdge(self.to, self.control, self.start, self.line_style_idx, new_fill_idx)
 
+# flags of straight edge records in SWFShape._record_flags
+_GENERAL_LINE = 1
+_VERT_LINE = 2
+
 class SWFShape(_dumb_repr):
+    """
+    A shape: its styles and shape records.
+
+    The records are stored in columns rather than as one object each.
+    _record_types holds the SWFShapeRecord type of every record, and
+    _record_bits, _record_flags, _record_x, _record_y, _record_cx and
+    _record_cy hold, per record:
+
+    - straight edges: NumBits, _GENERAL_LINE/_VERT_LINE, DeltaX/DeltaY
+    - curved edges: NumBits, anchor delta (x, y), control delta (cx, cy)
+    - style changes: the state flags and the move delta; the record
+      objects themselves are kept in _style_changes by record index.
+
+    The records property gives the usual list of record objects. It is
+    created on first access and kept in _records; changes made to it are
+    written back into the columns (_store_records) before the edges are
+    built.
+    """
+    __slots__ = ('_record_types', '_record_bits', '_record_flags',
+                 '_record_x', '_record_y', '_record_cx', '_record_cy',
+                 '_style_changes', '_records', '_fillStyles', '_lineStyles',
+                 '_postLineStyles', '_edgeMapsCreated', 'unit_divisor',
+                 'fill_edge_maps', 'line_edge_maps', 'current_fill_edge_map',
+                 'current_line_edge_map', 'num_groups')
+
     def __init__(self, data=None, level=1, unit_divisor=20.0):
-        self._records = []
+        self._record_types = array('B')
+        self._record_bits = array('B')
+        self._record_flags = array('B')
+        self._record_x = array('i')
+        self._record_y = array('i')
+        self._record_cx = array('i')
+        self._record_cy = array('i')
+        self._style_changes = {}
+        self._records = None
         self._fillStyles = []
         self._lineStyles = []
         self._postLineStyles = {}
@@ -52,7 +117,6 @@ class SWFShape(_dumb_repr):
         self.current_fill_edge_map = {}
         self.current_line_edge_map = {}
         self.num_groups = 0
-        self.coord_map = {}
         if not data is None:
             self.parse(data, level)
 
@@ -84,12 +148,87 @@ class SWFShape(_dumb_repr):
 
     @property
     def records(self):
+        if self._records is None:
+            self._records = [self.record(i) for i in range(len(self._record_types))]
         return self._records
 
+    def record(self, index):
+        """ Return the shape record at index as a SWFShapeRecord object """
+        if self._records is not None:
+            return self._records[index]
+        record_type = self._record_types[index]
+        if record_type == SWFShapeRecord.TYPE_STYLECHANGE:
+            return self._style_changes[index]
+        if record_type == SWFShapeRecord.TYPE_STRAIGHTEDGE:
+            record = SWFShapeRecordStraightEdge(None, self._record_bits[index])
+            flags = self._record_flags[index]
+            record.general_line_flag = (flags & _GENERAL_LINE) != 0
+            record.vert_line_flag = (flags & _VERT_LINE) != 0
+            if record.general_line_flag:
+                record.deltaX = self._record_x[index]
+                record.deltaY = self._record_y[index]
+            elif record.vert_line_flag:
+                record.deltaX = 0.0
+                record.deltaY = self._record_y[index]
+            else:
+                record.deltaX = self._record_x[index]
+                record.deltaY = 0.0
+        elif record_type == SWFShapeRecord.TYPE_CURVEDEDGE:
+            record = SWFShapeRecordCurvedEdge(None, self._record_bits[index])
+            record.control_deltaX = self._record_cx[index]
+            record.control_deltaY = self._record_cy[index]
+            record.anchor_deltaX = self._record_x[index]
+            record.anchor_deltaY = self._record_y[index]
+        else:
+            record = SWFShapeRecordEnd()
+        record.record_id = index
+        return record
+
+    def _append_record(self, record_type, bits=0, flags=0, x=0, y=0, cx=0, cy=0):
+        self._record_types.append(record_type)
+        self._record_bits.append(bits)
+        self._record_flags.append(flags)
+        self._record_x.append(x)
+        self._record_y.append(y)
+        self._record_cx.append(cx)
+        self._record_cy.append(cy)
+
+    def _store_records(self):
+        """ Write the record objects of the records list back into the columns """
+        records, self._records = self._records, None
+        for column in (self._record_types, self._record_bits, self._record_flags,
+                       self._record_x, self._record_y, self._record_cx, self._record_cy):
+            del column[:]
+        self._style_changes = {}
+        append = self._append_record
+        for i, record in enumerate(records):
+            record.record_id = i
+            record_type = record.type
+            if record_type == SWFShapeRecord.TYPE_STYLECHANGE:
+                self._style_changes[i] = record
+                states = (record.state_new_styles << 4) | (record.state_line_style << 3) | \
+                         (record.state_fill_style1 << 2) | (record.state_fill_style0 << 1) | \
+                         int(record.state_moveto)
+                append(record_type, 0, states, int(record.move_deltaX), int(record.move_deltaY))
+            elif record_type == SWFShapeRecord.TYPE_STRAIGHTEDGE:
+                if record.general_line_flag:
+                    append(record_type, record.num_bits, _GENERAL_LINE,
+                           int(record.deltaX), int(record.deltaY))
+                elif record.vert_line_flag:
+                    append(record_type, record.num_bits, _VERT_LINE, 0, int(record.deltaY))
+                else:
+                    append(record_type, record.num_bits, 0, int(record.deltaX), 0)
+            elif record_type == SWFShapeRecord.TYPE_CURVEDEDGE:
+                append(record_type, record.num_bits, 0,
+                       int(record.anchor_deltaX), int(record.anchor_deltaY),
+                       int(record.control_deltaX), int(record.control_deltaY))
+            else:
+                append(SWFShapeRecord.TYPE_END)
+        self._records = records
+
     def read_shape_records(self, data, fill_bits, line_bits, level=1):
-        shape_record = None
-        record_id = 0
-        while type(shape_record) != SWFShapeRecordEnd:
+        append = self._append_record
+        while True:
             # The SWF10 spec says that shape records are byte aligned.
             # In reality they seem not to be?
             # bitsPending = 0;
@@ -98,27 +237,35 @@ class SWFShape(_dumb_repr):
                 straight_flag = (data.readUB(1) == 1)
                 num_bits = data.readUB(4) + 2
                 if straight_flag:
-                    shape_record = data.readSTRAIGHTEDGERECORD(num_bits)
+                    if data.readUB(1) == 1:
+                        x, y = data.read_bitfields((num_bits, num_bits), signed=True)
+                        append(SWFShapeRecord.TYPE_STRAIGHTEDGE, num_bits, _GENERAL_LINE, x, y)
+                    elif data.readUB(1) == 1:
+                        append(SWFShapeRecord.TYPE_STRAIGHTEDGE, num_bits, _VERT_LINE, 0, data.readSB(num_bits))
+                    else:
+                        append(SWFShapeRecord.TYPE_STRAIGHTEDGE, num_bits, 0, data.readSB(num_bits), 0)
                 else:
-                    shape_record = data.readCURVEDEDGERECORD(num_bits)
+                    cx, cy, x, y = data.read_bitfields((num_bits, num_bits, num_bits, num_bits), signed=True)
+                    append(SWFShapeRecord.TYPE_CURVEDEDGE, num_bits, 0, x, y, cx, cy)
             else:
                 states= data.readUB(5)
                 if states == 0:
-                    shape_record = SWFShapeRecordEnd()
-                else:
-                    style_change_record = data.readSTYLECHANGERECORD(states, fill_bits, line_bits, level)
-                    if style_change_record.state_new_styles:
-                        fill_bits = style_change_record.num_fillbits
-                        line_bits = style_change_record.num_linebits
-                    shape_record = style_change_record
-            shape_record.record_id = record_id
-            self._records.append(shape_record)
-            record_id += 1
-            #print shape_record.tostring()
+                    append(SWFShapeRecord.TYPE_END)
+                    break
+                style_change_record = data.readSTYLECHANGERECORD(states, fill_bits, line_bits, level)
+                if style_change_record.state_new_styles:
+                    fill_bits = style_change_record.num_fillbits
+                    line_bits = style_change_record.num_linebits
+                style_change_record.record_id = len(self._record_types)
+                self._style_changes[style_change_record.record_id] = style_change_record
+                append(SWFShapeRecord.TYPE_STYLECHANGE, 0, states,
+                       int(style_change_record.move_deltaX), int(style_change_record.move_deltaY))
 
     def _create_edge_maps(self):
         if self._edgeMapsCreated:
             return
+        if self._records is not None:
+            self._store_records()
         xPos = 0
         yPos = 0
         sub_path = []
@@ -134,9 +281,13 @@ class SWFShape(_dumb_repr):
         self.current_line_edge_map = {}
         self.num_groups = 0
 
-        for i in range(0, len(self._records)):
-            rec = self._records[i]
-            if rec.type == SWFShapeRecord.TYPE_STYLECHANGE:
+        types = self._record_types
+        record_x = self._record_x
+        record_y = self._record_y
+        for i in range(0, len(types)):
+            record_type = types[i]
+            if record_type == SWFShapeRecord.TYPE_STYLECHANGE:
+                rec = self._style_changes[i]
                 if rec.state_line_style or rec.state_fill_style0 or rec.state_fill_style1:
                     if len(sub_path):
                         self._process_sub_path(sub_path, curr_ls_idx, curr_fs_idx0, curr_fs_idx1, rec.record_id)
@@ -178,31 +329,26 @@ class SWFShape(_dumb_repr):
                 if rec.state_moveto:
                     xPos = rec.move_deltaX
                     yPos = rec.move_deltaY
-            elif rec.type == SWFShapeRecord.TYPE_STRAIGHTEDGE:
+            elif record_type == SWFShapeRecord.TYPE_STRAIGHTEDGE:
                 start = [NumberUtils.round_pixels_400(xPos), NumberUtils.round_pixels_400(yPos)]
-                if rec.general_line_flag:
-                    xPos += rec.deltaX
-                    yPos += rec.deltaY
-                else:
-                    if rec.vert_line_flag:
-                        yPos += rec.deltaY
-                    else:
-                        xPos += rec.deltaX
+                # deltas of horizontal and vertical lines are stored as 0
+                xPos += record_x[i]
+                yPos += record_y[i]
                 to = [NumberUtils.round_pixels_400(xPos), NumberUtils.round_pixels_400(yPos)]
                 sub_path.append(SWFStraightEdge(start, to, curr_ls_idx, curr_fs_idx1))
-            elif rec.type == SWFShapeRecord.TYPE_CURVEDEDGE:
+            elif record_type == SWFShapeRecord.TYPE_CURVEDEDGE:
                 start = [NumberUtils.round_pixels_400(xPos), NumberUtils.round_pixels_400(yPos)]
-                xPosControl = xPos + rec.control_deltaX
-                yPosControl = yPos + rec.control_deltaY
-                xPos = xPosControl + rec.anchor_deltaX
-                yPos = yPosControl + rec.anchor_deltaY
+                xPosControl = xPos + self._record_cx[i]
+                yPosControl = yPos + self._record_cy[i]
+                xPos = xPosControl + record_x[i]
+                yPos = yPosControl + record_y[i]
                 control = [xPosControl, yPosControl]
                 to = [NumberUtils.round_pixels_400(xPos), NumberUtils.round_pixels_400(yPos)]
                 sub_path.append(SWFCurvedEdge(start, control, to, curr_ls_idx, curr_fs_idx1))
-            elif rec.type == SWFShapeRecord.TYPE_END:
+            elif record_type == SWFShapeRecord.TYPE_END:
                 # We're done. Process the last subpath, if any
                 if len(sub_path) > 0:
-                    self._process_sub_path(sub_path, curr_ls_idx, curr_fs_idx0, curr_fs_idx1, rec.record_id)
+                    self._process_sub_path(sub_path, curr_ls_idx, curr_fs_idx0, curr_fs_idx1, i)
                     self._clean_edge_map(self.current_fill_edge_map)
                     self._clean_edge_map(self.current_line_edge_map)
                     self.fill_edge_maps.append(self.current_fill_edge_map)
@@ -242,63 +388,73 @@ class SWFShape(_dumb_repr):
 
     def _clean_edge_map(self, edge_map):
         for style_idx in edge_map:
-            sub_path = edge_map[style_idx] if style_idx in edge_map else None
-            if sub_path is not None and len(sub_path) > 0:
-                tmp_path = []
-                prev_edge = None
-                self._create_coord_map(sub_path)
-                while len(sub_path) > 0:
-                    idx = 0
-                    while idx < len(sub_path):
-                        if prev_edge is None or self._equal_point(prev_edge.to, sub_path[idx].start):
-                            edge = sub_path[idx]
-                            del sub_path[idx]
-                            tmp_path.append(edge)
-                            self._remove_edge_from_coord_map(edge)
-                            prev_edge = edge
-                        else:
-                            edge = self._find_next_edge_in_coord_map(prev_edge)
-                            if not edge is None:
-                                idx = sub_path.index(edge)
-                            else:
-                                idx = 0
-                                prev_edge = None
-                edge_map[style_idx] = tmp_path
+            sub_path = edge_map[style_idx]
+            if len(sub_path) > 0:
+                edge_map[style_idx] = self._connect_edges(sub_path)
+
+    def _connect_edges(self, edges):
+        """
+        Return edges ordered so that, where possible, each edge starts
+        where the previous one ends.
+
+        The edges are walked in order. An edge is taken when it starts at
+        the end of the previously taken one. Otherwise the walk continues
+        at the first remaining edge that starts there (by the point
+        rounded to 4 decimals), or, when there is none, restarts at the
+        first remaining edge. Remaining edges form a linked list and the
+        edges starting at a point form a bucket whose head skips the taken
+        ones, so each step is O(1).
+        """
+        count = len(edges)
+        next_idx = list(range(1, count + 1))
+        prev_idx = list(range(-1, count - 1))
+        first = 0
+        taken = [False] * count
+        buckets = {}
+        for i in range(count):
+            start = edges[i].start
+            buckets.setdefault("%0.4f_%0.4f" % (start[0], start[1]), []).append(i)
+        bucket_heads = dict.fromkeys(buckets, 0)
+
+        path = []
+        prev_edge = None
+        remaining = count
+        while remaining > 0:
+            idx = first
+            while idx < count:
+                edge = edges[idx]
+                if prev_edge is None or self._equal_point(prev_edge.to, edge.start):
+                    taken[idx] = True
+                    remaining -= 1
+                    n = next_idx[idx]
+                    p = prev_idx[idx]
+                    if p < 0:
+                        first = n
+                    else:
+                        next_idx[p] = n
+                    if n < count:
+                        prev_idx[n] = p
+                    path.append(edge)
+                    prev_edge = edge
+                    idx = n
+                else:
+                    key = "%0.4f_%0.4f" % (prev_edge.to[0], prev_edge.to[1])
+                    bucket = buckets.get(key)
+                    if bucket is not None:
+                        head = bucket_heads[key]
+                        while head < len(bucket) and taken[bucket[head]]:
+                            head += 1
+                        bucket_heads[key] = head
+                        if head < len(bucket):
+                            idx = bucket[head]
+                            continue
+                    idx = first
+                    prev_edge = None
+        return path
 
     def _equal_point(self, a, b, tol=0.001):
         return (a[0] > b[0]-tol and a[0] < b[0]+tol and a[1] > b[1]-tol and a[1] < b[1]+tol)
 
-    def _find_next_edge_in_coord_map(self, edge):
-        key = "%0.4f_%0.4f" % (edge.to[0], edge.to[1])
-        if key in self.coord_map and len(self.coord_map[key]) > 0:
-            return self.coord_map[key][0]
-        else:
-            return None
-
-    def _create_coord_map(self, path):
-        self.coord_map = {}
-        for i in range(0, len(path)):
-            start = path[i].start
-            key = "%0.4f_%0.4f" % (start[0], start[1])
-            coord_map_array = self.coord_map[key] if key in self.coord_map else None
-            if coord_map_array is None:
-                self.coord_map[key] = [path[i]]
-            else:
-                self.coord_map[key].append(path[i])
-
-    def _remove_edge_from_coord_map(self, edge):
-        key = "%0.4f_%0.4f" % (edge.start[0], edge.start[1])
-        if key in self.coord_map:
-            coord_map_array = self.coord_map[key]
-            if len(coord_map_array) == 1:
-                del self.coord_map[key]
-            else:
-                try:
-                    idx = coord_map_array.index(edge)
-                    del coord_map_array[idx]
-                except:
-                    pass
-
     def _create_path_from_edge_map(self, edge_map):
         new_path = []
         style_ids = []
@@ -479,6 +635,8 @@ class SWFShape(_dumb_repr):
         return "[SWFShape]"
 
 class SWFShapeWithStyle(SWFShape):
+    __slots__ = ('_initialFillStyles', '_initialLineStyles')
+
     def __init__(self, data, level, unit_divisor):
         self._initialFillStyles = []
         self._initialLineStyles = []
@@ -528,7 +686,7 @@ class SWFShapeWithStyle(SWFShape):
             s += "    LineStyles:\n"
             for i in range(0, len(self._initialLineStyles)):
                 s += "        %d:%s\n" % (i+1, self._initialLineStyles[i].__str__())
-        for record in self._records:
+        for record in self.records:
             s += record.__str__() + '\n'
         return s.rstrip() + super(SWFShapeWithStyle, self).__str__()
 
@@ -540,9 +698,10 @@ class SWFShapeRecord(_dumb_repr):
     TYPE_STRAIGHTEDGE = 3
     TYPE_CURVEDEDGE = 4
 
-    record_id = -1
+    __slots__ = ('record_id',)
 
     def __init__(self, data=None, level=1):
+        self.record_id = -1
         if not data is None:
             self.parse(data, level)
 
@@ -562,19 +721,26 @@ class SWFShapeRecord(_dumb_repr):
         return "    [SWFShapeRecord]"
 
 class SWFShapeRecordStraightEdge(SWFShapeRecord):
+    __slots__ = ('num_bits', 'general_line_flag', 'vert_line_flag', 'deltaX', 'deltaY')
+
     def __init__(self, data, num_bits=0, level=1):
         self.num_bits = num_bits
         super(SWFShapeRecordStraightEdge, self).__init__(data, level)
 
     def parse(self, data, level=1):
         self.general_line_flag = (data.readUB(1) == 1)
-        self.vert_line_flag = False if self.general_line_flag else (data.readUB(1) == 1)
-        self.deltaX = data.readSB(self.num_bits) \
-            if self.general_line_flag or not self.vert_line_flag \
-            else 0.0
-        self.deltaY = data.readSB(self.num_bits) \
-            if self.general_line_flag or self.vert_line_flag \
-            else 0.0
+        if self.general_line_flag:
+            self.vert_line_flag = False
+            self.deltaX, self.deltaY = \
+                data.read_bitfields((self.num_bits, self.num_bits), signed=True)
+        else:
+            self.vert_line_flag = (data.readUB(1) == 1)
+            if self.vert_line_flag:
+                self.deltaX = 0.0
+                self.deltaY = data.readSB(self.num_bits)
+            else:
+                self.deltaX = data.readSB(self.num_bits)
+                self.deltaY = 0.0
 
     @property
     def type(self):
@@ -592,15 +758,18 @@ class SWFShapeRecordStraightEdge(SWFShapeRecord):
         return s
 
 class SWFShapeRecordCurvedEdge(SWFShapeRecord):
+    __slots__ = ('num_bits', 'control_deltaX', 'control_deltaY',
+                 'anchor_deltaX', 'anchor_deltaY')
+
     def __init__(self, data, num_bits=0, level=1):
         self.num_bits = num_bits
         super(SWFShapeRecordCurvedEdge, self).__init__(data, level)
 
     def parse(self, data, level=1):
-        self.control_deltaX = data.readSB(self.num_bits)
-        self.control_deltaY = data.readSB(self.num_bits)
-        self.anchor_deltaX = data.readSB(self.num_bits)
-        self.anchor_deltaY = data.readSB(self.num_bits)
+        bits = self.num_bits
+        self.control_deltaX, self.control_deltaY, \
+            self.anchor_deltaX, self.anchor_deltaY = \
+            data.read_bitfields((bits, bits, bits, bits), signed=True)
 
     @property
     def type(self):
@@ -612,6 +781,12 @@ class SWFShapeRecordCurvedEdge(SWFShapeRecord):
             " AnchorDelta: %d, %d" % (self.anchor_deltaX, self.anchor_deltaY)
 
 class SWFShapeRecordStyleChange(SWFShapeRecord):
+    __slots__ = ('fill_styles', 'line_styles', 'state_new_styles',
+                 'state_line_style', 'state_fill_style1', 'state_fill_style0',
+                 'state_moveto', 'num_fillbits', 'num_linebits',
+                 'move_deltaX', 'move_deltaY', 'fill_style0', 'fill_style1',
+                 'line_style')
+
     def __init__(self, data, states=0, fill_bits=0, line_bits=0, level=1):
         self.fill_styles = []
         self.line_styles = []
@@ -671,6 +846,8 @@ class SWFShapeRecordStyleChange(SWFShapeRecord):
             " flags: %d %d %d" % (self.state_fill_style0, self.state_fill_style1, self.state_line_style)
 
 class SWFShapeRecordEnd(SWFShapeRecord):
+    __slots__ = ()
+
     def __init__(self):
         super(SWFShapeRecordEnd, self).__init__(None)
 
@@ -685,6 +862,9 @@ class SWFShapeRecordEnd(SWFShapeRecord):
         return "    [SWFShapeRecordEnd]"
 
 class SWFMatrix(_dumb_repr):
+    __slots__ = ('scaleX', 'scaleY', 'rotateSkew0', 'rotateSkew1',
+                 'translateX', 'translateY')
+
     def __init__(self, data):
         self.scaleX = 1.0
         self.scaleY = 1.0
@@ -701,17 +881,19 @@ class SWFMatrix(_dumb_repr):
         self.scaleY = 1.0
         if data.readUB(1) == 1:
             scaleBits = data.readUB(5)
-            self.scaleX = data.readFB(scaleBits)
-            self.scaleY = data.readFB(scaleBits)
+            scaleX, scaleY = data.read_bitfields((scaleBits, scaleBits), signed=True)
+            self.scaleX = scaleX / 65536.0
+            self.scaleY = scaleY / 65536.0
         self.rotateSkew0 = 0.0
         self.rotateSkew1 = 0.0
         if data.readUB(1) == 1:
             rotateBits = data.readUB(5)
-            self.rotateSkew0 = data.readFB(rotateBits)
-            self.rotateSkew1 = data.readFB(rotateBits)
+            rotateSkew0, rotateSkew1 = data.read_bitfields((rotateBits, rotateBits), signed=True)
+            self.rotateSkew0 = rotateSkew0 / 65536.0
+            self.rotateSkew1 = rotateSkew1 / 65536.0
         translateBits = data.readUB(5)
-        self.translateX = data.readSB(translateBits)
-        self.translateY = data.readSB(translateBits)
+        self.translateX, self.translateY = \
+            data.read_bitfields((translateBits, translateBits), signed=True)
 
     def to_array(self):
         return [
@@ -727,8 +909,11 @@ class SWFMatrix(_dumb_repr):
         return "[%s]" % ",".join(map(fmt, self.to_array()))
 
 class SWFGradientRecord(_dumb_repr):
+    __slots__ = ('ratio', 'color')
+
     def __init__(self, data=None, level=1):
-        self._records = []
+        self.ratio = 0
+        self.color = 0
         if not data is None:
             self.parse(data, level)
 
@@ -740,9 +925,13 @@ class SWFGradientRecord(_dumb_repr):
         return "[SWFGradientRecord] Color: %s, Ratio: %d" % (ColorUtils.to_rgb_string(self.color), self.ratio)
 
 class SWFGradient(_dumb_repr):
+    __slots__ = ('_records', 'focal_point', 'spreadmethod', 'interpolation_mode')
+
     def __init__(self, data=None, level=1):
         self._records = []
         self.focal_point = 0.0
+        self.spreadmethod = 0
+        self.interpolation_mode = 0
         if not data is None:
             self.parse(data, level)
 
@@ -765,6 +954,8 @@ class SWFGradient(_dumb_repr):
         return s
 
 class SWFFocalGradient(SWFGradient):
+    __slots__ = ()
+
     def __init__(self, data=None, level=1):
         super(SWFFocalGradient, self).__init__(data, level)
 
@@ -777,7 +968,17 @@ class SWFFocalGradient(SWFGradient):
             (ColorUtils.to_rgb_string(self.color), self.ratio, self.focal_point)
 
 class SWFFillStyle(_dumb_repr):
+    __slots__ = ('type', 'rgb', 'gradient_matrix', 'gradient',
+                 'bitmap_id', 'bitmap_matrix')
+
     def __init__(self, data=None, level=1):
+        # only the fields of the fill style type are read
+        self.type = 0x0
+        self.rgb = 0
+        self.gradient_matrix = None
+        self.gradient = None
+        self.bitmap_id = None
+        self.bitmap_matrix = None
         if not data is None:
             self.parse(data, level)
 
@@ -793,7 +994,7 @@ class SWFFillStyle(_dumb_repr):
             self.gradient_matrix = data.readMATRIX()
             self.gradient = data.readFOCALGRADIENT(level) if self.type == 0x13 else data.readGRADIENT(level)
         elif self.type in SWFFillStyle.BITMAP:
-            self.bitmap_id = data.readUI16()
+            self.bitmap_id = data.readCharacterId()
             self.bitmap_matrix = data.readMATRIX()
         else:
             raise Exception("Unknown fill style type: 0x%x" % self.type, level)
@@ -812,6 +1013,11 @@ class SWFFillStyle(_dumb_repr):
         return s
 
 class SWFLineStyle(_dumb_repr):
+    __slots__ = ('start_caps_style', 'end_caps_style', 'joint_style',
+                 'has_fill_flag', 'no_hscale_flag', 'no_vscale_flag',
+                 'pixelhinting_flag', 'no_close', 'miter_limit_factor',
+                 'fill_type', 'width', 'color')
+
     def __init__(self, data=None, level=1):
         # forward declarations for SWFLineStyle2
         self.start_caps_style = LineCapsStyle.ROUND
@@ -842,6 +1048,8 @@ class SWFLineStyle(_dumb_repr):
         return s
 
 class SWFLineStyle2(SWFLineStyle):
+    __slots__ = ()
+
     def __init__(self, data=None, level=1):
         super(SWFLineStyle2, self).__init__(data, level)
 
@@ -884,6 +1092,8 @@ class SWFLineStyle2(SWFLineStyle):
         return s
 
 class SWFMorphGradientRecord(_dumb_repr):
+    __slots__ = ('startRatio', 'startColor', 'endRatio', 'endColor')
+
     def __init__(self, data):
         if not data is None:
             self.parse(data)
@@ -895,6 +1105,8 @@ class SWFMorphGradientRecord(_dumb_repr):
         self.endColor = data.readRGBA()
 
 class SWFMorphGradient(_dumb_repr):
+    __slots__ = ('records',)
+
     def __init__(self, data, level=1):
         self.records = []
         if not data is None:
@@ -907,12 +1119,22 @@ class SWFMorphGradient(_dumb_repr):
             self.records.append(data.readMORPHGRADIENTRECORD())
 
 class SWFMorphFillStyle(_dumb_repr):
+    __slots__ = ('startColor', 'endColor', 'startGradientMatrix',
+                 'endGradientMatrix', 'gradient', 'bitmapId',
+                 'startBitmapMatrix', 'endBitmapMatrix')
+
     def __init__(self, data, level=1):
+        # only the fields of the fill style type are read
+        self.startColor = self.endColor = 0
+        self.startGradientMatrix = self.endGradientMatrix = None
+        self.gradient = None
+        self.bitmapId = None
+        self.startBitmapMatrix = self.endBitmapMatrix = None
         if not data is None:
             self.parse(data, level)
 
     def get_dependencies(self):
-        return set([self.bitmapId]) if hasattr(self, 'bitmapId') else set()
+        return set([self.bitmapId]) if self.bitmapId is not None else set()
 
     def parse(self, data, level=1):
         type = data.readUI8()
@@ -924,11 +1146,16 @@ class SWFMorphFillStyle(_dumb_repr):
             self.endGradientMatrix = data.readMATRIX()
             self.gradient = data.readMORPHGRADIENT(level)
         elif type in [0x40, 0x41, 0x42, 0x43]:
-            self.bitmapId = data.readUI16()
+            self.bitmapId = data.readCharacterId()
             self.startBitmapMatrix = data.readMATRIX()
             self.endBitmapMatrix = data.readMATRIX()
 
 class SWFMorphLineStyle(_dumb_repr):
+    __slots__ = ('startCapsStyle', 'endCapsStyle', 'jointStyle', 'hasFillFlag',
+                 'noHScaleFlag', 'noVScaleFlag', 'pixelHintingFlag', 'noClose',
+                 'miterLimitFactor', 'fillType', 'startWidth', 'endWidth',
+                 'startColor', 'endColor')
+
     def __init__(self, data, level=1):
         # Forward declaration of SWFMorphLineStyle2 properties
         self.startCapsStyle = LineCapsStyle.ROUND
@@ -941,6 +1168,7 @@ class SWFMorphLineStyle(_dumb_repr):
         self.noClose = False
         self.miterLimitFactor = 3
         self.fillType = None
+        self.startColor = self.endColor = 0
         if not data is None:
             self.parse(data, level)
 
@@ -951,6 +1179,8 @@ class SWFMorphLineStyle(_dumb_repr):
         self.endColor = data.readRGBA()
 
 class SWFMorphLineStyle2(SWFMorphLineStyle):
+    __slots__ = ()
+
     def __init__(self, data, level=1):
         super(SWFMorphLineStyle2, self).__init__(data, level)
 
@@ -975,6 +1205,8 @@ class SWFMorphLineStyle2(SWFMorphLineStyle):
             self.endColor = data.readRGBA()
 
 class SWFRecordHeader(_dumb_repr):
+    __slots__ = ('type', 'content_length', 'header_length')
+
     def __init__(self, type, content_length, header_length):
         self.type = type
         self.content_length = content_length
@@ -985,16 +1217,16 @@ class SWFRecordHeader(_dumb_repr):
         return self.header_length + self.content_length
 
 class SWFRectangle(_dumb_repr):
+    __slots__ = ('xmin', 'xmax', 'ymin', 'ymax')
+
     def __init__(self):
         self.xmin = self.xmax = self.ymin = self.ymax = 0
 
     def parse(self, s):
         s.reset_bits_pending()
         bits = s.readUB(5)
-        self.xmin = s.readSB(bits)
-        self.xmax = s.readSB(bits)
-        self.ymin = s.readSB(bits)
-        self.ymax = s.readSB(bits)
+        self.xmin, self.xmax, self.ymin, self.ymax = \
+            s.read_bitfields((bits, bits, bits, bits), signed=True)
 
     @property
     def dimensions(self):
@@ -1007,6 +1239,9 @@ class SWFRectangle(_dumb_repr):
         return "[xmin: %d xmax: %d ymin: %d ymax: %d]" % (self.xmin/20, self.xmax/20, self.ymin/20, self.ymax/20)
 
 class SWFColorTransform(_dumb_repr):
+    __slots__ = ('hasAddTerms', 'hasMultTerms', 'rMult', 'gMult', 'bMult',
+                 'rAdd', 'gAdd', 'bAdd')
+
     def __init__(self, data=None):
         if not data is None:
             self.parse(data)
@@ -1045,6 +1280,8 @@ class SWFColorTransform(_dumb_repr):
             (self.rMult, self.gMult, self.bMult, self.rAdd, self.gAdd, self.bAdd)
 
 class SWFColorTransformWithAlpha(SWFColorTransform):
+    __slots__ = ('aMult', 'aAdd')
+
     def __init__(self, data=None):
         super(SWFColorTransformWithAlpha, self).__init__(data)
 
@@ -1089,6 +1326,8 @@ class SWFColorTransformWithAlpha(SWFColorTransform):
             (self.rMult, self.gMult, self.bMult, self.aMult, self.rAdd, self.gAdd, self.bAdd, self.aAdd)
 
 class SWFFrameLabel(_dumb_repr):
+    __slots__ = ('frameNumber', 'name')
+
     def __init__(self, frameNumber, name):
         self.frameNumber = frameNumber
         self.name = name
@@ -1097,6 +1336,8 @@ class SWFFrameLabel(_dumb_repr):
         return "Frame: %d, Name: %s" % (self.frameNumber, self.name)
 
 class SWFScene(_dumb_repr):
+    __slots__ = ('offset', 'name')
+
     def __init__(self, offset, name):
         self.offset = offset
         self.name = name
@@ -1105,6 +1346,8 @@ class SWFScene(_dumb_repr):
         return "Scene: %d, Name: '%s'" % (self.offset, self.name)
 
 class SWFSymbol(_dumb_repr):
+    __slots__ = ('tagId', 'name')
+
     def __init__(self, data=None):
         if not data is None:
             self.parse(data)
@@ -1117,6 +1360,8 @@ class SWFSymbol(_dumb_repr):
         return "ID %d, Name: %s" % (self.tagId, self.name)
 
 class SWFGlyphEntry(_dumb_repr):
+    __slots__ = ('index', 'advance')
+
     def __init__(self, data=None, glyphBits=0, advanceBits=0):
         if not data is None:
             self.parse(data, glyphBits, advanceBits)
@@ -1130,6 +1375,8 @@ class SWFGlyphEntry(_dumb_repr):
         return "Index: %d, Advance: %d" % (self.index, self.advance)
 
 class SWFKerningRecord(_dumb_repr):
+    __slots__ = ('code1', 'code2', 'adjustment')
+
     def __init__(self, data=None, wideCodes=False):
         if not data is None:
             self.parse(data, wideCodes)
@@ -1143,7 +1390,12 @@ class SWFKerningRecord(_dumb_repr):
         return "Code1: %d, Code2: %d, Adjustment: %d" % (self.code1, self.code2, self.adjustment)
 
 class SWFTextRecord(_dumb_repr):
+    __slots__ = ('type', 'hasFont', 'hasColor', 'hasYOffset', 'hasXOffset',
+                 'fontId', 'textColor', 'xOffset', 'yOffset', 'textHeight',
+                 'glyphEntries')
+
     def __init__(self, data=None, glyphBits=0, advanceBits=0, previousRecord=None, level=1):
+        self.type = 1
         self.hasFont = False
         self.hasColor = False
         self.hasYOffset = False
@@ -1170,7 +1422,7 @@ class SWFTextRecord(_dumb_repr):
         self.hasXOffset = ((styles & 0x01) != 0)
 
         if self.hasFont:
-            self.fontId = data.readUI16()
+            self.fontId = data.readCharacterId()
         elif not previousRecord is None:
             self.fontId = previousRecord.fontId
 
@@ -1195,13 +1447,14 @@ class SWFTextRecord(_dumb_repr):
             self.textHeight = previousRecord.textHeight
 
         glyphCount = data.readUI8()
-        for i in range(0, glyphCount):
-            self.glyphEntries.append(data.readGLYPHENTRY(glyphBits, advanceBits))
+        self.glyphEntries = data.readGLYPHENTRYs(glyphCount, glyphBits, advanceBits)
 
     def __str__(self):
         return "[SWFTextRecord]"
 
 class SWFClipActions(_dumb_repr):
+    __slots__ = ('eventFlags', 'records')
+
     def __init__(self, data=None, version=0):
         self.eventFlags = None
         self.records = []
@@ -1221,6 +1474,8 @@ class SWFClipActions(_dumb_repr):
         return "[SWFClipActions]"
 
 class SWFClipActionRecord(_dumb_repr):
+    __slots__ = ('eventFlags', 'keyCode', 'actions')
+
     def __init__(self, data=None, version=0):
         self.eventFlags = None
         self.keyCode = 0
@@ -1243,27 +1498,33 @@ class SWFClipActionRecord(_dumb_repr):
         return "[SWFClipActionRecord]"
 
 class SWFClipEventFlags(_dumb_repr):
-    keyUpEvent = False
-    keyDownEvent = False
-    mouseUpEvent = False
-    mouseDownEvent = False
-    mouseMoveEvent = False
-    unloadEvent = False
-    enterFrameEvent = False
-    loadEvent = False
-    dragOverEvent = False # SWF6
-    rollOutEvent = False # SWF6
-    rollOverEvent = False # SWF6
-    releaseOutsideEvent = False # SWF6
-    releaseEvent = False # SWF6
-    pressEvent = False # SWF6
-    initializeEvent = False # SWF6
-    dataEvent = False
-    constructEvent = False # SWF7
-    keyPressEvent = False # SWF6
-    dragOutEvent = False # SWF6
+    __slots__ = ('keyUpEvent', 'keyDownEvent', 'mouseUpEvent', 'mouseDownEvent',
+                 'mouseMoveEvent', 'unloadEvent', 'enterFrameEvent', 'loadEvent',
+                 'dragOverEvent', 'rollOutEvent', 'rollOverEvent',
+                 'releaseOutsideEvent', 'releaseEvent', 'pressEvent',
+                 'initializeEvent', 'dataEvent', 'constructEvent',
+                 'keyPressEvent', 'dragOutEvent')
 
     def __init__(self, data=None, version=0):
+        self.keyUpEvent = False
+        self.keyDownEvent = False
+        self.mouseUpEvent = False
+        self.mouseDownEvent = False
+        self.mouseMoveEvent = False
+        self.unloadEvent = False
+        self.enterFrameEvent = False
+        self.loadEvent = False
+        self.dragOverEvent = False # SWF6
+        self.rollOutEvent = False # SWF6
+        self.rollOverEvent = False # SWF6
+        self.releaseOutsideEvent = False # SWF6
+        self.releaseEvent = False # SWF6
+        self.pressEvent = False # SWF6
+        self.initializeEvent = False # SWF6
+        self.dataEvent = False
+        self.constructEvent = False # SWF7
+        self.keyPressEvent = False # SWF6
+        self.dragOutEvent = False # SWF6
         if not data is None:
             self.parse(data, version)
 
@@ -1297,6 +1558,8 @@ class SWFClipEventFlags(_dumb_repr):
         return "[SWFClipEventFlags]"
 
 class SWFZoneData(_dumb_repr):
+    __slots__ = ('alignmentCoordinate', 'zoneRange')
+
     def __init__(self, data=None):
         if not data is None:
             self.parse(data)
@@ -1309,6 +1572,8 @@ class SWFZoneData(_dumb_repr):
         return "[SWFZoneData]"
 
 class SWFZoneRecord(_dumb_repr):
+    __slots__ = ('zoneData', 'maskX', 'maskY')
+
     def __init__(self, data=None):
         if not data is None:
             self.parse(data)
@@ -1326,6 +1591,10 @@ class SWFZoneRecord(_dumb_repr):
         return "[SWFZoneRecord]"
 
 class SWFSoundInfo(_dumb_repr):
+    __slots__ = ('syncStop', 'syncNoMultiple', 'hasEnvelope', 'hasLoops',
+                 'hasOutPoint', 'hasInPoint', 'inPoint', 'outPoint',
+                 'loopCount', 'envPointCount', 'envelopePoints')
+
     def __init__(self, data=None):
         if not data is None:
             self.parse(data)
@@ -1349,6 +1618,8 @@ class SWFSoundInfo(_dumb_repr):
         return "[SWFSoundInfo]"
 
 class SWFSoundEnvelope(_dumb_repr):
+    __slots__ = ('position', 'leftLevel', 'rightLevel')
+
     def __init__(self, data=None):
         if not data is None:
             self.parse(data)
@@ -1362,8 +1633,19 @@ class SWFSoundEnvelope(_dumb_repr):
         return "[SWFSoundEnvelope]"
 
 class SWFButtonRecord(_dumb_repr):
+    __slots__ = ('hasBlendMode', 'hasFilterList', 'stateHitTest', 'stateDown',
+                 'stateOver', 'stateUp', 'valid', 'characterId', 'placeDepth',
+                 'placeMatrix', 'colorTransform', 'filterList', 'blendMode')
+
     def __init__(self, version, data=None):
         # version is 1 for DefineButton, 2 for DefineButton2, etc
+        self.valid = False
+        self.characterId = None
+        self.placeDepth = 0
+        self.placeMatrix = None
+        self.colorTransform = None
+        self.filterList = None
+        self.blendMode = 0
         if not data is None:
             self.parse(data, version)
 
@@ -1385,7 +1667,7 @@ class SWFButtonRecord(_dumb_repr):
         if not self.valid:
             return
 
-        self.characterId = data.readUI16()
+        self.characterId = data.readCharacterId()
         self.placeDepth = data.readUI16()
         self.placeMatrix = data.readMATRIX()
 
@@ -1398,9 +1680,14 @@ class SWFButtonRecord(_dumb_repr):
         return "[SWFButtonRecord]"
 
     def __repr__(self):
-        return "[SWFButtonRecord %r]" % self.__dict__
+        return "[SWFButtonRecord %r]" % self._attributes()
 
 class SWFButtonCondAction(_dumb_repr):
+    __slots__ = ('idleToOverDown', 'outDownToIdle', 'outDownToOverDown',
+                 'overDownToOutDown', 'overDownToOverUp', 'overUpToOverDown',
+                 'overUpToIdle', 'idleToOverUp', 'keyPress', 'overDownToIdle',
+                 'actions')
+
     def __init__(self, data=None):
         if not data is None:
             self.parse(data)
@@ -1425,6 +1712,8 @@ class SWFButtonCondAction(_dumb_repr):
         return "[SWFButtonCondAction]"
 
 class SWFExport(_dumb_repr):
+    __slots__ = ('characterId', 'characterName')
+
     def __init__(self, data=None):
         if not data is None:
             self.parse(data)
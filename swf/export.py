@@ -8,6 +8,7 @@ from .utils import *
 from .data import *
 from .tag import *
 from .filters import *
+from .timeline import TimelinePlayer
 from lxml import objectify
 from lxml import etree
 import base64
@@ -22,6 +23,10 @@ import math
 import re
 import copy
 import cgi
+import itertools
+from collections import namedtuple
+import shutil
+import tempfile
 
 SVG_VERSION = "1.1"
 SVG_NS      = "http://www.w3.org/2000/svg"
@@ -34,6 +39,10 @@ EM_SQUARE_LENGTH = 1024
 
 MINIMUM_STROKE_WIDTH = 0.5
 
+# in streaming mode, serialised elements are kept in memory up to this
+# many bytes (per spool) before they go to a temporary file
+STREAM_SPOOL_SIZE = 8 * 1024 * 1024
+
 CAPS_STYLE = {
     0 : 'round',
     1 : 'butt',
@@ -132,28 +141,30 @@ class DefaultSVGShapeExporter(DefaultShapeExporter):
         super(DefaultSVGShapeExporter, self).__init__()
 
     def move_to(self, x, y):
+        x = NumberUtils.round_pixels_20(x)
+        y = NumberUtils.round_pixels_20(y)
         self.current_draw_command = ""
-        self.path_data += "M" + \
-            str(NumberUtils.round_pixels_20(x)) + " " + \
-            str(NumberUtils.round_pixels_20(y)) + " "
+        self.path_data += "M" + str(x) + " " + str(y) + " "
 
     def line_to(self, x, y):
+        x = NumberUtils.round_pixels_20(x)
+        y = NumberUtils.round_pixels_20(y)
         if self.current_draw_command != "L":
             self.current_draw_command = "L"
             self.path_data += "L"
-        self.path_data += "" + \
-            str(NumberUtils.round_pixels_20(x)) + " " + \
-            str(NumberUtils.round_pixels_20(y)) + " "
+        self.path_data += "" + str(x) + " " + str(y) + " "
 
     def curve_to(self, cx, cy, ax, ay):
+        cx = NumberUtils.round_pixels_20(cx)
+        cy = NumberUtils.round_pixels_20(cy)
+        ax = NumberUtils.round_pixels_20(ax)
+        ay = NumberUtils.round_pixels_20(ay)
         if self.current_draw_command != "Q":
             self.current_draw_command = "Q"
             self.path_data += "Q"
         self.path_data += "" + \
-            str(NumberUtils.round_pixels_20(cx)) + " " + \
-            str(NumberUtils.round_pixels_20(cy)) + " " + \
-            str(NumberUtils.round_pixels_20(ax)) + " " + \
-            str(NumberUtils.round_pixels_20(ay)) + " "
+            str(cx) + " " + str(cy) + " " + \
+            str(ax) + " " + str(ay) + " "
 
     def begin_bitmap_fill(self, bitmap_id, matrix=None, repeat=False, smooth=False):
         self.finalize_path()
@@ -198,13 +209,23 @@ class DefaultSVGShapeExporter(DefaultShapeExporter):
 class SVGShapeExporter(DefaultSVGShapeExporter):
     def __init__(self):
         self.path = None
+        self.paths = {}
+        self.fills_ended = False
+        # an SVGDefsIndex of defs, if the exporter keeps one
+        self.defs_index = None
+        self.reset()
+        super(SVGShapeExporter, self).__init__()
+
+    def reset(self, id_prefix=""):
+        """
+        Forget the gradients and patterns added to defs so far; the ids
+        of the ones added next start with id_prefix
+        """
+        self.id_prefix = id_prefix
         self.num_patterns = 0
         self.num_gradients = 0
         self._gradients = {}
         self._gradient_ids = {}
-        self.paths = {}
-        self.fills_ended = False
-        super(SVGShapeExporter, self).__init__()
 
     def begin_shape(self):
         self.g = self._e.g()
@@ -236,7 +257,7 @@ class SVGShapeExporter(DefaultSVGShapeExporter):
                         interpolationMethod=InterpolationMethod.RGB,
                         focalPointRatio=0.0):
         self.num_gradients += 1
-        gradient_id = "gradient%d" % self.num_gradients
+        gradient_id = "%sgradient%d" % (self.id_prefix, self.num_gradients)
         gradient = self._e.linearGradient() if type == GradientType.LINEAR \
             else self._e.radialGradient()
         gradient.set("gradientUnits", "userSpaceOnUse")
@@ -284,18 +305,21 @@ class SVGShapeExporter(DefaultSVGShapeExporter):
             self._gradients[key] = copy.copy(gradient)
             self._gradient_ids[key] = gradient_id
             gradient.set("id", gradient_id)
-            self.defs.append(gradient)
+            self._append_def(gradient)
 
         return gradient_id
 
     def export_pattern(self, bitmap_id, matrix, repeat=False, smooth=False):
         self.num_patterns += 1
         bitmap_id = "c%d" % bitmap_id
-        e = self.defs.xpath("./svg:image[@id='%s']" % bitmap_id, namespaces=NS)
-        if len(e) < 1:
+        if self.defs_index is not None:
+            image = self.defs_index.find(bitmap_id, "image")
+        else:
+            e = self.defs.xpath("./svg:image[@id='%s']" % bitmap_id, namespaces=NS)
+            image = e[0] if len(e) > 0 else None
+        if image is None:
             raise Exception("SVGShapeExporter::begin_bitmap_fill Could not find bitmap!")
-        image = e[0]
-        pattern_id = "pat%d" % (self.num_patterns)
+        pattern_id = "%spat%d" % (self.id_prefix, self.num_patterns)
         pattern = self._e.pattern()
         pattern.set("id", pattern_id)
         pattern.set("width", image.get("width"))
@@ -308,10 +332,16 @@ class SVGShapeExporter(DefaultSVGShapeExporter):
         use = self._e.use()
         use.set(XLINK_HREF, "#%s" % bitmap_id)
         pattern.append(use)
-        self.defs.append(pattern)
+        self._append_def(pattern)
 
         return pattern_id
 
+    def _append_def(self, element):
+        if self.defs_index is not None:
+            self.defs_index.append(element)
+        else:
+            self.defs.append(element)
+
     def begin_bitmap_fill(self, bitmap_id, matrix=None, repeat=False, smooth=False):
         self.finalize_path()
         pattern_id = self.export_pattern(bitmap_id, matrix, repeat, smooth)
@@ -388,6 +418,67 @@ class SVGShapeExporter(DefaultSVGShapeExporter):
         self.path = self._e.path()
         super(SVGShapeExporter, self).finalize_path()
 
+class SVGDefsIndex(object):
+    """
+    The elements appended to an SVG <defs> element, by id.
+
+    Elements are indexed in the order they are appended, so find()
+    gives the element the XPath query ./svg:<tag>[@id='...'] on defs
+    would give first, without scanning defs.
+
+    @param defs: the defs element to append to.
+    """
+    def __init__(self, defs):
+        self.defs = defs
+        self._elements = {}
+        # the number of elements appended
+        self.count = 0
+
+    def append(self, element):
+        """ Append element to defs and index it """
+        self.defs.append(element)
+        self.add(element)
+        self.count += 1
+
+    def appended(self, start):
+        """ Return the elements appended after the first start, still in defs """
+        elements = list(itertools.islice(self.defs.iterchildren(reversed=True),
+                                         self.count - start))
+        elements.reverse()
+        return elements
+
+    def add(self, element):
+        """ Index element (already in defs) by its id """
+        id = element.get("id")
+        if id is not None:
+            self._elements.setdefault(id, []).append(element)
+
+    def find_all(self, id, tag=None):
+        """ Return the elements with id (and the SVG tag name tag) """
+        elements = self._elements.get(id, [])
+        if tag is not None:
+            tag = "{%s}%s" % (SVG_NS, tag)
+            elements = [e for e in elements if e.tag == tag]
+        return elements
+
+    def find(self, id, tag=None):
+        """ Return the first element with id (and tag), or None """
+        elements = self.find_all(id, tag)
+        return elements[0] if len(elements) > 0 else None
+
+    def release(self, elements):
+        """
+        Replace the indexed elements by childless copies without
+        xlink:href, once they have been written out and removed from
+        defs. Their ids and sizes stay known (patterns use the size of
+        images), their content is freed.
+        """
+        for element in elements:
+            indexed = self._elements.get(element.get("id"), [])
+            for i, e in enumerate(indexed):
+                if e is element:
+                    attrib = dict((k, v) for k, v in element.attrib.items() if k != XLINK_HREF)
+                    indexed[i] = etree.Element(element.tag, attrib)
 
 class BaseExporter(object):
     def __init__(self, swf=None, shape_exporter=None, force_stroke=False):
@@ -408,24 +499,7 @@ class BaseExporter(object):
         png_buffer = BytesIO()
         image = None
         if isinstance(tag, TagDefineBitsJPEG3):
-
-            tag.bitmapData.seek(0)
-            tag.bitmapAlphaData.seek(0, 2)
-            num_alpha = tag.bitmapAlphaData.tell()
-            tag.bitmapAlphaData.seek(0)
-            image = Image.open(tag.bitmapData)
-            if num_alpha > 0:
-                image_width = image.size[0]
-                image_height = image.size[1]
-                image_data = image.getdata()
-                image_data_len = len(image_data)
-                if num_alpha == image_data_len:
-                    buff = b""
-                    for i in range(0, num_alpha):
-                        alpha = ord(tag.bitmapAlphaData.read(1))
-                        rgb = list(image_data[i])
-                        buff += struct.pack("BBBB", rgb[0], rgb[1], rgb[2], alpha)
-                    image = Image.frombytes("RGBA", (image_width, image_height), buff)
+            image = tag.to_rgba_image()
         elif isinstance(tag, TagDefineBitsJPEG2):
             tag.bitmapData.seek(0)
             image = Image.open(tag.bitmapData)
@@ -444,9 +518,7 @@ class BaseExporter(object):
         self.export_image(tag, image)
 
     def export_define_bits_lossless(self, tag):
-        tag.bitmapData.seek(0)
-        image = Image.open(tag.bitmapData)
-        self.export_image(tag, image)
+        self.export_image(tag, tag.to_image())
 
     def export_define_sprite(self, tag, parent=None):
         display_tags = self.get_display_tags(tag.tags)
@@ -459,21 +531,29 @@ class BaseExporter(object):
     def export_define_shapes(self, tags):
         for tag in tags:
             if isinstance(tag, SWFTimelineContainer):
-                self.export_define_sprite(tag)
+                self.export_character(tag, self.export_define_sprite)
                 self.export_define_shapes(tag.tags)
             elif isinstance(tag, TagDefineShape):
-                self.export_define_shape(tag)
+                self.export_character(tag, self.export_define_shape)
             elif isinstance(tag, TagJPEGTables):
                 if tag.length > 0:
                     self.jpegTables = tag.jpegTables
             elif isinstance(tag, TagDefineBits):
-                self.export_define_bits(tag)
+                self.export_character(tag, self.export_define_bits)
             elif isinstance(tag, TagDefineBitsLossless):
-                self.export_define_bits_lossless(tag)
+                self.export_character(tag, self.export_define_bits_lossless)
             elif isinstance(tag, TagDefineFont):
-                self.export_define_font(tag)
+                self.export_character(tag, self.export_define_font)
             elif isinstance(tag, TagDefineText):
-                self.export_define_text(tag)
+                self.export_character(tag, self.export_define_text)
+
+    def export_character(self, tag, export):
+        """
+        Export the definition tag with export, one of the export_define_*
+        methods. Exporters that can reuse the result of an earlier export
+        of tag override this.
+        """
+        export(tag)
 
     def export_display_list(self, tags, parent=None):
         self.clip_depth = 0
@@ -503,18 +583,51 @@ class BaseExporter(object):
     def serialize(self):
         return None
 
+# the defs an SVGExporter exported for a character (see export_character)
+_CachedDefs = namedtuple('_CachedDefs', 'tag clean elements geometry dependencies')
+
 class SVGExporter(BaseExporter):
-    def __init__(self, swf=None, margin=0):
+    """
+    Exports SWFs to SVG.
+
+    The <defs> elements exported for each character are kept in a cache,
+    keyed by characterId and the export options (see cache_options), and
+    moved into later exports of the same tag instead of exporting it
+    again, e.g. when exporting many frames of a SWF. The ids of the
+    gradients, patterns, filters and masks made for a character start
+    with its own id ("c<characterId>_"), so its defs are the same in
+    every export. Tags that were parsed are exported again once they are
+    modified (see Tag.modified); call invalidate() after changing tags
+    otherwise. The cache holds the defs of every exported character, also
+    in streaming mode. As the elements are moved, the svg tree of an
+    export is only complete until the next export.
+
+    @param cache_defs: False to export every character on every export.
+    """
+    def __init__(self, swf=None, margin=0, cache_defs=True):
         self._e = objectify.ElementMaker(annotate=False,
                         namespace=SVG_NS, nsmap={None : SVG_NS, "xlink" : XLINK_NS})
         self._margin = margin
+        self._sink = None
+        self._geometry = DisplayListGeometry()
+        self._sprite_items = None
+        self._masked_shapes = set()
+        self._defs_cache = {} if cache_defs else None
         super(SVGExporter, self).__init__(swf)
 
-    def export(self, swf, force_stroke=False):
+    def export(self, swf, force_stroke=False, sink=None):
         """ Exports the specified SWF to SVG.
 
         @param swf  The SWF.
         @param force_stroke Whether to force strokes on non-stroked fills.
+        @param sink A file-like object to stream the SVG to.
+
+        Without a sink the whole document is built as an element tree and
+        returned as BytesIO. With a sink, definitions and display list
+        items are serialised as soon as they are complete and dropped from
+        the tree, and the sink is returned. Both modes produce the same
+        bytes. The bounds are computed from the exported geometry (see
+        DisplayListGeometry), not by reading the SVG back.
         """
         self.svg = self._e.svg(version=SVG_VERSION)
         self.force_stroke = force_stroke
@@ -522,9 +635,16 @@ class SVGExporter(BaseExporter):
         self.root = self._e.g()
         self.svg.append(self.defs)
         self.svg.append(self.root)
+        self.defs_index = SVGDefsIndex(self.defs)
         self.shape_exporter.defs = self.defs
+        self.shape_exporter.defs_index = self.defs_index
+        self.shape_exporter.reset()
+        self._id_prefix = ""
         self._num_filters = 0
         self._num_masks = 0
+        self._sink = sink
+        self._geometry = DisplayListGeometry()
+        self._masked_shapes = self._find_masked_shapes(swf.tags)
         self.fonts = dict([(x.characterId,x) for x in swf.all_tags_of_type(TagDefineFont)])
         self.fontInfos = dict([(x.characterId,x) for x in swf.all_tags_of_type(TagDefineFontInfo)])
 
@@ -539,12 +659,21 @@ class SVGExporter(BaseExporter):
                 info.codeTable = self.fonts[font_id].codeTable
                 self.fontInfos[font_id] = info
 
+        if sink is not None:
+            # the svg element needs the bounds, so everything after its
+            # start tag is spooled until the end of the export
+            self._defs_spool = tempfile.SpooledTemporaryFile(STREAM_SPOOL_SIZE)
+            self._root_spool = tempfile.SpooledTemporaryFile(STREAM_SPOOL_SIZE)
+
         # GO!
         super(SVGExporter, self).export(swf, force_stroke)
 
+        if sink is not None:
+            self._flush()
+
         # Setup svg @width, @height and @viewBox
         # and add the optional margin
-        self.bounds = SVGBounds(self.svg)
+        self.bounds = self._geometry.bounds()
         self.svg.set("width", "%dpx" % round(self.bounds.width))
         self.svg.set("height", "%dpx" % round(self.bounds.height))
         if self._margin > 0:
@@ -553,6 +682,9 @@ class SVGExporter(BaseExporter):
               self.bounds.width, self.bounds.height]
         self.svg.set("viewBox", "%s" % " ".join(map(str,vb)))
 
+        if sink is not None:
+            return self._write_stream(sink)
+
         # Return the SVG as BytesIO
         return self._serialize()
 
@@ -560,12 +692,149 @@ class SVGExporter(BaseExporter):
         return BytesIO(etree.tostring(self.svg,
                 encoding="UTF-8", xml_declaration=True))
 
+    def _find_masked_shapes(self, tags):
+        """
+        Return the characterIds of the shapes used by clipping display
+        list items; their paths are filled white. Shapes are exported
+        before the display lists that use them, so this walks the display
+        lists of the root and of every sprite first.
+        """
+        masked = set()
+        timelines = [tags]
+        while timelines:
+            timeline = timelines.pop()
+            for tag in self.get_display_tags(timeline):
+                if tag.hasClipDepth:
+                    masked.add(tag.characterId)
+            timelines.extend(t.tags for t in timeline if isinstance(t, SWFTimelineContainer))
+        return masked
+
+    def _flush(self):
+        """ Spool the children of defs and of the root group (streaming mode) """
+        self._spool(self.defs, self._defs_spool)
+        self._spool(self.root, self._root_spool)
+
+    def _spool(self, element, spool):
+        children = element.getchildren()
+        if not children:
+            return
+        xml = etree.tostring(element, encoding="UTF-8")
+        # drop the start and end tags of element
+        spool.write(xml[xml.index(b">") + 1:xml.rindex(b"</")])
+        for child in children:
+            element.remove(child)
+        if element is self.defs:
+            self.defs_index.release(children)
+
+    def _write_stream(self, sink):
+        # defs and the root group are empty here
+        xml = etree.tostring(self.svg, encoding="UTF-8", xml_declaration=True)
+        tail = b"<defs/><g/></svg>"
+        assert xml.endswith(tail)
+        sink.write(xml[:-len(tail)])
+        for name, spool in (("defs", self._defs_spool), ("g", self._root_spool)):
+            if spool.tell() == 0:
+                sink.write(("<%s/>" % name).encode())
+            else:
+                sink.write(("<%s>" % name).encode())
+                spool.seek(0)
+                shutil.copyfileobj(spool, sink)
+                sink.write(("</%s>" % name).encode())
+            spool.close()
+        sink.write(b"</svg>")
+        self._defs_spool = self._root_spool = None
+        return sink
+
+    def export_define_shapes(self, tags):
+        if self._sink is None:
+            return super(SVGExporter, self).export_define_shapes(tags)
+        for tag in tags:
+            super(SVGExporter, self).export_define_shapes([tag])
+            self._flush()
+
+    def export_character(self, tag, export):
+        key = (tag.characterId, self.cache_options(tag))
+        cached = None if self._defs_cache is None else self._defs_cache.get(key)
+        if cached is not None and cached.clean and tag.modified:
+            # the defs of characters using tag may be stale too
+            self.invalidate(tag.characterId)
+            cached = None
+        if cached is not None and cached.tag is tag:
+            for element in cached.elements:
+                self.defs_index.append(element)
+            self._geometry.restore(cached.geometry)
+            return
+
+        defs_start = self.defs_index.count
+        geometry_start = len(self._geometry)
+        # the filters, masks, gradients and patterns of the character are
+        # numbered on their own
+        counters = (self._id_prefix, self._num_filters, self._num_masks)
+        self._id_prefix = "c%d_" % tag.characterId
+        self._num_filters = self._num_masks = 0
+        self.shape_exporter.reset(self._id_prefix)
+        try:
+            export(tag)
+        finally:
+            self._id_prefix, self._num_filters, self._num_masks = counters
+            self.shape_exporter.reset()
+        if self._defs_cache is None:
+            return
+        dependencies = tag.get_dependencies()
+        dependencies.discard(tag.characterId)
+        self._defs_cache[key] = _CachedDefs(
+            tag, not tag.modified, self.defs_index.appended(defs_start),
+            self._geometry.added(geometry_start), dependencies)
+
+    def cache_options(self, tag):
+        """
+        Return the export options the defs of tag depend on, as a tuple
+        (part of the key of the defs cache). Mixins that export a tag
+        differently depending on their own options add them here.
+        """
+        options = (self.force_stroke,)
+        if isinstance(tag, TagDefineShape):
+            options += (tag.characterId in self._masked_shapes,)
+        elif isinstance(tag, TagDefineBits) and not isinstance(tag, TagDefineBitsJPEG2):
+            options += (self.jpegTables,)
+        return options
+
+    def invalidate(self, character_id=None):
+        """
+        Drop the cached defs of the character character_id and of the
+        characters depending on it, or of all characters if None.
+        """
+        if self._defs_cache is None:
+            return
+        if character_id is None:
+            self._defs_cache.clear()
+            return
+        ids = set([character_id])
+        while True:
+            stale = [key for key, cached in self._defs_cache.items()
+                     if key[0] in ids or cached.dependencies & ids]
+            if len(stale) == 0:
+                break
+            for key in stale:
+                ids.add(key[0])
+                del self._defs_cache[key]
+
+    def export_display_list(self, tags, parent=None):
+        if self._sink is None or parent is not None:
+            return super(SVGExporter, self).export_display_list(tags, parent)
+        self.clip_depth = 0
+        for tag in tags:
+            self.export_display_list_item(tag, parent)
+            self._flush()
+
     def export_define_sprite(self, tag, parent=None):
         id = "c%d"%tag.characterId
         g = self._e.g(id=id)
-        self.defs.append(g)
+        self.defs_index.append(g)
         self.clip_depth = 0
+        self._sprite_items = self._geometry.add_container(id)
         super(SVGExporter, self).export_define_sprite(tag, g)
+        self._sprite_items = None
 
     def export_define_font(self, tag):
         fontInfo = self.fontInfos[tag.characterId]
@@ -595,7 +864,7 @@ class SVGExporter(BaseExporter):
 
                 defs.append(path)
 
-        self.defs.append(defs)
+        self.defs_index.append(defs)
 
     def export_define_text(self, tag):
         g = self._e.g(id="c{0}".format(int(tag.characterId)))
@@ -662,14 +931,19 @@ class SVGExporter(BaseExporter):
 
                 g.append(text)
 
-        self.defs.append(g)
+        self.defs_index.append(g)
+        self._geometry.add_container(g.get("id"))
 
     def export_define_shape(self, tag):
         self.shape_exporter.force_stroke = self.force_stroke
         super(SVGExporter, self).export_define_shape(tag)
         shape = self.shape_exporter.g
         shape.set("id", "c%d" % tag.characterId)
-        self.defs.append(shape)
+        if tag.characterId in self._masked_shapes:
+            # make sure the mask is completely filled white
+            self._fill_mask(shape.getchildren())
+        self.defs_index.append(shape)
+        self._geometry.add_shape(shape.get("id"), tag.shape_bounds)
 
     @classmethod
     def translate_blend_mode(cls, mode):
@@ -698,13 +972,9 @@ class SVGExporter(BaseExporter):
             use.set("transform", _swf_matrix_to_svg_matrix(tag.matrix))
         if tag.hasClipDepth:
             self._num_masks += 1
-            self.mask_id = "mask%d" % self._num_masks
+            self.mask_id = "%smask%d" % (self._id_prefix, self._num_masks)
             self.clip_depth = tag.clipDepth
             g = self._e.mask(id=self.mask_id)
-            # make sure the mask is completely filled white
-            paths = self.defs.xpath("./svg:g[@id='c%d']/svg:path" % tag.characterId, namespaces=NS)
-            for path in paths:
-                path.set("fill", "#ffffff")
         elif tag.depth <= self.clip_depth and self.mask_id is not None:
             g.set("mask", "url(#%s)" % self.mask_id)
 
@@ -714,7 +984,7 @@ class SVGExporter(BaseExporter):
         filters = []
         filter_cxform = None
         self._num_filters += 1
-        filter_id = "filter%d" % self._num_filters
+        filter_id = "%sfilter%d" % (self._id_prefix, self._num_filters)
         svg_filter = self._e.filter(id=filter_id)
 
         if tag.hasColorTransform:
@@ -726,14 +996,18 @@ class SVGExporter(BaseExporter):
             if len(f) > 0:
                 filters.extend(f)
         if tag.hasColorTransform or (tag.hasFilterList and len(filters) > 0):
-            self.defs.append(svg_filter)
+            self.defs_index.append(svg_filter)
             use.set("filter", "url(#%s)" % filter_id)
 
         use.set(XLINK_HREF, "#c%s" % tag.characterId)
         g.append(use)
+        items = self._geometry.root if parent is None else self._sprite_items
+        if items is not None:
+            matrix = _swf_matrix_to_matrix(tag.matrix) if tag.hasMatrix else None
+            items.append((matrix, "c%s" % tag.characterId))
 
         if is_mask:
-            self.defs.append(g)
+            self.defs_index.append(g)
         else:
             if parent is not None:
                 parent.append(g)
@@ -741,6 +1015,10 @@ class SVGExporter(BaseExporter):
                 self.root.append(g)
         return use
 
+    def _fill_mask(self, paths):
+        for path in paths:
+            path.set("fill", "#ffffff")
+
     def export_color_transform(self, cxform, svg_filter, result='color-xform'):
         fe_cxform = self._e.feColorMatrix()
         fe_cxform.set("in", "SourceGraphic")
@@ -839,7 +1117,7 @@ class SVGExporter(BaseExporter):
             img.set("width", "%s" % str(image.size[0]))
             img.set("height", "%s" % str(image.size[1]))
             img.set(XLINK_HREF, "%s" % data_url)
-            self.defs.append(img)
+            self.defs_index.append(img)
 
 class SingleShapeSVGExporter(SVGExporter):
     """
@@ -909,38 +1187,55 @@ class SingleShapeSVGExporterMixin(object):
         return super(SingleShapeSVGExporterMixin, self).export(stunt_swf, **export_opts)
 
 class FrameSVGExporterMixin(object):
+    """
+    Exports a frame of a SWF. Sprites show the same frame (or their last
+    one). The display lists are played with a TimelinePlayer per timeline,
+    kept between exports of the same SWF, so exporting the frames in order
+    plays each timeline once.
+    """
     def export(self, swf, frame, **export_opts):
         """ Exports a frame of the specified SWF to SVG.
 
         @param swf   The SWF.
         @param frame Which frame to export, by 0-based index (int)
         """
+        if getattr(self, '_timeline', None) is not swf.tags:
+            self._timeline = swf.tags
+            self._players = {}
         self.wanted_frame = frame
-        return super(FrameSVGExporterMixin, self).export(swf, *export_opts)
+        return super(FrameSVGExporterMixin, self).export(swf, **export_opts)
+
+    def export_frames(self, swf, **export_opts):
+        """ Exports every frame of the specified SWF to SVG, in one pass.
+
+        Generator for what export returns for each frame.
+
+        @param swf   The SWF.
+        """
+        for frame in range(TimelinePlayer(swf.tags).frame_count):
+            yield self.export(swf, frame, **export_opts)
+
+    def cache_options(self, tag):
+        options = super(FrameSVGExporterMixin, self).cache_options(tag)
+        if isinstance(tag, SWFTimelineContainer):
+            # the frames from the one the display list of the sprite last
+            # changed in on look the same
+            player = self._player(tag.tags)
+            player.seek(self.wanted_frame)
+            options += (player.changed,)
+        return options
 
     def get_display_tags(self, tags, z_sorted=True):
+        # DisplayObjects, sorted by depth
+        return list(self._player(tags).seek(self.wanted_frame))
 
-        current_frame = 0
-        frame_tags = dict() # keys are depths, values are placeobject tags
-        for tag in tags:
-            if isinstance(tag, TagShowFrame):
-                if current_frame == self.wanted_frame:
-                    break
-                current_frame += 1
-            elif isinstance(tag, TagPlaceObject):
-                if tag.hasMove:
-                    orig_tag = frame_tags.pop(tag.depth)
-
-                    if not tag.hasCharacter:
-                        tag.characterId = orig_tag.characterId
-                    # this is for NamesSVGExporterMixin
-                    if not tag.hasName:
-                        tag.instanceName = orig_tag.instanceName
-                frame_tags[tag.depth] = tag
-            elif isinstance(tag, TagRemoveObject):
-                del frame_tags[tag.depth]
-
-        return super(FrameSVGExporterMixin, self).get_display_tags(frame_tags.values(), z_sorted)
+    def _player(self, tags):
+        """ The TimelinePlayer of tags """
+        timeline = self._players.get(id(tags))
+        if timeline is None or timeline[0] is not tags or timeline[1] != len(tags):
+            timeline = (tags, len(tags), TimelinePlayer(tags))
+            self._players[id(tags)] = timeline
+        return timeline[2]
 
 class NamesSVGExporterMixin(object):
     '''
@@ -1027,6 +1322,10 @@ class SVGBounds(object):
         self._matrix = self._calc_combined_matrix()
         if svg is not None:
             self._svg = svg;
+            # the groups in defs by id, first one wins
+            self._groups = {}
+            for g in svg.xpath("./svg:defs//svg:g[@id]", namespaces=NS):
+                self._groups.setdefault(g.get("id"), g)
             self._parse(svg)
 
     def add_point(self, x, y):
@@ -1081,10 +1380,9 @@ class SVGBounds(object):
             href = element.get(XLINK_HREF)
             if href:
                 href = href.replace("#", "")
-                els = self._svg.xpath("./svg:defs//svg:g[@id='%s']" % href,
-                        namespaces=NS)
-                if len(els) > 0:
-                    self._parse(els[0])
+                g = self._groups.get(href)
+                if g is not None:
+                    self._parse(g)
 
         for child in element.getchildren():
             if child.tag == "{%s}defs" % SVG_NS: continue
@@ -1132,6 +1430,96 @@ class SVGBounds(object):
         self._stack.append(self._build_matrix(transform))
         self._matrix = self._calc_combined_matrix()
 
+class DisplayListGeometry(object):
+    """
+    The geometry of an SVG export: the bounds of every shape, and the
+    placements (matrix and href id) of the root display list and of
+    every sprite, keyed by the id of the defs element.
+
+    bounds() computes the bounds of the root display list without
+    reading the SVG back: the ShapeBounds rectangle of each shape, which
+    includes its strokes, is transformed by the chain of placement
+    matrices leading to it. The first element defined with an id is the
+    one used.
+    """
+    def __init__(self):
+        self.root = []
+        self._characters = {}
+        # the ids of _characters in the order they were added
+        self._ids = []
+        self._leaves = {}
+
+    def __len__(self):
+        return len(self._ids)
+
+    def add_shape(self, id, rect):
+        """ Add the shape element id with its bounds (a SWFRectangle in twips) """
+        if id not in self._characters:
+            extent = (float(rect.xmin) / PIXELS_PER_TWIP, float(rect.ymin) / PIXELS_PER_TWIP,
+                      float(rect.xmax) / PIXELS_PER_TWIP, float(rect.ymax) / PIXELS_PER_TWIP)
+            self._characters[id] = (extent, None)
+            self._ids.append(id)
+            self._leaves.clear()
+
+    def add_container(self, id):
+        """
+        Add the sprite or text element id. Returns the list to append
+        its (matrix, href id) placements to.
+        """
+        items = []
+        if id not in self._characters:
+            self._characters[id] = (None, items)
+            self._ids.append(id)
+            self._leaves.clear()
+        return items
+
+    def added(self, start):
+        """ Return (id, geometry) of the elements added after the first start, for restore """
+        return [(id, self._characters[id]) for id in self._ids[start:]]
+
+    def restore(self, added):
+        """ Add the elements returned by added (of another geometry) """
+        for id, character in added:
+            if id not in self._characters:
+                self._characters[id] = character
+                self._ids.append(id)
+        self._leaves.clear()
+
+    def leaves(self, id):
+        """
+        Return the geometry of element id as a list of (matrices, shape id):
+        each shape below id and the placement matrices leading to it,
+        outermost first. Memoised per id.
+        """
+        leaves = self._leaves.get(id)
+        if leaves is None:
+            # guards against sprites placing themselves
+            self._leaves[id] = []
+            extent, items = self._characters.get(id, (None, None))
+            leaves = []
+            if extent is not None:
+                leaves.append(((), id))
+            for matrix, href in items or ():
+                prefix = () if matrix is None else (matrix,)
+                for matrices, shape_id in self.leaves(href):
+                    leaves.append((prefix + matrices, shape_id))
+            self._leaves[id] = leaves
+        return leaves
+
+    def bounds(self):
+        """ Return the SVGBounds of the root display list """
+        bounds = SVGBounds()
+        for matrix, href in self.root:
+            prefix = () if matrix is None else (matrix,)
+            for matrices, shape_id in self.leaves(href):
+                m = Matrix2()
+                for values in prefix + matrices:
+                    m.append(*[float(v) for v in values])
+                minx, miny, maxx, maxy = self._characters[shape_id][0]
+                for point in ((minx, miny), (maxx, miny), (minx, maxy), (maxx, maxy)):
+                    bounds.add_point(*m.multiply_point(point))
+        return bounds
+
 def _encode_jpeg(data):
     return b"data:image/jpeg;base64," + base64.encodebytes(data)[:-1]
 
@@ -2,11 +2,14 @@
 SWF
 """
 from __future__ import absolute_import
-from .tag import SWFTimelineContainer
-from .stream import SWFStream
+from .tag import SWFTimelineContainer, SWFTagIndex, TagFactory, TagDefineBits, TagJPEGTables, LazyTag, _keep_raw
+from .stream import SWFStream, SWFMemoryStream, SWFDecompressStream, SWFInflateStream, SWFWriter
 from .export import SVGExporter
+from six import string_types
 from six.moves import cStringIO
-from io import BytesIO
+from io import BytesIO, UnsupportedOperation
+import struct
+import zlib
 
 class SWFHeaderException(Exception):
     """ Exception raised in case of an invalid SWFHeader """
@@ -80,6 +83,18 @@ class SWFHeader(object):
             "       FrameRate: %d\n" % self.frame_rate + \
             "       FrameCount: %d\n" % self.frame_count
 
+def _lzma_compress(body):
+    """ Returns the LZMA properties and compressed stream of body """
+    try:
+        import lzma
+    except ImportError:
+        import pylzma
+        compressed = pylzma.compress(body)
+        return compressed[:5], compressed[5:]
+    compressed = lzma.compress(body, format=lzma.FORMAT_ALONE)
+    # the .lzma header is the 5 property bytes and the 8 byte size
+    return compressed[:5], compressed[13:]
+
 class SWF(SWFTimelineContainer):
     """
     SWF class
@@ -91,13 +106,61 @@ class SWF(SWFTimelineContainer):
     editors.
     
     @param file: a file object with read(), seek(), tell() methods.
+    @param use_mmap: memory map uncompressed (FWS) files instead of
+                     reading them; tag payloads then stay in the mapping
+                     until they are accessed (see swf.tag.TagPayload).
+                     The mapping stays open until close() is called.
+                     Files without a fileno() (e.g. BytesIO) are read
+                     as usual.
+    @param streaming: compressed (CWS/ZWS) bodies are always parsed while
+                      they are inflated in chunks (see
+                      swf.stream.SWFInflateStream), keeping only the
+                      current chunk and tag besides the parsed tags.
+                      Bytes read again later (by save, Tag.raw_bytes or
+                      tag_index) are inflated again from the file, which
+                      has to stay open; with streaming the file isn't
+                      read again, and save encodes all tags. lazy and
+                      index_only read the body out of order, so it is
+                      inflated whole (as it is read with streaming).
+    @param lazy: only index the tags and parse each one when it is first
+                 used (see swf.tag.LazyTag). The file must stay open.
+    @param include_types, exclude_types, keep_skipped: only parse some
+                 tags; see SWFTimelineContainer.parse_tags.
+    @param unknown_tags: 'skip', 'raw' or 'raise'; see
+                 SWFTimelineContainer.parse_tags.
+    @param index_only: don't parse any tags, only build the tag_index;
+                 use load_tag/load_symbol to parse what is needed.
+    @param cache_dir: directory (or swf.cache.SWFCache) of a parse cache;
+                 a SWF that was parsed before with the same options is
+                 loaded from there instead. tag_index and load_tag are not
+                 available on SWFs loaded from the cache. Not available
+                 with lazy; ignored with index_only.
+    @param workers: parse shapes, fonts and bitmaps in a pool of this many
+                 processes, made for this parse; see
+                 SWFTimelineContainer.parse_tags.
+    @param executor: a concurrent.futures process pool to parse them in
+                 instead, e.g. one shared by the parses of many files.
     """
-    def __init__(self, file=None):
+    def __init__(self, file=None, use_mmap=False, streaming=False, lazy=False,
+                 include_types=None, exclude_types=None, keep_skipped=False,
+                 unknown_tags='skip', index_only=False, cache_dir=None,
+                 workers=None, executor=None):
         super(SWF, self).__init__()
         self._data = None if file is None else SWFStream(file)
         self._header = None
+        self._body = None
+        self._tag_index = None
+        self._loaded_tags = {}
+        self._raw_source = None
+        self._header_span = None
+        self._body_released = False
+        self._mmap = None
         if self._data is not None:
-            self.parse(self._data)
+            self.parse(self._data, use_mmap=use_mmap, streaming=streaming, lazy=lazy,
+                include_types=include_types, exclude_types=exclude_types,
+                keep_skipped=keep_skipped, unknown_tags=unknown_tags,
+                index_only=index_only, cache_dir=cache_dir, workers=workers,
+                executor=executor)
     
     @property
     def data(self):
@@ -110,6 +173,114 @@ class SWF(SWFTimelineContainer):
     def header(self):
         """ Return the SWFHeader """
         return self._header
+
+    @property
+    def tag_index(self):
+        """
+        Return the SWFTagIndex of all tags (including those inside
+        sprites), built from the tag headers on first use. Offsets are
+        positions in the uncompressed SWF: file positions for FWS files,
+        and, for compressed files, positions in the inflated body plus
+        the 8 bytes of the header in front of it. After parsing a
+        compressed file, which doesn't keep the body, it is inflated
+        again from the file.
+        """
+        if self._tag_index is None:
+            self._tag_index = self._build_tag_index()
+        return self._tag_index
+
+    def _build_tag_index(self):
+        if self._body is None:
+            raise Exception("This SWF was not loaded! (no data)")
+        data = self._body
+        if self._body_released:
+            # the body was dropped as it was parsed: inflate it again,
+            # keeping it for load_tag this time
+            if data.can_reread:
+                data = data.body()
+            else:
+                self._data.f.seek(8)
+                data = self._stream_body()
+            self._body = data
+            self._body_released = False
+        pos = data.tell()
+        data.seek(self._tags_start)
+        end = self._get_file_length(data, self._tags_start)
+        index = SWFTagIndex(self._body_base()).scan(data, end)
+        data.seek(pos)
+        return index
+
+    def _body_base(self):
+        """ The position in the uncompressed SWF of the start of the body stream """
+        return 8 if self._header.compressed else 0
+
+    def _stream_body(self):
+        """
+        A stream inflating the compressed body of the file (positioned
+        after the 8 byte header) as it is read
+        """
+        return SWFStream(SWFDecompressStream(self._data.f,
+            lzma=self._header.compressed_lzma,
+            length=self._header.file_length - 8))
+
+    def load_tag(self, character_id):
+        """
+        Parse and return just the tag defining character_id, using the
+        tag_index to find it. Loaded tags are cached.
+        """
+        tag = self._loaded_tags.get(character_id)
+        if tag is None:
+            entry = self.tag_index.by_character_id.get(character_id)
+            if entry is None:
+                raise ValueError("character %d not found" % character_id)
+            tag = self._loaded_tags[character_id] = self._load_entry(entry)
+        return tag
+
+    def load_symbol(self, character_id):
+        """
+        Return a SWF holding only the definition of character_id and the
+        definitions it depends on (in file order), parsed through
+        load_tag. It can be handed to an exporter, e.g. one using
+        swf.export.SingleShapeSVGExporterMixin.
+        """
+        index = self.tag_index
+        tags = {}
+        todo = [character_id]
+        while todo:
+            cid = todo.pop()
+            if cid in tags or cid not in index.by_character_id:
+                continue
+            tags[cid] = tag = self.load_tag(cid)
+            todo.extend(tag.get_dependencies())
+        if character_id not in tags:
+            raise ValueError("character %d not found" % character_id)
+        symbol = SWF()
+        symbol._header = self._header
+        symbol._data = self._data
+        symbol._raw_source = self._raw_source
+        symbol._header_span = self._header_span
+        symbol.tags = [tags[cid] for cid in sorted(tags, key=lambda cid: index.by_character_id[cid].offset)]
+        if any(t.type == TagDefineBits.TYPE for t in symbol.tags):
+            for entry in index.entries_of_type(TagJPEGTables.TYPE):
+                symbol.tags.insert(0, self._load_entry(entry))
+                break
+        return symbol
+
+    def _load_entry(self, entry):
+        """ Parse the tag of the SWFTagIndexEntry entry """
+        data = self._body
+        base = self._body_base()
+        pos = data.tell()
+        data.seek(entry.content_offset - base)
+        data.reset_bits_pending()
+        tag = TagFactory.create(entry.type)
+        if isinstance(tag, SWFTimelineContainer):
+            # other entries may be loaded later on
+            tag._parse_opts = dict(self._parse_opts, release=False)
+        tag.parse(data, entry.content_length, tag.version)
+        _keep_raw(tag, data, entry.offset - base, entry.length, entry.content_offset - entry.offset)
+        data.seek(pos)
+        return tag
         
     def export(self, exporter=None, force_stroke=False):
         """
@@ -130,36 +301,201 @@ class SWF(SWFTimelineContainer):
             raise Exception("This SWF doesn't contain any tags!")
         return exporter.export(self, force_stroke)
             
-    def parse_file(self, filename):
-        """ Parses the SWF from a filename """
-        self.parse(open(filename, 'rb'))
+    def asset_fingerprints(self):
+        """
+        Return {characterId: fingerprint} of the definition tags, hashes
+        of their content that don't depend on characterIds; see
+        swf.assets.asset_fingerprints and swf.assets.SWFAssetIndex.
+        """
+        from .assets import asset_fingerprints
+        return asset_fingerprints(self)
+
+    def save(self, file, compression=None, check=False):
+        """
+        Writes this SWF.
+
+        Tags that weren't modified since parsing (see Tag.modified) are
+        copied from the parsed file as they are, the others are
+        encoded with Tag.publish. The header takes the version, frame
+        size, rate and count of the parsed header. SWFs parsed with
+        streaming from a compressed file, or loaded from a cache, have
+        nothing to copy from, so all their tags are encoded.
+
+        Not all tag types can be encoded yet (shapes, fonts, texts,
+        buttons, morph shapes and actions can't, see Tag.publishable).
+        If such tags are modified, NotImplementedError is raised before
+        anything is written.
+
+        Changes made in place (e.g. to a matrix or to the records of a
+        tag) need Tag.mark_modified. With check, save looks for those
+        of the tags that can be encoded itself, at the cost of parsing
+        and encoding again the tags it would copy (see
+        Tag.changed_in_place); unmodified tags are plain byte copies
+        otherwise.
+
+        @param file: a file object with a write() method, or a filename.
+        @param compression: 'none' (FWS), 'zlib' (CWS) or 'lzma' (ZWS);
+                            by default the compression of the parsed file.
+        @param check: look for tags changed in place without mark_modified.
+        """
+        if isinstance(file, string_types):
+            with open(file, 'wb') as f:
+                return self.save(f, compression, check)
+        header = self._header
+        if header is None:
+            raise Exception("This SWF was not loaded! (no header)")
+        if check:
+            self.mark_changed_in_place()
+        unpublishable = list(self.unpublishable_tags())
+        if unpublishable:
+            raise NotImplementedError("can't write the modified tags %s" %
+                                      ", ".join(str(t) for t in unpublishable))
+        if compression is None:
+            compression = 'zlib' if header.compressed_zlib else \
+                'lzma' if header.compressed_lzma else 'none'
+        body = SWFWriter(source=self._raw_source)
+        if self._raw_source is not None:
+            body.write(self._raw_source.read_at(*self._header_span))
+        else:
+            body.writeRECT(header.frame_size)
+            body.writeFIXED8(header.frame_rate)
+            body.writeUI16(header.frame_count)
+        self.publish_tags(body)
+        body = body.getvalue()
+        length = struct.pack('<I', len(body) + 8)
+        if compression == 'none':
+            file.write(b'FWS' + struct.pack('<B', header.version) + length)
+            file.write(body)
+        elif compression == 'zlib':
+            file.write(b'CWS' + struct.pack('<B', header.version) + length)
+            file.write(zlib.compress(body))
+        elif compression == 'lzma':
+            props, compressed = _lzma_compress(body)
+            file.write(b'ZWS' + struct.pack('<B', header.version) + length)
+            file.write(struct.pack('<I', len(compressed)) + props)
+            file.write(compressed)
+        else:
+            raise ValueError("unknown compression %r" % (compression,))
+
+    def close(self):
+        """
+        Closes the file the SWF was parsed from and, with use_mmap, the
+        memory mapping. Payloads still in the mapping are copied and
+        lazy tags are parsed first, so the tags stay usable; as their
+        bytes can't be read again, save them before closing.
+        """
+        if self._mmap is not None:
+            tags = list(self.tags) + list(self._loaded_tags.values())
+            while tags:
+                tag = tags.pop()
+                if isinstance(tag, LazyTag):
+                    LazyTag._materialize(tag)
+                d = tag.__dict__
+                d.pop('_raw', None)
+                d.pop('_raw_tags', None)
+                for key, value in list(d.items()):
+                    if isinstance(value, memoryview):
+                        d[key] = value.tobytes()
+                tags.extend(d.get('tags', ()))
+            self._body.close()
+            self._body = self._raw_source = None
+            self._mmap.close()
+            self._mmap = None
+        if self._data is not None:
+            self._data.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def parse_file(self, filename, **options):
+        """ Parses the SWF from a filename (see parse for the options) """
+        self.parse(open(filename, 'rb'), **options)
         
-    def parse(self, data):
+    def parse(self, data, use_mmap=False, streaming=False, lazy=False,
+              include_types=None, exclude_types=None, keep_skipped=False,
+              unknown_tags='skip', index_only=False, cache_dir=None,
+              workers=None, executor=None):
         """ 
         Parses the SWF.
         
         The @data parameter can be a file object or a SWFStream
         """
         self._data = data = data if isinstance(data, SWFStream) else SWFStream(data)
+        cache = None
+        if cache_dir is not None and not index_only:
+            if lazy:
+                # storing lazy tags would parse them all
+                raise ValueError("a parse cache can't be used with lazy parsing")
+            from .cache import SWFCache
+            cache = cache_dir if isinstance(cache_dir, SWFCache) else SWFCache(cache_dir)
+            cache_key = cache.key(data, dict(include_types=include_types,
+                exclude_types=exclude_types, keep_skipped=keep_skipped,
+                unknown_tags=unknown_tags))
+            cached = cache.get(cache_key)
+            if cached is not None:
+                self._header, self.tags = cached
+                self._body = None
+                self._raw_source = None
+                self._tag_index = None
+                self._loaded_tags = {}
+                return
         self._header = SWFHeader(self._data)
-        if self._header.compressed:
-            temp = BytesIO()
-            if self._header.compressed_zlib:
-                import zlib
-                data = data.f.read()
-                zip = zlib.decompressobj()
-                temp.write(zip.decompress(data))
+        header_start = 8
+        fileno = None
+        if use_mmap and not self._header.compressed:
+            try:
+                fileno = data.f.fileno()
+            except (AttributeError, UnsupportedOperation):
+                # not a real file: read it as usual
+                pass
+        if fileno is not None:
+            import mmap
+            pos = data.tell()
+            self._mmap = mmap.mmap(fileno, 0, access=mmap.ACCESS_READ)
+            data = SWFMemoryStream(self._mmap, zero_copy=True)
+            data.seek(pos)
+        elif self._header.compressed:
+            if lazy or index_only:
+                # tags are read out of order, so the whole body is kept:
+                # inflated up front, which parses a lot faster than going
+                # through a file object, or as it is read when streaming
+                data = self._stream_body()
+                if not streaming:
+                    data = SWFMemoryStream(data.read())
             else:
-                import pylzma
-                data.readUI32() #consume compressed length
-                data = data.f.read()
-                temp.write(pylzma.decompress(data))
-            temp.seek(0)
-            data = SWFStream(temp)
+                data = SWFInflateStream(data.f, lzma=self._header.compressed_lzma,
+                    length=self._header.file_length - 8, reread=not streaming)
+            header_start = data.tell()
             self._header._frame_size = data.readRECT()
             self._header._frame_rate = data.readFIXED8()
             self._header._frame_count = data.readUI16()
-        self.parse_tags(data)
+        self._body = data
+        self._tags_start = data.tell()
+        # a streamed body can't be read again for SWF.save
+        self._raw_source = data if data.can_reread else None
+        self._header_span = (header_start, self._tags_start - header_start)
+        self._body_released = isinstance(data, SWFInflateStream)
+        self._tag_index = None
+        self._loaded_tags = {}
+        if index_only:
+            self._tag_index = self._build_tag_index()
+        else:
+            pool = None
+            if executor is None and workers is not None and workers > 1 and not lazy:
+                from concurrent.futures import ProcessPoolExecutor
+                executor = pool = ProcessPoolExecutor(max_workers=workers)
+            try:
+                self.parse_tags(data, executor=executor, lazy=lazy,
+                    include_types=include_types, exclude_types=exclude_types,
+                    keep_skipped=keep_skipped, unknown_tags=unknown_tags)
+            finally:
+                if pool is not None:
+                    pool.shutdown()
+            if cache is not None:
+                cache.put(cache_key, self._header, self.tags)
         
     def __str__(self):
         s = "[SWF]\n"
@@ -1,11 +1,45 @@
 from __future__ import absolute_import
-import struct, math
+import struct, math, sys
+from array import array
 from .data import *
 from .actions import *
 from .filters import SWFFilterFactory
+from six import indexbytes, text_type
+from binascii import hexlify, unhexlify
+from io import BytesIO
 from six.moves import range
 from functools import reduce
 
+_SI8 = struct.Struct('<b')
+_UI8 = struct.Struct('<B')
+_SI16 = struct.Struct('<h')
+_UI16 = struct.Struct('<H')
+_SI32 = struct.Struct('<i')
+_UI32 = struct.Struct('<I')
+_UI64 = struct.Struct('<Q')
+_UI64_BE = struct.Struct('>Q')
+_FLOAT = struct.Struct('<f')
+
+# read_bitfields decodes runs of more fields than this through _read_bitfield_run
+_BITFIELD_RUN = 16
+# bits decoded per big integer in _read_bitfield_run
+_BITFIELD_WINDOW = 4096
+
+# bytes per value of the read_array typecodes
+_ARRAY_SIZES = {'B': 1, 'b': 1, 'H': 2, 'h': 2, 'I': 4, 'i': 4}
+
+def _unpack_array(typecode, buf, offset, count):
+    """ Decode count little-endian typecode values of buf at offset into an array """
+    values = array(typecode)
+    size = _ARRAY_SIZES[typecode]
+    if values.itemsize == size and hasattr(values, 'frombytes'):
+        values.frombytes(buf[offset:offset + size * count])
+        if sys.byteorder == 'big':
+            values.byteswap()
+    else:
+        values.fromlist(list(struct.unpack_from('<%d%s' % (count, typecode), buf, offset)))
+    return values
+
 class SWFStream(object):
     """
     SWF File stream
@@ -116,6 +150,51 @@ class SWFStream(object):
     def readUB(self, bits):
         """ Read a unsigned int using the specified number of bits """
         return self.readbits(bits)
+
+    def read_payload(self, count):
+        """
+        Read count bytes of tag payload.
+        Memory streams in zero copy mode return a memoryview instead.
+        """
+        return self.read(count)
+
+    def release(self, pos):
+        """
+        Tell the underlying file that the bytes before pos won't be read
+        again (see SWFDecompressStream). A no-op for other files.
+        """
+        release = getattr(self.f, 'release', None)
+        if release is not None:
+            release(pos)
+
+    def ensure(self, end):
+        """
+        Tell the stream that the bytes up to end are about to be read
+        (see SWFInflateStream). A no-op for other streams.
+        """
+        pass
+
+    def read_bitfields(self, widths, signed=False):
+        """
+        Read a run of consecutive bit fields with the given widths.
+        Returns a list of unsigned ints, or signed ints if signed is True.
+        """
+        read = self.readSB if signed else self.readUB
+        return [read(bits) for bits in widths]
+
+    def read_array(self, typecode, count):
+        """
+        Read count byte aligned values of one type in one go, e.g. the
+        offset, code and advance tables of fonts.
+        typecode is 'B'/'b' (UI8/SI8), 'H'/'h' (UI16/SI16) or 'I'/'i'
+        (UI32/SI32). Returns an array.array of that typecode.
+        """
+        self.reset_bits_pending()
+        size = _ARRAY_SIZES[typecode] * count
+        raw = self.read(size)
+        if len(raw) < size:
+            raise EOFError
+        return _unpack_array(typecode, raw, 0, count)
             
     def readSI8(self):
         """ Read a signed byte """
@@ -137,6 +216,10 @@ class SWFStream(object):
         self.reset_bits_pending();
         return struct.unpack('H', self.f.read(2))[0]    
 
+    def readCharacterId(self):
+        """ Read the (UI16) id of another character """
+        return self.readUI16()
+
     def readSI32(self):
         """ Read a signed int """
         self.reset_bits_pending();
@@ -212,6 +295,19 @@ class SWFStream(object):
     def readGLYPHENTRY(self, glyphBits, advanceBits):
         """ Read a SWFGlyphEntry """
         return SWFGlyphEntry(self, glyphBits, advanceBits)
+
+    def readGLYPHENTRYs(self, count, glyphBits, advanceBits):
+        """ Read count SWFGlyphEntrys (one run of bit fields) """
+        fields = self.read_bitfields((glyphBits, advanceBits) * count)
+        sign = (1 << (advanceBits - 1)) if advanceBits else 0
+        out = []
+        for i in range(0, 2 * count, 2):
+            entry = SWFGlyphEntry()
+            entry.index = fields[i]
+            advance = fields[i + 1]
+            entry.advance = advance - (sign << 1) if advance & sign else advance
+            out.append(entry)
+        return out
         
     def readGRADIENT(self, level=1):
         """ Read a SWFGradient """
@@ -228,6 +324,22 @@ class SWFStream(object):
     def readKERNINGRECORD(self, wideCodes):
         """ Read a SWFKerningRecord """
         return SWFKerningRecord(self, wideCodes)
+
+    def readKERNINGRECORDs(self, count, wideCodes):
+        """ Read count SWFKerningRecords (a byte aligned run) """
+        self.reset_bits_pending()
+        record_format = 'HHh' if wideCodes else 'BBh'
+        size = struct.calcsize('<' + record_format) * count
+        raw = self.read(size)
+        if len(raw) < size:
+            raise EOFError
+        values = struct.unpack('<' + record_format * count, raw)
+        out = []
+        for i in range(0, 3 * count, 3):
+            record = SWFKerningRecord()
+            record.code1, record.code2, record.adjustment = values[i:i + 3]
+            out.append(record)
+        return out
         
     def readLANGCODE(self):
         """ Read a language code """
@@ -475,9 +587,25 @@ class SWFStream(object):
         """ Reset the bit array """
         self._bits_pending = 0
     
-    def read(self, count=0):
-        """ Read """
-        return self.f.read(count) if count > 0 else self.f.read()
+    def read(self, count=-1):
+        """ Read count bytes (or everything that is left when count < 0) """
+        return self.f.read(count)
+
+    @property
+    def can_reread(self):
+        """
+        Whether bytes that were read can be read again (see read_at);
+        not the case for compressed files parsed while streaming.
+        """
+        return not hasattr(self.f, 'release')
+
+    def read_at(self, pos, count):
+        """ Read count bytes at pos, leaving the current position as it is """
+        saved = self.tell()
+        self.seek(pos)
+        data = self.read(count)
+        self.seek(saved)
+        return data
         
     def seek(self, pos, whence=0):
         """ Seek """
@@ -487,6 +615,711 @@ class SWFStream(object):
         """ Tell """
         return self.f.tell()
         
+class SWFMemoryStream(SWFStream):
+    """
+    SWF stream over an in-memory buffer
+
+    Wraps a bytes-like object (bytes, bytearray, mmap, memoryview) and reads
+    it through an integer cursor and precompiled struct.Struct objects, so
+    the fixed size readers never create intermediate byte strings.
+    Provides the same read* interface as SWFStream.
+
+    Bit fields are served from a 64-bit accumulator that is refilled eight
+    bytes at a time and consumed with shifts and masks. Bytes that were
+    loaded into the accumulator but not consumed are handed back to the
+    cursor as soon as a byte aligned read (or tell/seek) happens.
+
+    With zero_copy set, read_payload returns memoryview slices of the
+    buffer, so large tag payloads (video, sound, bitmaps) stay in the
+    underlying buffer (e.g. an mmap) until a consumer asks for them.
+    """
+    def __init__(self, buf, zero_copy=False):
+        """ Initialize with a bytes-like object """
+        super(SWFMemoryStream, self).__init__(None)
+        self.buf = buf
+        self.zero_copy = zero_copy
+        self._view = memoryview(buf)
+        self._length = len(self._view)
+        self._pos = 0
+        self._acc = 0
+        self._acc_bits = 0
+
+    def close(self):
+        """ Closes the stream """
+        self._view = None
+        self.buf = None
+
+    def _refill(self, acc, nbits, bits):
+        """
+        Load whole bytes behind the nbits still unread in acc until at
+        least bits are available. Returns the new (acc, nbits).
+        """
+        acc &= (1 << nbits) - 1
+        pos = self._pos
+        if nbits == 0 and bits <= 64 and pos + 8 <= self._length:
+            self._pos = pos + 8
+            return _UI64_BE.unpack_from(self._view, pos)[0], 64
+        count = max((64 - nbits) >> 3, (bits - nbits + 7) >> 3)
+        count = min(count, self._length - pos)
+        if nbits + (count << 3) < bits:
+            raise EOFError
+        view = self._view
+        for i in range(pos, pos + count):
+            acc = acc << 8 | indexbytes(view, i)
+        self._pos = pos + count
+        return acc, nbits + (count << 3)
+
+    def readbits(self, bits):
+        """
+        Read the specified number of bits from the stream.
+        Returns 0 for bits == 0.
+        """
+        nbits = self._acc_bits
+        if nbits < bits:
+            self._acc, nbits = self._refill(self._acc, nbits, bits)
+        nbits -= bits
+        self._acc_bits = nbits
+        return (self._acc >> nbits) & ((1 << bits) - 1)
+
+    readUB = readbits
+
+    def readSB(self, bits):
+        """ Read a signed int using the specified number of bits """
+        value = self.readbits(bits)
+        if bits and value >> (bits - 1):
+            value -= 1 << bits
+        return value
+
+    def readFB(self, bits):
+        """ Read a float using the specified number of bits """
+        return self.readSB(bits) / 65536.0
+
+    def read_bitfields(self, widths, signed=False):
+        """
+        Read a run of consecutive bit fields with the given widths.
+        Returns a list of unsigned ints, or signed ints if signed is True.
+        """
+        if len(widths) > _BITFIELD_RUN:
+            return self._read_bitfield_run(widths, signed)
+        acc = self._acc
+        nbits = self._acc_bits
+        out = []
+        append = out.append
+        for bits in widths:
+            if nbits < bits:
+                acc, nbits = self._refill(acc, nbits, bits)
+            nbits -= bits
+            value = (acc >> nbits) & ((1 << bits) - 1)
+            if signed and bits and value >> (bits - 1):
+                value -= 1 << bits
+            append(value)
+        self._acc = acc
+        self._acc_bits = nbits
+        return out
+
+    def _read_bitfield_run(self, widths, signed):
+        """
+        read_bitfields for long runs (e.g. glyph entries): the bytes of
+        up to _BITFIELD_WINDOW bits are turned into one integer, which
+        the fields are shifted out of.
+        """
+        out = []
+        append = out.append
+        view = self._view
+        count = len(widths)
+        start = 0
+        while start < count:
+            end = start
+            total = 0
+            while end < count and total < _BITFIELD_WINDOW:
+                total += widths[end]
+                end += 1
+            nbits = self._acc_bits
+            pos = self._pos
+            size = max(0, (total - nbits + 7) >> 3)
+            if pos + size > self._length:
+                raise EOFError
+            value = self._acc & ((1 << nbits) - 1)
+            if size:
+                value = value << (size << 3) | int(hexlify(view[pos:pos + size].tobytes()), 16)
+            shift = nbits + (size << 3)
+            for i in range(start, end):
+                bits = widths[i]
+                shift -= bits
+                field = (value >> shift) & ((1 << bits) - 1)
+                if signed and bits and field >> (bits - 1):
+                    field -= 1 << bits
+                append(field)
+            self._pos = pos + size
+            self._acc = value & ((1 << shift) - 1)
+            self._acc_bits = shift
+            start = end
+        return out
+
+    def read_array(self, typecode, count):
+        """
+        Read count byte aligned values of one type in one go.
+        See SWFStream.read_array.
+        """
+        self.reset_bits_pending()
+        pos = self._pos
+        end = pos + _ARRAY_SIZES[typecode] * count
+        if end > self._length:
+            raise EOFError
+        self._pos = end
+        return _unpack_array(typecode, self._view, pos, count)
+
+    def reset_bits_pending(self):
+        """ Reset the bit array """
+        if self._acc_bits:
+            # give back the whole bytes read ahead into the accumulator
+            self._pos -= self._acc_bits >> 3
+            self._acc_bits = 0
+
+    def _unpack(self, st):
+        if self._acc_bits:
+            self.reset_bits_pending()
+        pos = self._pos
+        end = pos + st.size
+        if end > self._length:
+            raise EOFError
+        self._pos = end
+        return st.unpack_from(self._view, pos)[0]
+
+    def readSI8(self):
+        """ Read a signed byte """
+        return self._unpack(_SI8)
+
+    def readUI8(self):
+        """ Read a unsigned byte """
+        return self._unpack(_UI8)
+
+    def readSI16(self):
+        """ Read a signed short """
+        return self._unpack(_SI16)
+
+    def readUI16(self):
+        """ Read a unsigned short """
+        return self._unpack(_UI16)
+
+    def readSI32(self):
+        """ Read a signed int """
+        return self._unpack(_SI32)
+
+    def readUI32(self):
+        """ Read a unsigned int """
+        return self._unpack(_UI32)
+
+    def readUI64(self):
+        """ Read a uint64_t """
+        return self._unpack(_UI64)
+
+    def readFLOAT(self):
+        """ Read a float """
+        return self._unpack(_FLOAT)
+
+    def readString(self):
+        """ Read a string """
+        self.reset_bits_pending()
+        view = self._view
+        start = end = self._pos
+        while end < self._length and indexbytes(view, end) != 0:
+            end += 1
+        if end >= self._length:
+            raise EOFError
+        self._pos = end + 1
+        return view[start:end].tobytes().decode()
+
+    def readtag_header(self):
+        """ Read a tag header """
+        pos = self.tell()
+        tag_type_and_length = self._unpack(_UI16)
+        tag_length = tag_type_and_length & 0x003f
+        if tag_length == 0x3f:
+            tag_length = self._unpack(_SI32)
+        return SWFRecordHeader(tag_type_and_length >> 6, tag_length, self.tell() - pos)
+
+    def skip_bytes(self, length):
+        """ Skip over the specified number of bytes """
+        self.reset_bits_pending()
+        self._pos += length
+
+    def read(self, count=-1):
+        """ Read count bytes (or everything that is left when count < 0) """
+        self.reset_bits_pending()
+        start = self._pos
+        end = self._length if count < 0 else min(start + count, self._length)
+        self._pos = end
+        return self._view[start:end].tobytes()
+
+    def read_at(self, pos, count):
+        """
+        Return a memoryview of the count bytes at pos (not a copy),
+        leaving the current position as it is.
+        """
+        if pos + count > self._length:
+            raise EOFError
+        return self._view[pos:pos + count]
+
+    def read_payload(self, count):
+        """
+        Read count bytes of tag payload.
+        Returns a memoryview slice of the buffer in zero copy mode.
+        """
+        if not self.zero_copy:
+            return self.read(count)
+        self.reset_bits_pending()
+        start = self._pos
+        end = min(start + count, self._length)
+        self._pos = end
+        return self._view[start:end]
+
+    def seek(self, pos, whence=0):
+        """ Seek """
+        if whence == 1:
+            pos += self.tell()
+        elif whence == 2:
+            pos += self._length
+        self._pos = pos
+        self._acc_bits = 0
+
+    def tell(self):
+        """ Tell """
+        return self._pos - (self._acc_bits >> 3)
+
+class SWFInflateStream(SWFMemoryStream):
+    """
+    SWF stream over the compressed body of a CWS/ZWS file, inflated in
+    chunks while it is parsed
+
+    Only a window of the body is in memory: ensure() inflates (through
+    SWFDecompressStream) up to the end of the tag about to be parsed, and
+    the bytes before the position handed to release() are dropped when
+    the window moves on. Within the window it reads like SWFMemoryStream.
+    Positions are offsets in the uncompressed body.
+
+    With reread set and a seekable file, bytes outside the window can be
+    read again with read_at: the whole body is then inflated again from
+    the file (once), which has to stay open.
+
+    @param f: file object positioned after the 8 byte SWF header
+    @param lzma: True for 'ZWS' files, False for 'CWS'
+    @param length: the uncompressed body length (file length - 8)
+    """
+    def __init__(self, f, lzma=False, length=None, chunk_size=65536, reread=True):
+        self._file = f
+        self._lzma = lzma
+        self._start = f.tell() if reread else None
+        self._source = SWFDecompressStream(f, lzma=lzma, length=length, chunk_size=chunk_size)
+        self._chunk_size = chunk_size
+        self._base = 0
+        self._released = 0
+        self._body = None
+        super(SWFInflateStream, self).__init__(b'')
+        self.ensure(chunk_size)
+
+    @property
+    def can_reread(self):
+        if self._start is None:
+            return False
+        seekable = getattr(self._file, 'seekable', None)
+        return seekable is None or seekable()
+
+    def ensure(self, end):
+        """ Inflate the body up to end (or its end) into the window """
+        missing = end - self._base - self._length
+        if missing <= 0:
+            return
+        data = self._source.read(max(missing, self._chunk_size))
+        self._source.release(self._source.tell())
+        # keep what wasn't released, and the bytes read ahead into the
+        # bit accumulator
+        end = self._base + self._length
+        keep = max(min(self._released, self._base + self._pos - (self._acc_bits >> 3), end), self._base)
+        start = keep - self._base
+        self.buf = self._view[start:].tobytes() + data
+        self._view = memoryview(self.buf)
+        self._length = len(self.buf)
+        self._pos -= start
+        self._base = keep
+
+    def release(self, pos):
+        """ The bytes before pos aren't read again from the window """
+        self._released = max(self._released, pos)
+
+    def body(self):
+        """ A SWFMemoryStream of the whole body, inflated again from the file """
+        if self._body is None:
+            if not self.can_reread:
+                raise IOError("the body can't be read again")
+            self._file.seek(self._start)
+            body = SWFDecompressStream(self._file, lzma=self._lzma, length=self._source.length)
+            self._body = SWFMemoryStream(body.read())
+        return self._body
+
+    def read_at(self, pos, count):
+        """
+        Return a memoryview of the count bytes at pos (not a copy),
+        leaving the current position as it is.
+        """
+        if pos >= self._base and pos + count <= self._base + self._length:
+            return self._view[pos - self._base:pos - self._base + count]
+        return self.body().read_at(pos, count)
+
+    def seek(self, pos, whence=0):
+        """ Seek (not before the window) """
+        if whence == 1:
+            pos += self.tell()
+        elif whence == 2:
+            pos += self._source.length
+        if pos < self._base:
+            raise IOError("cannot seek to %d, data before %d was released" % (pos, self._base))
+        self._pos = pos - self._base
+        self._acc_bits = 0
+
+    def tell(self):
+        """ Tell """
+        return self._base + self._pos - (self._acc_bits >> 3)
+
+class SWFDecompressStream(object):
+    """
+    Read-only file object over the compressed body of a CWS/ZWS file
+
+    Inflates the compressed file in chunks of chunk_size as bytes are
+    read, so parsing starts on the first chunk and the compressed file is
+    never held in memory as a whole. Decompressed bytes are kept until
+    release() is called, after which seeking before the released position
+    fails.
+
+    @param f: file object positioned after the 8 byte SWF header
+    @param lzma: True for 'ZWS' files, False for 'CWS'
+    @param length: the uncompressed body length (file length - 8)
+    """
+    def __init__(self, f, lzma=False, length=None, chunk_size=65536):
+        self.f = f
+        self.length = length
+        self.chunk_size = chunk_size
+        self._buf = bytearray()
+        self._base = 0
+        self._pos = 0
+        self._eof = False
+        if lzma:
+            self._inflate = self._lzma_inflater()
+        else:
+            import zlib
+            self._inflate = self._zlib_inflater(zlib.decompressobj())
+
+    def _zlib_inflater(self, z):
+        def inflate():
+            while True:
+                data = z.unconsumed_tail or self.f.read(self.chunk_size)
+                if not data:
+                    return z.flush()
+                out = z.decompress(data, self.chunk_size)
+                if out:
+                    return out
+        return inflate
+
+    def _lzma_inflater(self):
+        # ZWS: UI32 compressed length, 5 bytes of LZMA properties, LZMA data
+        self.f.read(4)
+        props = self.f.read(5)
+        try:
+            import lzma
+        except ImportError:
+            import pylzma
+            d = pylzma.decompressobj()
+            pending = [props]
+            def inflate():
+                while True:
+                    data = self.f.read(self.chunk_size)
+                    if not data:
+                        return d.flush()
+                    out = d.decompress(b''.join(pending) + data)
+                    del pending[:]
+                    if out:
+                        return out
+            return inflate
+        # .lzma ('alone') header: the properties followed by the UI64 size
+        size = self.length if self.length is not None else (1 << 64) - 1
+        d = lzma.LZMADecompressor(format=lzma.FORMAT_ALONE)
+        pending = [props + struct.pack('<Q', size)]
+        def inflate():
+            # stop at the known size: liblzma rejects an end marker that
+            # is fed to it after the last byte was produced
+            while not d.eof and self._base + len(self._buf) < size:
+                data = b''
+                if d.needs_input:
+                    data = self.f.read(self.chunk_size)
+                    if not data:
+                        break
+                if pending:
+                    data = pending.pop() + data
+                out = d.decompress(data, self.chunk_size)
+                if out:
+                    return out
+            return b''
+        return inflate
+
+    def _fill(self, end):
+        """ Inflate until the buffer covers end (or the stream ends) """
+        while not self._eof and self._base + len(self._buf) < end:
+            chunk = self._inflate()
+            if not chunk:
+                self._eof = True
+                if self.length is None:
+                    self.length = self._base + len(self._buf)
+            self._buf += chunk
+
+    def read(self, count=-1):
+        """ Read count bytes (or everything that is left when count < 0) """
+        if count is None or count < 0:
+            self._fill(float('inf'))
+            end = self._base + len(self._buf)
+        else:
+            end = self._pos + count
+            self._fill(end)
+        start = self._pos - self._base
+        data = bytes(self._buf[start:end - self._base])
+        self._pos += len(data)
+        return data
+
+    def seek(self, pos, whence=0):
+        """ Seek (seeking from the end needs a known length) """
+        if whence == 1:
+            pos += self._pos
+        elif whence == 2:
+            if self.length is None:
+                self._fill(float('inf'))
+            pos += self.length
+        if pos < self._base:
+            raise IOError("cannot seek to %d, data before %d was released" % (pos, self._base))
+        self._pos = pos
+        return pos
+
+    def tell(self):
+        """ Tell """
+        return self._pos
+
+    def release(self, pos):
+        """ Drop the decompressed bytes before pos """
+        pos = min(pos, self._pos)
+        if pos > self._base:
+            del self._buf[:pos - self._base]
+            self._base = pos
+
+    def close(self):
+        """ Closes the stream """
+        self._buf = bytearray()
+        self.f.close()
+
+def _signed_bits(value):
+    """ Bits needed to store value as a SB """
+    return (value if value >= 0 else ~value).bit_length() + 1
+
+def _fixed(value):
+    """ value as a 16.16 fixed point integer """
+    return int(round(value * 65536))
+
+class SWFWriter(object):
+    """
+    SWF writer, the counterpart of SWFStream
+
+    Provides write* methods for the types SWFStream reads. Bit fields
+    (writeUB, writeSB, writeFB) are packed most significant bit first
+    and padded with zero bits to a whole byte by the next byte aligned
+    write (or flush_bits).
+
+    @param file: a file object with a write() method; a BytesIO
+                 (see getvalue) when omitted.
+    @param source: the SWFStream that SWFRawTags are copied from
+                   (see SWFRawTag.write).
+    """
+    def __init__(self, file=None, source=None):
+        self.f = BytesIO() if file is None else file
+        self.source = source
+        self._bits = 0
+        self._bits_pending = 0
+
+    def writebits(self, bits, value):
+        """ Write the low bits of value """
+        if bits == 0:
+            return
+        acc = (self._bits << bits) | (value & ((1 << bits) - 1))
+        pending = self._bits_pending + bits
+        if pending >= 8:
+            count = pending >> 3
+            pending &= 7
+            self.f.write(unhexlify('%0*x' % (count * 2, acc >> pending)))
+            acc &= (1 << pending) - 1
+        self._bits = acc
+        self._bits_pending = pending
+
+    def flush_bits(self):
+        """ Pad the pending bit fields with zero bits and write them """
+        if self._bits_pending:
+            self.f.write(_UI8.pack((self._bits << (8 - self._bits_pending)) & 0xff))
+            self._bits = 0
+            self._bits_pending = 0
+
+    def writeUB(self, bits, value):
+        """ Write an unsigned int using the specified number of bits """
+        if value < 0 or value >> bits:
+            raise ValueError("%d does not fit in UB[%d]" % (value, bits))
+        self.writebits(bits, value)
+
+    def writeSB(self, bits, value):
+        """ Write a signed int using the specified number of bits """
+        if value and _signed_bits(value) > bits:
+            raise ValueError("%d does not fit in SB[%d]" % (value, bits))
+        self.writebits(bits, value)
+
+    def writeFB(self, bits, value):
+        """ Write a float using the specified number of bits """
+        self.writeSB(bits, _fixed(value))
+
+    def _pack(self, fmt, value):
+        self.flush_bits()
+        self.f.write(fmt.pack(value))
+
+    def writeUI8(self, value):
+        """ Write a UI8 """
+        self._pack(_UI8, value)
+
+    def writeSI8(self, value):
+        """ Write a SI8 """
+        self._pack(_SI8, value)
+
+    def writeUI16(self, value):
+        """ Write a UI16 """
+        self._pack(_UI16, value)
+
+    def writeSI16(self, value):
+        """ Write a SI16 """
+        self._pack(_SI16, value)
+
+    def writeUI32(self, value):
+        """ Write a UI32 """
+        self._pack(_UI32, value)
+
+    def writeSI32(self, value):
+        """ Write a SI32 """
+        self._pack(_SI32, value)
+
+    def writeUI64(self, value):
+        """ Write a UI64 """
+        self._pack(_UI64, value)
+
+    def writeFIXED(self, value):
+        """ Write a 16.16 fixed value """
+        self.writeSI32(_fixed(value))
+
+    def writeFIXED8(self, value):
+        """ Write a 8.8 fixed value """
+        self.writeSI16(int(round(value * 256)))
+
+    def writeFLOAT(self, value):
+        """ Write a float """
+        self._pack(_FLOAT, value)
+
+    def writeEncodedU32(self, value):
+        """ Write a variable length encoded UI32 (7 bits per byte) """
+        self.flush_bits()
+        out = bytearray()
+        while value > 0x7f:
+            out.append((value & 0x7f) | 0x80)
+            value >>= 7
+        out.append(value)
+        self.f.write(bytes(out))
+
+    def writeString(self, s):
+        """ Write a null terminated (UTF-8) string """
+        if isinstance(s, text_type):
+            s = s.encode('utf-8')
+        self.write(s + b'\0')
+
+    def writeRGB(self, color):
+        """ Write a RGB color (an int as returned by readRGB) """
+        self.write(bytes(bytearray(((color >> 16) & 0xff, (color >> 8) & 0xff, color & 0xff))))
+
+    def writeRGBA(self, color):
+        """ Write a RGBA color (an int as returned by readRGBA) """
+        self.write(bytes(bytearray(((color >> 16) & 0xff, (color >> 8) & 0xff,
+                                    color & 0xff, (color >> 24) & 0xff))))
+
+    def writeRECT(self, rect):
+        """ Write a SWFRectangle with the fewest bits possible """
+        values = [int(round(v)) for v in (rect.xmin, rect.xmax, rect.ymin, rect.ymax)]
+        bits = max([_signed_bits(v) for v in values])
+        self.flush_bits()
+        self.writeUB(5, bits)
+        for value in values:
+            self.writeSB(bits, value)
+
+    def writeMATRIX(self, matrix):
+        """ Write a SWFMatrix, leaving out the identity scale and zero skews """
+        self.flush_bits()
+        for pair, identity in (((matrix.scaleX, matrix.scaleY), 65536),
+                               ((matrix.rotateSkew0, matrix.rotateSkew1), 0)):
+            values = [_fixed(v) for v in pair]
+            if values == [identity, identity]:
+                self.writeUB(1, 0)
+                continue
+            bits = max([_signed_bits(v) for v in values])
+            self.writeUB(1, 1)
+            self.writeUB(5, bits)
+            for value in values:
+                self.writeSB(bits, value)
+        values = [int(round(matrix.translateX)), int(round(matrix.translateY))]
+        bits = max([_signed_bits(v) for v in values]) if any(values) else 0
+        self.writeUB(5, bits)
+        for value in values:
+            self.writeSB(bits, value)
+
+    def writeCXFORM(self, cxform):
+        """ Write a SWFColorTransform """
+        self._write_cxform(cxform, ('r', 'g', 'b'))
+
+    def writeCXFORMWITHALPHA(self, cxform):
+        """ Write a SWFColorTransformWithAlpha """
+        self._write_cxform(cxform, ('r', 'g', 'b', 'a'))
+
+    def _write_cxform(self, cxform, channels):
+        terms = []
+        if cxform.hasMultTerms:
+            terms += [getattr(cxform, c + 'Mult') for c in channels]
+        if cxform.hasAddTerms:
+            terms += [getattr(cxform, c + 'Add') for c in channels]
+        bits = max([1] + [_signed_bits(v) for v in terms])
+        self.flush_bits()
+        self.writeUB(1, int(bool(cxform.hasAddTerms)))
+        self.writeUB(1, int(bool(cxform.hasMultTerms)))
+        self.writeUB(4, bits)
+        for value in terms:
+            self.writeSB(bits, value)
+
+    def writetag_header(self, type, length):
+        """ Write a tag header, in the short form for lengths below 0x3f """
+        if length < 0x3f:
+            self.writeUI16((type << 6) | length)
+        else:
+            self.writeUI16((type << 6) | 0x3f)
+            self.writeUI32(length)
+
+    def write(self, data):
+        """ Write bytes (or a bytes-like object) """
+        self.flush_bits()
+        self.f.write(data)
+
+    def tell(self):
+        """ Tell (the bytes written so far, pending bit fields excluded) """
+        return self.f.tell()
+
+    def getvalue(self):
+        """ Return everything written so far (BytesIO files only) """
+        self.flush_bits()
+        return self.f.getvalue()
+
 def int32(x):
     """ Return a signed or unsigned int """
     if x>0xFFFFFFFF:
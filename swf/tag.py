@@ -3,81 +3,80 @@ from .consts import *
 from .data import *
 from .utils import *
 from .stream import *
+from .bitmap import decode_lossless
 import datetime
+from six import get_unbound_function
 from six.moves import range
 try:
     import Image
 except ImportError:
     from PIL import Image
 import struct
+import zlib
+from array import array
 from io import BytesIO
 
 
+class SWFUnknownTagException(Exception):
+    """ Exception raised for unknown tag types when unknown_tags='raise' """
+    def __init__(self, message, tag_type=None):
+        super(SWFUnknownTagException, self).__init__(message)
+        self.tag_type = tag_type
+
 class TagFactory(object):
+    """
+    Creates tags from their type code.
+
+    registry maps type codes to tag classes. It holds every tag class of
+    this module; use register_tag to add or replace entries.
+    """
+    registry = {}
+
     @classmethod
     def create(cls, type):
         """ Return the created tag by specifying an integer """
-        if type == 0: return TagEnd()
-        elif type == 1: return TagShowFrame()
-        elif type == 2: return TagDefineShape()
-        elif type == 4: return TagPlaceObject()
-        elif type == 5: return TagRemoveObject()
-        elif type == 6: return TagDefineBits()
-        elif type == 7: return TagDefineButton()
-        elif type == 8: return TagJPEGTables()
-        elif type == 9: return TagSetBackgroundColor()
-        elif type == 10: return TagDefineFont()
-        elif type == 11: return TagDefineText()
-        elif type == 12: return TagDoAction()
-        elif type == 13: return TagDefineFontInfo()
-        elif type == 14: return TagDefineSound()
-        elif type == 15: return TagStartSound()
-        elif type == 17: return TagDefineButtonSound()
-        elif type == 18: return TagSoundStreamHead()
-        elif type == 19: return TagSoundStreamBlock()
-        elif type == 20: return TagDefineBitsLossless()
-        elif type == 21: return TagDefineBitsJPEG2()
-        elif type == 22: return TagDefineShape2()
-        elif type == 24: return TagProtect()
-        elif type == 26: return TagPlaceObject2()
-        elif type == 28: return TagRemoveObject2()
-        elif type == 32: return TagDefineShape3()
-        elif type == 33: return TagDefineText2()
-        elif type == 34: return TagDefineButton2()
-        elif type == 35: return TagDefineBitsJPEG3()
-        elif type == 36: return TagDefineBitsLossless2()
-        elif type == 37: return TagDefineEditText()
-        elif type == 39: return TagDefineSprite()
-        elif type == 41: return TagProductInfo()
-        elif type == 43: return TagFrameLabel()
-        elif type == 45: return TagSoundStreamHead2()
-        elif type == 46: return TagDefineMorphShape()
-        elif type == 48: return TagDefineFont2()
-        elif type == 56: return TagExportAssets()
-        elif type == 58: return TagEnableDebugger()
-        elif type == 59: return TagDoInitAction()
-        elif type == 60: return TagDefineVideoStream()
-        elif type == 61: return TagVideoFrame()
-        elif type == 63: return TagDebugID()
-        elif type == 64: return TagEnableDebugger2()
-        elif type == 65: return TagScriptLimits()
-        elif type == 69: return TagFileAttributes()
-        elif type == 70: return TagPlaceObject3()
-        elif type == 72: return TagDoABCDefine()
-        elif type == 73: return TagDefineFontAlignZones()
-        elif type == 74: return TagCSMTextSettings()
-        elif type == 75: return TagDefineFont3()
-        elif type == 76: return TagSymbolClass()
-        elif type == 77: return TagMetadata()
-        elif type == 78: return TagDefineScalingGrid()
-        elif type == 82: return TagDoABC()
-        elif type == 83: return TagDefineShape4()
-        elif type == 84: return TagDefineMorphShape2()
-        elif type == 86: return TagDefineSceneAndFrameLabelData()
-        elif type == 87: return TagDefineBinaryData()
-        elif type == 88: return TagDefineFontName()
-        elif type == 89: return TagStartSound2()
-        else: return None
+        tag_class = cls.registry.get(type)
+        return None if tag_class is None else tag_class()
+
+def register_tag(type, cls):
+    """
+    Registers the tag class cls for the tag type code type, replacing
+    the current class for that type if there is one. cls is created
+    without arguments and must provide the Tag interface.
+    Returns cls.
+    """
+    TagFactory.registry[type] = cls
+    return cls
+
+class TagPayload(object):
+    """
+    Tag attribute holding a raw payload.
+
+    The value is kept as returned by SWFStream.read_payload, i.e. a
+    memoryview into the mapped file when parsing in mmap mode, and is
+    only copied into bytes (or a BytesIO, for as_stream attributes) the
+    first time the attribute is read. Use Tag.payload_view to look at
+    the payload without copying it.
+    """
+    def __init__(self, name, as_stream=False):
+        self.key = '_payload_' + name
+        self.as_stream = as_stream
+
+    def __get__(self, tag, owner):
+        if tag is None:
+            return self
+        value = tag.__dict__.get(self.key)
+        if isinstance(value, memoryview):
+            value = value.tobytes()
+            if self.as_stream:
+                value = BytesIO(value)
+            tag.__dict__[self.key] = value
+        return value
+
+    def __set__(self, tag, value):
+        if self.as_stream and isinstance(value, bytes):
+            value = BytesIO(value)
+        tag.__dict__[self.key] = value
 
 class Tag(object):
     def __init__(self):
@@ -100,13 +99,130 @@ class Tag(object):
         """ Parses this tag """
         pass
 
+    def publish(self, data, version=1):
+        """
+        Writes the content of this tag (without the tag header) to the
+        SWFWriter data. Tag classes that can't be encoded raise
+        NotImplementedError; they can still be written unmodified (see write).
+        """
+        raise NotImplementedError("writing %s tags is not supported" % self.name)
+
+    @property
+    def publishable(self):
+        """
+        Whether publish can encode this tag. Tags that can't are only
+        written unmodified.
+        """
+        return get_unbound_function(type(self).publish) is not _tag_publish
+
+    def write(self, data):
+        """
+        Writes this tag, header included, to the SWFWriter data. A tag
+        that wasn't modified since parsing is copied from the parsed
+        bytes as is; other tags are encoded with publish.
+        """
+        raw = _raw(self)
+        if raw is not None:
+            stream, offset, length, header_length = raw
+            data.write(stream.read_at(offset, length))
+            return
+        content = SWFWriter(source=data.source)
+        self.publish(content, self.version)
+        content = content.getvalue()
+        data.writetag_header(self.type, len(content))
+        data.write(content)
+
+    def __setattr__(self, name, value):
+        # setting a public attribute marks a parsed tag as modified
+        # (_raw is only recorded once parse returned, so parse doesn't)
+        if name[0] != '_':
+            self.__dict__.pop('_raw', None)
+        object.__setattr__(self, name, value)
+
+    def mark_modified(self):
+        """
+        Marks this tag as modified, for changes that don't set one of
+        its attributes: changes in place, e.g. to its matrix or records,
+        aren't noticed otherwise (but see changed_in_place).
+        """
+        self.__dict__.pop('_raw', None)
+
+    @property
+    def modified(self):
+        """
+        Whether this tag differs from its parsed bytes (or wasn't parsed
+        at all), i.e. whether write has to encode it again. Timelines are
+        modified when their list of tags or one of their tags is.
+        Changes in place only count after mark_modified.
+        """
+        return _raw(self) is None
+
+    def changed_in_place(self):
+        """
+        Whether this tag, though not modified, no longer matches the
+        bytes it was parsed from: it was changed in place without
+        mark_modified. The bytes are parsed again and both tags encoded
+        with publish, so only publishable tags can tell; the others
+        (and modified tags) return False.
+        """
+        if self.modified or not self.publishable:
+            return False
+        parsed = TagFactory.create(self.type)
+        content = self.raw_bytes(header=False)
+        parsed.parse(SWFMemoryStream(bytes(content)), len(content), parsed.version)
+        current, expected = SWFWriter(), SWFWriter()
+        self.publish(current, self.version)
+        parsed.publish(expected, parsed.version)
+        return current.getvalue() != expected.getvalue()
+
+    def raw_bytes(self, header=True):
+        """
+        Returns the bytes this tag was parsed from (with or without the
+        tag header), or None if it is modified. When parsing from memory
+        (compressed or mmapped files) this is a memoryview of the parsed
+        buffer, not a copy; the bytes are read again from the file otherwise.
+        """
+        raw = _raw(self)
+        if raw is None:
+            return None
+        stream, offset, length, header_length = raw
+        if not header:
+            offset += header_length
+            length -= header_length
+        return stream.read_at(offset, length)
+
     def get_dependencies(self):
         """ Returns the character ids this tag refers to """
         return set()
 
+    def __getstate__(self):
+        # memoryview payloads (mmap mode) can't be pickled, nor can the
+        # stream the raw bytes are in
+        state = self.__dict__.copy()
+        state.pop('_raw', None)
+        state.pop('_raw_tags', None)
+        for key, value in state.items():
+            if isinstance(value, memoryview):
+                state[key] = value.tobytes()
+        return state
+
+    def payload_view(self, name):
+        """
+        Returns a memoryview of the raw payload attribute name
+        (see TagPayload) without copying it, or None if it isn't set.
+        """
+        value = self.__dict__.get('_payload_' + name)
+        if value is None or isinstance(value, memoryview):
+            return value
+        if isinstance(value, BytesIO):
+            value = value.getvalue()
+        return memoryview(value)
+
     def __str__(self):
         return "[%02d:%s]" % (self.type, self.name)
 
+_tag_publish = get_unbound_function(Tag.publish)
+
 class DefinitionTag(Tag):
 
     def __init__(self):
@@ -144,9 +260,207 @@ class DisplayListTag(Tag):
         s.add(self.characterId)
         return s
 
+def _tag_in_types(tag_type, tag, types):
+    """ Whether tag (of type code tag_type) matches a class or code in types """
+    for t in types:
+        if isinstance(t, int):
+            if t == tag_type:
+                return True
+        elif isinstance(tag, t):
+            return True
+    return False
+
+def _has_character_id(tag_class):
+    """ Whether tags of tag_class start with their character id """
+    return issubclass(tag_class, DefinitionTag) and not issubclass(tag_class, TagJPEGTables)
+
+def _keep_raw(tag, data, offset, length, header_length):
+    """
+    Records that tag was parsed from the length bytes (the first
+    header_length of them being the tag header) at offset in data,
+    unless data can't read them again.
+    """
+    if data.can_reread:
+        d = tag.__dict__
+        d['_raw'] = (data, offset, length, header_length)
+        if 'tags' in d:
+            d['_raw_tags'] = tuple(d['tags'])
+
+class _TagFuture(object):
+    """
+    A tag parse_tag handed to an executor: the future of the parsed tag
+    and the arguments of _keep_raw for it.
+    """
+    __slots__ = ('future', 'raw')
+
+    def __init__(self, future, data, offset, length, header_length):
+        self.future = future
+        self.raw = (data, offset, length, header_length)
+
+    def result(self):
+        """ Waits for the parsed tag, and records where it was parsed from """
+        tag = self.future.result()
+        _keep_raw(tag, *self.raw)
+        return tag
+
+def _raw(tag):
+    """
+    The (stream, offset, length, header_length) tag was parsed from, or
+    None if it has to be encoded: it was created or modified since, or
+    it is a timeline whose tags changed.
+    """
+    d = object.__getattribute__(tag, '__dict__')
+    raw = d.get('_raw')
+    if raw is not None and 'tags' in d:
+        tags = d['tags']
+        parsed = d['_raw_tags']
+        if len(tags) != len(parsed):
+            return None
+        for t, p in zip(tags, parsed):
+            if t is not p or (not isinstance(t, SWFRawTag) and _raw(t) is None):
+                return None
+    return raw
+
+class LazyTag(object):
+    """
+    Mixin for tags parsed in lazy mode (see SWFTimelineContainer.parse_tags)
+
+    A lazy tag only knows its type, its byte range in the stream and,
+    for definition tags, its characterId. The first access to any other
+    attribute runs the real parse() and turns the tag back into an
+    instance of its original class.
+    """
+    _lazy_classes = {}
+    _lazy_passthrough = frozenset(('__class__', '__dict__', 'type', 'name', 'TYPE',
+        'write', 'mark_modified', 'modified', 'raw_bytes'))
+
+    def __getattribute__(self, name):
+        if name not in type(self)._lazy_passthrough:
+            LazyTag._materialize(self)
+        return object.__getattribute__(self, name)
+
+    def __setattr__(self, name, value):
+        if name[0] != '_':
+            # parse first, so it doesn't overwrite value later
+            LazyTag._materialize(self)
+            setattr(self, name, value)
+        else:
+            object.__setattr__(self, name, value)
+
+    def _materialize(self):
+        d = object.__getattribute__(self, '__dict__')
+        data, pos, length, version = d['_lazy_source']
+        tag_class = type(self).__bases__[1]
+        # parse into a new tag, so this one stays lazy if parse raises
+        tag = tag_class.__new__(tag_class)
+        tag.__dict__.update((k, v) for k, v in d.items() if k not in ('_lazy_source', '_raw'))
+        saved = data.tell()
+        try:
+            data.seek(pos)
+            data.reset_bits_pending()
+            tag.parse(data, length, version)
+        finally:
+            data.seek(saved)
+        raw = d.get('_raw')
+        d.clear()
+        d.update(tag.__dict__)
+        object.__setattr__(self, '__class__', tag_class)
+        if raw is not None:
+            _keep_raw(self, *raw)
+
+    @classmethod
+    def make_lazy(cls, tag, data, pos, length, version):
+        """
+        Turns the freshly created tag into a lazy tag whose content
+        is the length bytes at pos in data. data must be positioned at pos.
+        """
+        tag_class = type(tag)
+        passthrough = cls._lazy_passthrough
+        if _has_character_id(tag_class):
+            tag.characterId = data.readUI16()
+            passthrough = passthrough | frozenset(('characterId', '_characterId'))
+        lazy_class = cls._lazy_classes.get(tag_class)
+        if lazy_class is None:
+            lazy_class = type('Lazy' + tag_class.__name__, (cls, tag_class),
+                {'_lazy_passthrough': passthrough})
+            cls._lazy_classes[tag_class] = lazy_class
+        tag._lazy_source = (data, pos, length, version)
+        tag.__class__ = lazy_class
+
+class SWFTagIndexEntry(object):
+    """ Position and identity of one tag, see SWFTagIndex """
+    def __init__(self, type, offset, length, content_offset, content_length,
+                 characterId=None, frame=0, parent=None):
+        self.type = type
+        self.offset = offset
+        self.length = length
+        self.content_offset = content_offset
+        self.content_length = content_length
+        self.characterId = characterId
+        self.frame = frame
+        self.parent = parent
+
+    def __repr__(self):
+        return '<%s %r>' % (self.__class__.__name__, self.__dict__)
+
+class SWFTagIndex(object):
+    """
+    Index of the tags in a tag stream, built from their headers only
+
+    Every tag gets a SWFTagIndexEntry with its type code, offset and
+    length (of the whole tag and of its content), the characterId of
+    definition tags, the 0-based frame it appears in and, for tags
+    inside a DefineSprite, the characterId of that sprite (parent).
+    Offsets are positions in the stream that was scanned plus base,
+    e.g. the position in the file of the start of that stream.
+    """
+    def __init__(self, base=0):
+        self.base = base
+        self.entries = []
+        self.by_character_id = {}
+
+    def scan(self, data, end, parent=None):
+        """ Indexes the tags from the current position of data up to end """
+        frame = 0
+        registry = TagFactory.registry
+        while data.tell() < end:
+            pos = data.tell()
+            header = data.readtag_header()
+            content = data.tell()
+            tag_class = registry.get(header.type)
+            characterId = None
+            if tag_class is not None and _has_character_id(tag_class) and header.content_length >= 2:
+                characterId = data.readUI16()
+            entry = SWFTagIndexEntry(header.type, pos + self.base, header.tag_length,
+                content + self.base, header.content_length, characterId, frame, parent)
+            self.entries.append(entry)
+            if characterId is not None and parent is None:
+                self.by_character_id.setdefault(characterId, entry)
+            if tag_class is not None and issubclass(tag_class, TagDefineSprite):
+                # skip characterId and frameCount
+                data.seek(content + 4)
+                self.scan(data, content + header.content_length, characterId)
+            if header.type == TagShowFrame.TYPE:
+                frame += 1
+            elif header.type == TagEnd.TYPE:
+                break
+            data.seek(content + header.content_length)
+        return self
+
+    def entries_of_type(self, type_or_types):
+        """ Generator for the entries of the given tag type code(s) """
+        types = (type_or_types,) if isinstance(type_or_types, int) else type_or_types
+        for entry in self.entries:
+            if entry.type in types:
+                yield entry
+
+    def __len__(self):
+        return len(self.entries)
+
 class SWFTimelineContainer(DefinitionTag):
     def __init__(self):
         self.tags = []
+        self._parse_opts = {}
         super(SWFTimelineContainer, self).__init__()
 
     def get_dependencies(self):
@@ -156,43 +470,172 @@ class SWFTimelineContainer(DefinitionTag):
             s.update(dt.get_dependencies())
         return s
 
-    def parse_tags(self, data, version=1):
+    def parse_tags(self, data, version=1, executor=None, **options):
+        """
+        Parses the tags of this timeline from data.
+
+        Options (kept for nested sprites):
+          lazy: only read the tag headers and parse each tag the first
+                time one of its attributes is accessed (see LazyTag).
+                data has to stay readable for as long as tags are unparsed.
+          include_types: only parse tags matching one of these tag classes
+                (subclasses included) or type codes.
+          exclude_types: don't parse tags matching one of these.
+          keep_skipped: keep tags left out by include_types/exclude_types
+                as SWFRawTag (header and content offset) instead of
+                dropping them.
+          unknown_tags: what to do with tag types that have no registered
+                class: 'skip' them (the default), keep them as 'raw'
+                SWFRawTag or 'raise' SWFUnknownTagException.
+          release: let streams that support it (see SWFStream.release)
+                drop the bytes before each tag, the default unless lazy.
+                Off for tags loaded through a tag index, which still
+                needs the bytes at its offsets.
+        An End tag is always kept. Sprites that aren't selected are
+        still walked, and kept (holding only the selected tags) when any
+        of their tags are selected.
+
+        With an executor (a concurrent.futures process pool, see
+        SWF(workers=...)), tags of PARALLEL_TAG_TYPES (shapes, fonts,
+        lossless bitmaps, morph shapes) are parsed by it while the rest of
+        the stream is read; the tags of nested sprites aren't. Tag classes
+        added with register_tag must also be registered in the worker
+        processes.
+        """
+        if options:
+            self._parse_opts = dict(self._parse_opts, **options)
         pos = data.tell()
         self.file_length = self._get_file_length(data, pos)
+        if self._parse_opts.get('lazy'):
+            executor = None
+        # with an executor, _TagFutures stand in for some of the tags
+        tags = self.tags if executor is None else []
         tag = None
         while type(tag) != TagEnd:
-            tag = self.parse_tag(data)
+            tag = self.parse_tag(data, executor)
             if tag:
                 #print tag.name
-                self.tags.append(tag)
+                tags.append(tag)
+        if executor is not None:
+            self.tags.extend(t.result() if isinstance(t, _TagFuture) else t for t in tags)
 
-    def parse_tag(self, data):
+    def parse_tag(self, data, executor=None):
         pos = data.tell()
+        lazy = self._parse_opts.get('lazy', False)
+        if not lazy and self._parse_opts.get('release', True):
+            # nothing before the current tag is read again
+            data.release(pos)
         eof = (pos > self.file_length)
         if eof:
             #print "WARNING: end of file encountered, no end tag."
             return TagEnd()
+        # long tag header
+        data.ensure(pos + 6)
         raw_tag = data.readraw_tag()
         tag_type = raw_tag.header.type
         tag = TagFactory.create(tag_type)
-        if tag is not None:
+        if tag is not None and tag_type != TagEnd.TYPE:
+            data.ensure(pos + raw_tag.header.tag_length)
+        if tag is not None and tag_type != TagEnd.TYPE and not self._selects(tag_type, tag):
+            if not (isinstance(tag, SWFTimelineContainer) and
+                    self._parse_unselected_timeline(data, raw_tag, tag)):
+                data.skip_bytes(raw_tag.header.tag_length)
+                tag = raw_tag if self._parse_opts.get('keep_skipped') else None
+        elif tag is not None:
             #print tag.name
+            if isinstance(tag, SWFTimelineContainer):
+                tag._parse_opts = self._parse_opts
             data.seek(raw_tag.pos_content)
             data.reset_bits_pending()
-            tag.parse(data, raw_tag.header.content_length, tag.version)
+            if lazy and raw_tag.header.content_length > 0:
+                LazyTag.make_lazy(tag, data, raw_tag.pos_content,
+                    raw_tag.header.content_length, tag.version)
+            elif executor is not None and isinstance(tag, PARALLEL_TAG_TYPES):
+                payload = data.read(raw_tag.header.content_length)
+                tag = _TagFuture(executor.submit(_parse_tag_payload, tag_type, payload, tag.version),
+                    data, pos, raw_tag.header.tag_length, raw_tag.header.header_length)
+            else:
+                tag.parse(data, raw_tag.header.content_length, tag.version)
+            if not isinstance(tag, _TagFuture):
+                _keep_raw(tag, data, pos, raw_tag.header.tag_length, raw_tag.header.header_length)
             #except:
             #    print "=> tag_error", tag.name
             data.seek(pos + raw_tag.header.tag_length)
         else:
-            #print "[WARNING] unhandled tag %s" % (hex(tag_type))
+            policy = self._parse_opts.get('unknown_tags', 'skip')
+            if policy == 'raise':
+                raise SWFUnknownTagException("unknown tag type %d at offset %d" % (tag_type, pos), tag_type)
             data.skip_bytes(raw_tag.header.tag_length)
+            if policy == 'raw':
+                tag = raw_tag
         data.seek(pos + raw_tag.header.tag_length)
         return tag
 
+    def publish_tags(self, data):
+        """
+        Writes the tags of this timeline to the SWFWriter data (see
+        Tag.write). Tags that were left out when parsing aren't written.
+        """
+        for tag in self.tags:
+            tag.write(data)
+
+    def mark_changed_in_place(self):
+        """
+        Marks the tags of this timeline (nested sprites included) that
+        were changed in place as modified (see Tag.changed_in_place).
+        """
+        for tag in self.tags:
+            if isinstance(tag, (SWFRawTag, LazyTag)):
+                # lazy tags weren't even parsed yet
+                continue
+            if isinstance(tag, SWFTimelineContainer):
+                tag.mark_changed_in_place()
+            if tag.changed_in_place():
+                tag.mark_modified()
+
+    def unpublishable_tags(self):
+        """
+        Generator for the modified tags of this timeline (nested sprites
+        included) that publish_tags can't write, as they have no encoder
+        (see Tag.publishable).
+        """
+        for tag in self.tags:
+            if isinstance(tag, SWFRawTag) or not tag.modified:
+                continue
+            if isinstance(tag, SWFTimelineContainer):
+                for t in tag.unpublishable_tags():
+                    yield t
+            elif not tag.publishable:
+                yield tag
+
+    def _parse_unselected_timeline(self, data, raw_tag, tag):
+        """
+        Parses the timeline tag (a sprite) that isn't selected for the
+        selected tags it holds. Returns whether there are any, in which
+        case the tag is kept for them.
+        """
+        tag._parse_opts = self._parse_opts
+        data.seek(raw_tag.pos_content)
+        data.reset_bits_pending()
+        tag.parse(data, raw_tag.header.content_length, tag.version)
+        if not any(isinstance(t, Tag) and not isinstance(t, TagEnd) for t in tag.tags):
+            return False
+        _keep_raw(tag, data, raw_tag.pos_content - raw_tag.header.header_length,
+            raw_tag.header.tag_length, raw_tag.header.header_length)
+        return True
+
+    def _selects(self, tag_type, tag):
+        """ Whether the include_types/exclude_types options select tag """
+        include = self._parse_opts.get('include_types')
+        exclude = self._parse_opts.get('exclude_types')
+        if include is not None and not _tag_in_types(tag_type, tag, include):
+            return False
+        return exclude is None or not _tag_in_types(tag_type, tag, exclude)
+
     def _get_file_length(self, data, pos):
-        data.f.seek(0, 2)
+        data.seek(0, 2)
         length = data.tell()
-        data.f.seek(pos)
+        data.seek(pos)
         return length
 
     def all_tags_of_type(self, type_or_types, recurse_into_sprites = True):
@@ -211,6 +654,26 @@ class SWFTimelineContainer(DefinitionTag):
                     for containedtag in t.all_tags_of_type(type_or_types):
                         yield containedtag
 
+    def decode_bitmaps(self, executor=None):
+        """
+        Decodes the pixels of all lossless bitmaps (including those in
+        sprites) up front, instead of on first use. Encoding to PNG still
+        happens on demand.
+
+        @param executor: optional concurrent.futures executor to decode
+                         the bitmaps with (threads or processes).
+        Returns the decoded tags.
+        """
+        tags = [t for t in self.all_tags_of_type(TagDefineBitsLossless)
+                if t._image_buffer is None]
+        if executor is None:
+            buffers = map(_decode_bitmap_pixels, tags)
+        else:
+            buffers = executor.map(_decode_bitmap_pixels, tags)
+        for tag, image_buffer in zip(tags, buffers):
+            tag._image_buffer = image_buffer
+        return tags
+
     def build_dictionary(self):
         """
         Return a dictionary of characterIds to their defining tags.
@@ -292,6 +755,9 @@ class TagEnd(Tag):
     def type(self):
         return TagEnd.TYPE
 
+    def publish(self, data, version=1):
+        pass
+
     def __str__(self):
         return "[%02d:%s]" % (self.type, self.name)
 
@@ -313,6 +779,9 @@ class TagShowFrame(Tag):
     def type(self):
         return TagShowFrame.TYPE
 
+    def publish(self, data, version=1):
+        pass
+
     def __str__(self):
         return "[%02d:%s]" % (self.type, self.name)
 
@@ -417,15 +886,22 @@ class TagPlaceObject(DisplayListTag):
     def parse(self, data, length, version=1):
         """ Parses this tag """
         pos = data.tell()
-        self.characterId = data.readUI16()
+        self.characterId = data.readCharacterId()
         self.depth = data.readUI16();
         self.matrix = data.readMATRIX();
         self.hasCharacter = True;
         self.hasMatrix = True;
         if data.tell() - pos < length:
-            colorTransform = data.readCXFORM()
+            self.colorTransform = data.readCXFORM()
             self.hasColorTransform = True
 
+    def publish(self, data, version=1):
+        data.writeUI16(self.characterId)
+        data.writeUI16(self.depth)
+        data.writeMATRIX(self.matrix)
+        if self.hasColorTransform:
+            data.writeCXFORM(self.colorTransform)
+
     def get_dependencies(self):
         s = super(TagPlaceObject, self).get_dependencies()
         if self.hasCharacter:
@@ -484,9 +960,13 @@ class TagRemoveObject(DisplayListTag):
 
     def parse(self, data, length, version=1):
         """ Parses this tag """
-        self.characterId = data.readUI16()
+        self.characterId = data.readCharacterId()
         self.depth = data.readUI16()
 
+    def publish(self, data, version=1):
+        data.writeUI16(self.characterId)
+        data.writeUI16(self.depth)
+
 class TagDefineBits(DefinitionTag):
     """
     This tag defines a bitmap character with JPEG compression. It contains only
@@ -502,7 +982,7 @@ class TagDefineBits(DefinitionTag):
     the JPEG SOI marker.
     """
     TYPE = 6
-    bitmapData = None
+    bitmapData = TagPayload('bitmapData', as_stream=True)
     def __init__(self):
         self.bitmapData = BytesIO()
         self.bitmapType = BitmapType.JPEG
@@ -520,8 +1000,11 @@ class TagDefineBits(DefinitionTag):
         self.bitmapData = BytesIO()
         self.characterId = data.readUI16()
         if length > 2:
-            self.bitmapData.write(data.f.read(length - 2))
-            self.bitmapData.seek(0)
+            self.bitmapData = data.read_payload(length - 2)
+
+    def publish(self, data, version=1):
+        data.writeUI16(self.characterId)
+        data.write(self.payload_view('bitmapData'))
 
 class TagJPEGTables(DefinitionTag):
     """
@@ -535,7 +1018,7 @@ class TagJPEGTables(DefinitionTag):
     The minimum file format version for this tag is SWF 1.
     """
     TYPE = 8
-    jpegTables = None
+    jpegTables = TagPayload('jpegTables', as_stream=True)
     length = 0
 
     def __init__(self):
@@ -553,8 +1036,10 @@ class TagJPEGTables(DefinitionTag):
     def parse(self, data, length, version=1):
         self.length = length
         if length > 0:
-            self.jpegTables.write(data.f.read(length))
-            self.jpegTables.seek(0)
+            self.jpegTables = data.read_payload(length)
+
+    def publish(self, data, version=1):
+        data.write(self.payload_view('jpegTables'))
 
     def __str__(self):
         s = super(TagJPEGTables, self).__str__()
@@ -574,6 +1059,9 @@ class TagSetBackgroundColor(Tag):
     def parse(self, data, length, version=1):
         self.color = data.readRGB()
 
+    def publish(self, data, version=1):
+        data.writeRGB(self.color)
+
     @property
     def name(self):
         return "SetBackgroundColor"
@@ -631,11 +1119,10 @@ class TagDefineFont(DefinitionTag):
         # the number of entries in each table (the number of glyphs in the
         # font) can be inferred by dividing the first entry in the offset
         # table by two.
-        self.offsetTable.append(data.readUI16())
-        numGlyphs = self.offsetTable[0] / 2
+        firstOffset = data.readUI16()
+        numGlyphs = firstOffset // 2
 
-        for i in range(1, numGlyphs):
-            self.offsetTable.append(data.readUI16())
+        self.offsetTable = array('H', [firstOffset]) + data.read_array('H', max(numGlyphs - 1, 0))
 
         for i in range(numGlyphs):
             self.glyphShapeTable.append(data.readSHAPE(self.unitDivisor))
@@ -810,12 +1297,11 @@ class TagDefineFontInfo(Tag):
         self.wideCodes = ((flags & 0x01) != 0)
 
         if self.wideCodes:
-            numGlyphs = (length - 2 - 1 - fontNameLen - 1) / 2
+            numGlyphs = (length - 2 - 1 - fontNameLen - 1) // 2
         else:
             numGlyphs = length - 2 - 1 - fontNameLen - 1
 
-        for i in range(0, numGlyphs):
-            self.codeTable.append(data.readUI16() if self.wideCodes else data.readUI8())
+        self.codeTable = data.read_array('H' if self.wideCodes else 'B', numGlyphs)
 
 class TagDefineBitsLossless(DefinitionTag):
     """
@@ -829,92 +1315,89 @@ class TagDefineBitsLossless(DefinitionTag):
     The minimum file format version for this tag is SWF 2.
     """
     TYPE = 20
-    bitmapData = None
-    image_buffer = b""
     bitmap_format = 0
     bitmap_width = 0
     bitmap_height = 0
     bitmap_color_size = 0
-    zlib_bitmap_data = None
+    zlib_bitmap_data = TagPayload('zlib_bitmap_data')
     padded_width = 0
+    # keep the decoded pixels and PNG once computed
+    cache_decoded = True
+    _image_buffer = None
+    _bitmap_data = None
     def __init__(self):
         super(TagDefineBitsLossless, self).__init__()
 
     def parse(self, data, length, version=1):
-        import zlib
-        self.image_buffer = b""
+        self._image_buffer = None
+        self._bitmap_data = None
         self.characterId = data.readUI16()
         self.bitmap_format = data.readUI8()
         self.bitmap_width = data.readUI16()
         self.bitmap_height = data.readUI16()
         if self.bitmap_format == BitmapFormat.BIT_8:
             self.bitmap_color_size = data.readUI8()
-            self.zlib_bitmap_data = data.f.read(length-8)
+            self.zlib_bitmap_data = data.read_payload(length-8)
         else:
-            self.zlib_bitmap_data = data.f.read(length-7)
-
-        # decompress zlib encoded bytes
-        compressed_length = len(self.zlib_bitmap_data)
-        zip = zlib.decompressobj()
-        temp = BytesIO()
-        temp.write(zip.decompress(self.zlib_bitmap_data))
-        temp.seek(0, 2)
-        uncompressed_length = temp.tell()
-        temp.seek(0)
+            self.zlib_bitmap_data = data.read_payload(length-7)
 
         # padding : should be aligned to 32 bit boundary
-        self.padded_width = self.bitmap_width
-        while self.padded_width % 4 != 0:
-            self.padded_width += 1
-        t = self.padded_width * self.bitmap_height
-
-        is_lossless2 = (type(self) == TagDefineBitsLossless2)
-        im = None
-        self.bitmapData = BytesIO()
-
-        indexed_colors = []
+        self.padded_width = (self.bitmap_width + 3) & ~3
+        # pixels are decoded and encoded to PNG on demand
+        self.bitmapType = BitmapType.PNG
+
+    def publish(self, data, version=1):
+        data.writeUI16(self.characterId)
+        data.writeUI8(self.bitmap_format)
+        data.writeUI16(self.bitmap_width)
+        data.writeUI16(self.bitmap_height)
         if self.bitmap_format == BitmapFormat.BIT_8:
-            for i in range(0, self.bitmap_color_size + 1):
-                r = ord(temp.read(1))
-                g = ord(temp.read(1))
-                b = ord(temp.read(1))
-                a = ord(temp.read(1)) if is_lossless2 else 0xff
-                indexed_colors.append(struct.pack("BBBB", r, g, b, a))
-
-            # create the image buffer
-            s = BytesIO()
-            for i in range(t):
-                s.write(indexed_colors[ord(temp.read(1))])
-            self.image_buffer = s.getvalue()
-            s.close()
-
-            im = Image.frombytes("RGBA", (self.padded_width, self.bitmap_height), self.image_buffer)
-            im = im.crop((0, 0, self.bitmap_width, self.bitmap_height))
-
-        elif self.bitmap_format == BitmapFormat.BIT_15:
-            raise Exception("DefineBitsLossless: BIT_15 not yet implemented")
-        elif self.bitmap_format == BitmapFormat.BIT_24:
-            # we have no padding, since PIX24s are 32-bit aligned
-            t = self.bitmap_width * self.bitmap_height
-            # read PIX24's
-            s = BytesIO()
-            for i in range(0, t):
-                if not is_lossless2:
-                    temp.read(1) # reserved, always 0
-                a = ord(temp.read(1)) if is_lossless2 else 0xff
-                r = ord(temp.read(1))
-                g = ord(temp.read(1))
-                b = ord(temp.read(1))
-                s.write(struct.pack("BBBB", r, g, b, a))
-            self.image_buffer = s.getvalue()
-            im = Image.frombytes("RGBA", (self.bitmap_width, self.bitmap_height), self.image_buffer)
-        else:
-            raise Exception("unhandled bitmap format! %s %d" % (BitmapFormat.tobytes(self.bitmap_format), self.bitmap_format))
-
-        if not im is None:
-            im.save(self.bitmapData, "PNG")
-            self.bitmapData.seek(0)
-            self.bitmapType = ImageUtils.get_image_type(self.bitmapData)
+            data.writeUI8(self.bitmap_color_size)
+        data.write(self.payload_view('zlib_bitmap_data'))
+
+    @property
+    def image_buffer(self):
+        """ The decoded pixels as RGBA bytes, decoded on first access """
+        image_buffer = self._image_buffer
+        if image_buffer is None:
+            image_buffer = self._decode_pixels()
+            if self.cache_decoded:
+                self._image_buffer = image_buffer
+        return image_buffer
+
+    @image_buffer.setter
+    def image_buffer(self, value):
+        self._image_buffer = value
+
+    @property
+    def bitmapData(self):
+        """ The bitmap encoded as PNG (a BytesIO), encoded on first access """
+        bitmap_data = self._bitmap_data
+        if bitmap_data is None:
+            bitmap_data = BytesIO()
+            self.to_image().save(bitmap_data, "PNG")
+            bitmap_data.seek(0)
+            if self.cache_decoded:
+                self._bitmap_data = bitmap_data
+        return bitmap_data
+
+    @bitmapData.setter
+    def bitmapData(self, value):
+        self._bitmap_data = value
+
+    def to_image(self):
+        """ Returns the bitmap as a RGBA PIL image """
+        return Image.frombytes("RGBA", (self.bitmap_width, self.bitmap_height), self.image_buffer)
+
+    def _decode_pixels(self):
+        import zlib
+        zlib_bitmap_data = self.payload_view('zlib_bitmap_data')
+        if zlib_bitmap_data is None:
+            return b""
+        temp = zlib.decompressobj().decompress(zlib_bitmap_data)
+        return decode_lossless(temp, self.bitmap_format,
+            self.bitmap_width, self.bitmap_height, self.bitmap_color_size,
+            alpha=isinstance(self, TagDefineBitsLossless2))
 
     @property
     def name(self):
@@ -969,7 +1452,7 @@ class TagDefineBitsJPEG2(TagDefineBits):
 
     def parse(self, data, length, version=1):
         super(TagDefineBitsJPEG2, self).parse(data, length, version)
-        self.bitmapType = ImageUtils.get_image_type(self.bitmapData)
+        self.bitmapType = ImageUtils.get_image_type_from_bytes(self.payload_view('bitmapData'))
 
 class TagDefineShape2(TagDefineShape):
     """
@@ -1076,7 +1559,7 @@ class TagPlaceObject2(TagPlaceObject):
         self.hasMove = (flags & 0x01) != 0
         self.depth = data.readUI16()
         if self.hasCharacter:
-            self.characterId = data.readUI16()
+            self.characterId = data.readCharacterId()
         if self.hasMatrix:
             self.matrix = data.readMATRIX()
         if self.hasColorTransform:
@@ -1091,6 +1574,32 @@ class TagPlaceObject2(TagPlaceObject):
             self.clipActions = data.readCLIPACTIONS(version);
             #raise Exception("PlaceObject2: ClipActions not yet implemented!")
 
+    @property
+    def publishable(self):
+        return not self.hasClipActions
+
+    def publish(self, data, version=1):
+        if self.hasClipActions:
+            raise NotImplementedError("writing PlaceObject2 clip actions is not supported")
+        flags = ((self.hasClipDepth and 0x40) | (self.hasName and 0x20) |
+                 (self.hasRatio and 0x10) | (self.hasColorTransform and 0x08) |
+                 (self.hasMatrix and 0x04) | (self.hasCharacter and 0x02) |
+                 (self.hasMove and 0x01))
+        data.writeUI8(flags)
+        data.writeUI16(self.depth)
+        if self.hasCharacter:
+            data.writeUI16(self.characterId)
+        if self.hasMatrix:
+            data.writeMATRIX(self.matrix)
+        if self.hasColorTransform:
+            data.writeCXFORMWITHALPHA(self.colorTransform)
+        if self.hasRatio:
+            data.writeUI16(self.ratio)
+        if self.hasName:
+            data.writeString(self.instanceName)
+        if self.hasClipDepth:
+            data.writeUI16(self.clipDepth)
+
     @property
     def name(self):
         return "PlaceObject2"
@@ -1137,6 +1646,9 @@ class TagRemoveObject2(TagRemoveObject):
     def parse(self, data, length, version=1):
         self.depth = data.readUI16()
 
+    def publish(self, data, version=1):
+        data.writeUI16(self.depth)
+
 class TagDefineShape3(TagDefineShape2):
     """
     DefineShape3 extends the capabilities of DefineShape2 by extending
@@ -1239,21 +1751,40 @@ class TagDefineBitsJPEG3(TagDefineBitsJPEG2):
         self.characterId = data.readUI16()
         alphaOffset = data.readUI32()
         self.bitmapAlphaData = BytesIO()
-        self.bitmapData = BytesIO()
-        self.bitmapData.write(data.f.read(alphaOffset))
-        self.bitmapData.seek(0)
-        self.bitmapType = ImageUtils.get_image_type(self.bitmapData)
+        self.bitmapData = data.read_payload(alphaOffset)
+        self.bitmapType = ImageUtils.get_image_type_from_bytes(self.payload_view('bitmapData'))
         alphaDataSize = length - alphaOffset - 6
         if alphaDataSize > 0:
-            self.bitmapAlphaData.write(data.f.read(alphaDataSize))
-            self.bitmapAlphaData.seek(0)
             # decompress zlib encoded bytes
             zip = zlib.decompressobj()
             temp = BytesIO()
-            temp.write(zip.decompress(self.bitmapAlphaData.read()))
+            temp.write(zip.decompress(data.read_payload(alphaDataSize)))
             temp.seek(0)
             self.bitmapAlphaData = temp
 
+    def publish(self, data, version=1):
+        bitmap = self.payload_view('bitmapData')
+        data.writeUI16(self.characterId)
+        data.writeUI32(len(bitmap))
+        data.write(bitmap)
+        alpha = self.bitmapAlphaData.getvalue()
+        if alpha:
+            data.write(zlib.compress(alpha))
+
+    def to_rgba_image(self):
+        """
+        Returns the image as a PIL image with the alpha data applied
+        (in RGBA mode). Without alpha data, or when its size doesn't
+        match the image, the image is returned as is.
+        """
+        self.bitmapData.seek(0)
+        image = Image.open(self.bitmapData)
+        alpha = self.bitmapAlphaData.getvalue()
+        if alpha and len(alpha) == image.size[0] * image.size[1]:
+            image = image.convert("RGB")
+            image.putalpha(Image.frombytes("L", image.size, alpha))
+        return image
+
 class TagDefineBitsLossless2(TagDefineBitsLossless):
     """
     DefineBitsLossless2 extends DefineBitsLossless with support for
@@ -1306,6 +1837,18 @@ class TagDefineSprite(SWFTimelineContainer):
         self.frameCount = data.readUI16()
         self.parse_tags(data, version)
 
+    def publish(self, data, version=1):
+        data.writeUI16(self.characterId)
+        data.writeUI16(self.frameCount)
+        self.publish_tags(data)
+
+    def changed_in_place(self):
+        # its tags are checked on their own (see mark_changed_in_place)
+        if self.modified:
+            return False
+        return struct.unpack('<HH', bytes(self.raw_bytes(header=False)[:4])) != \
+            (self.characterId, self.frameCount)
+
     def get_dependencies(self):
         s = super(TagDefineSprite, self).get_dependencies()
         s.add(self.characterId)
@@ -1359,6 +1902,11 @@ class TagFrameLabel(Tag):
             data.readUI8() # Named anchor flag, always 1
             self.namedAnchorFlag = True
 
+    def publish(self, data, version=1):
+        data.writeString(self.frameName)
+        if self.namedAnchorFlag:
+            data.writeUI8(1)
+
 class TagDefineMorphShape(DefinitionTag):
     """
     The DefineMorphShape tag defines the start and end states of a morph
@@ -1460,7 +2008,7 @@ class TagDefineFont2(TagDefineFont):
 
         fontNameLen = data.readUI8()
         fontNameRaw = BytesIO()
-        fontNameRaw.write(data.f.read(fontNameLen))
+        fontNameRaw.write(data.read(fontNameLen))
         fontNameRaw.seek(0)
         self.fontName = fontNameRaw.read()
 
@@ -1469,30 +2017,25 @@ class TagDefineFont2(TagDefineFont):
         # don't # Skip offsets. We don't need them.
         # Adobe Flash Player works in this way
 
-        startOfOffsetTable = data.f.tell()
-        offsetTable = []
-        for i in range(0, numGlyphs):
-            offsetTable.append(data.readUI32() if self.wideOffsets else data.readUI16())
+        startOfOffsetTable = data.tell()
+        # the glyph offsets followed by the code table offset
+        offsetTable = data.read_array('I' if self.wideOffsets else 'H', numGlyphs + 1)
 
-        codeTableOffset = data.readUI32() if self.wideOffsets else data.readUI16()
         for i in range(0, numGlyphs):
-            data.f.seek(startOfOffsetTable + offsetTable[i])
+            data.seek(startOfOffsetTable + offsetTable[i])
             self.glyphShapeTable.append(data.readSHAPE(self.unitDivisor))
-        data.f.seek(startOfOffsetTable + codeTableOffset)
-        for i in range(0, numGlyphs):
-            self.codeTable.append(data.readUI16() if self.wideCodes else data.readUI8())
+        data.seek(startOfOffsetTable + offsetTable[numGlyphs])
+        self.codeTable = data.read_array('H' if self.wideCodes else 'B', numGlyphs)
 
         if self.hasLayout:
             self.ascent = data.readSI16()
             self.descent = data.readSI16()
             self.leading = data.readSI16()
-            for i in range(0, numGlyphs):
-                self.fontAdvanceTable.append(data.readSI16())
+            self.fontAdvanceTable = data.read_array('h', numGlyphs)
             for i in range(0, numGlyphs):
                 self.fontBoundsTable.append(data.readRECT())
             kerningCount = data.readUI16()
-            for i in range(0, kerningCount):
-                self.fontKerningTable.append(data.readKERNINGRECORD(self.wideCodes))
+            self.fontKerningTable = data.readKERNINGRECORDs(kerningCount, self.wideCodes)
 
 class TagFileAttributes(Tag):
     """
@@ -1540,6 +2083,12 @@ class TagFileAttributes(Tag):
         self.useNetwork = ((flags & 0x01) != 0)
         data.skip_bytes(3)
 
+    def publish(self, data, version=1):
+        data.writeUI8((self.useDirectBlit and 0x40) | (self.useGPU and 0x20) |
+                      (self.hasMetadata and 0x10) | (self.actionscript3 and 0x08) |
+                      (self.useNetwork and 0x01))
+        data.write(b'\0\0\0')
+
     def __str__(self):
         s = super(TagFileAttributes, self).__str__() + \
             " useDirectBlit: %d, " % self.useDirectBlit + \
@@ -1575,7 +2124,7 @@ class TagPlaceObject3(TagPlaceObject2):
         if self.hasClassName:
             self.className = data.readString()
         if self.hasCharacter:
-            self.characterId = data.readUI16()
+            self.characterId = data.readCharacterId()
         if self.hasMatrix:
             self.matrix = data.readMATRIX()
         if self.hasColorTransform:
@@ -1629,7 +2178,10 @@ class TagDoABCDefine(Tag):
 
     def parse(self, data, length, version=1):
         pos = data.tell()
-        self.bytes = data.f.read(length - (data.tell() - pos))
+        self.bytes = data.read(length - (data.tell() - pos))
+
+    def publish(self, data, version=1):
+        data.write(self.bytes)
 
 class TagDefineFontAlignZones(Tag):
     TYPE = 73
@@ -1741,6 +2293,12 @@ class TagSymbolClass(Tag):
         for i in range(0, numSymbols):
             self.symbols.append(data.readSYMBOL())
 
+    def publish(self, data, version=1):
+        data.writeUI16(len(self.symbols))
+        for symbol in self.symbols:
+            data.writeUI16(symbol.tagId)
+            data.writeString(symbol.name)
+
 class TagMetadata(Tag):
     TYPE = 77
     def __init__(self):
@@ -1765,6 +2323,9 @@ class TagMetadata(Tag):
     def parse(self, data, length, version=1):
         self.xmlString = data.readString()
 
+    def publish(self, data, version=1):
+        data.writeString(self.xmlString)
+
     def __str__(self):
         s = super(TagMetadata, self).__str__()
         s += " xml: %r" % self.xmlString
@@ -1796,7 +2357,12 @@ class TagDoABC(Tag):
         flags = data.readUI32()
         self.lazyInitializeFlag = ((flags & 0x01) != 0)
         self.abcName = data.readString()
-        self.bytes = data.f.read(length - (data.tell() - pos))
+        self.bytes = data.read(length - (data.tell() - pos))
+
+    def publish(self, data, version=1):
+        data.writeUI32(0x01 if self.lazyInitializeFlag else 0)
+        data.writeString(self.abcName)
+        data.write(self.bytes)
 
 class TagDefineShape4(TagDefineShape3):
     TYPE = 83
@@ -1872,11 +2438,22 @@ class TagDefineSceneAndFrameLabelData(Tag):
             frameLabel = data.readString();
             self.frameLabels.append(SWFFrameLabel(frameNumber, frameLabel))
 
+    def publish(self, data, version=1):
+        data.writeEncodedU32(len(self.scenes))
+        for scene in self.scenes:
+            data.writeEncodedU32(scene.offset)
+            data.writeString(scene.name)
+        data.writeEncodedU32(len(self.frameLabels))
+        for label in self.frameLabels:
+            data.writeEncodedU32(label.frameNumber)
+            data.writeString(label.name)
+
 class TagDefineBinaryData(DefinitionTag):
     """
 	The DefineBinaryData tag permits arbitrary binary data to be embedded in a SWF file. DefineBinaryData is a definition tag, like DefineShape and DefineSprite. It associates a blob of binary data with a standard SWF 16-bit character ID. The character ID is entered into the SWF file's character dictionary. DefineBinaryData is intended to be used in conjunction with the SymbolClass tag. The SymbolClass tag can be used to associate a DefineBinaryData tag with an AS3 class definition. The AS3 class must be a subclass of ByteArray. When the class is instantiated, it will be populated automatically with the contents of the binary data resource.
     """
     TYPE = 87
+    data = TagPayload('data')
     def __init__(self):
         super(TagDefineBinaryData, self).__init__()
 
@@ -1891,7 +2468,7 @@ class TagDefineBinaryData(DefinitionTag):
     def parse(self, data, length, version=1):
         self.characterId = data.readUI16()
         self.reserved = data.readUI32()
-        self.data = data.read(length - 6)
+        self.data = data.read_payload(length - 6)
 
 class TagDefineFontName(Tag):
     TYPE = 88
@@ -1924,8 +2501,14 @@ class TagDefineFontName(Tag):
         self.fontName = data.readString()
         self.fontCopyright = data.readString()
 
+    def publish(self, data, version=1):
+        data.writeUI16(self.fontId)
+        data.writeString(self.fontName)
+        data.writeString(self.fontCopyright)
+
 class TagDefineSound(Tag):
     TYPE = 14
+    soundData = TagPayload('soundData', as_stream=True)
     def __init__(self):
         super(TagDefineSound, self).__init__()
 
@@ -1954,7 +2537,16 @@ class TagDefineSound(Tag):
         self.soundChannels = data.readUB(1)
         self.soundSamples = data.readUI32()
         # used 2 + 1 + 4 bytes here
-        self.soundData = BytesIO(data.read(length - 7))
+        self.soundData = data.read_payload(length - 7)
+
+    def publish(self, data, version=1):
+        data.writeUI16(self.soundId)
+        data.writeUB(4, self.soundFormat)
+        data.writeUB(2, self.soundRate)
+        data.writeUB(1, self.soundSampleSize)
+        data.writeUB(1, self.soundChannels)
+        data.writeUI32(self.soundSamples)
+        data.write(self.payload_view('soundData'))
 
     def __str__(self):
         s = super(TagDefineSound, self).__str__()
@@ -1986,7 +2578,7 @@ class TagStartSound(Tag):
         return 1
 
     def parse(self, data, length, version=1):
-        self.soundId = data.readUI16()
+        self.soundId = data.readCharacterId()
         self.soundInfo = data.readSOUNDINFO()
 
 class TagStartSound2(Tag):
@@ -2053,6 +2645,19 @@ class TagSoundStreamHead(Tag):
         hdr = 6 if self.soundFormat == AudioCodec.MP3 else 4
         assert hdr == length
 
+    def publish(self, data, version=1):
+        data.writeUB(4, self.reserved0)
+        data.writeUB(2, self.playbackRate)
+        data.writeUB(1, self.playbackSampleSize)
+        data.writeUB(1, self.playbackChannels)
+        data.writeUB(4, self.soundFormat)
+        data.writeUB(2, self.soundRate)
+        data.writeUB(1, self.soundSampleSize)
+        data.writeUB(1, self.soundChannels)
+        data.writeUI16(self.samples)
+        if self.soundFormat == AudioCodec.MP3:
+            data.writeSI16(self.latencySeek)
+
     def __str__(self):
         s = super(TagSoundStreamHead, self).__str__()
         s += " playbackRate: %s" % AudioSampleRate.tostring(self.playbackRate)
@@ -2088,6 +2693,7 @@ class TagSoundStreamBlock(Tag):
     different values for StreamSoundCompression and StreamSoundSize (SWF 3 file format).
     """
     TYPE = 19
+    data = TagPayload('data', as_stream=True)
 
     def __init__(self):
         super(TagSoundStreamBlock, self).__init__()
@@ -2103,7 +2709,10 @@ class TagSoundStreamBlock(Tag):
     def parse(self, data, length, version=1):
         # unfortunately we can't see our associated SoundStreamHead from here,
         # so just stash the data
-        self.data = BytesIO(data.read(length))
+        self.data = data.read_payload(length)
+
+    def publish(self, data, version=1):
+        data.write(self.payload_view('data'))
 
     def complete_parse_with_header(self, head):
         stream = SWFStream(self.data)
@@ -2123,6 +2732,7 @@ class TagDefineBinaryData(DefinitionTag):
     SWF file's character dictionary.
     """
     TYPE = 87
+    data = TagPayload('data')
 
     def __init__(self):
         super(TagDefineBinaryData, self).__init__()
@@ -2139,7 +2749,12 @@ class TagDefineBinaryData(DefinitionTag):
         assert length >= 6
         self.characterId = data.readUI16()
         self.reserved = data.readUI32()
-        self.data = data.read(length - 4 - 2)
+        self.data = data.read_payload(length - 4 - 2)
+
+    def publish(self, data, version=1):
+        data.writeUI16(self.characterId)
+        data.writeUI32(self.reserved)
+        data.write(self.payload_view('data'))
 
 class TagProductInfo(Tag):
     """
@@ -2165,6 +2780,14 @@ class TagProductInfo(Tag):
         self.build = data.readUI64()
         self.compileTime = data.readUI64()
 
+    def publish(self, data, version=1):
+        data.writeUI32(self.product)
+        data.writeUI32(self.edition)
+        data.writeUI8(self.majorVersion)
+        data.writeUI8(self.minorVersion)
+        data.writeUI64(self.build)
+        data.writeUI64(self.compileTime)
+
     def __str__(self):
         s = super(TagProductInfo, self).__str__()
         s += " product: %s" % ProductKind.tostring(self.product)
@@ -2196,6 +2819,10 @@ class TagScriptLimits(Tag):
         self.maxRecursionDepth = data.readUI16()
         self.scriptTimeoutSeconds = data.readUI16()
 
+    def publish(self, data, version=1):
+        data.writeUI16(self.maxRecursionDepth)
+        data.writeUI16(self.scriptTimeoutSeconds)
+
     def __str__(self):
         s = super(TagScriptLimits, self).__str__()
         s += " maxRecursionDepth: %s" % self.maxRecursionDepth
@@ -2222,6 +2849,9 @@ class TagDebugID(Tag):
     def parse(self, data, length, version=1):
         self.guid = data.read(16)
 
+    def publish(self, data, version=1):
+        data.write(self.guid)
+
 class TagExportAssets(Tag):
     """
     The ExportAssets tag makes portions of a SWF file available for import by other SWF files
@@ -2247,6 +2877,12 @@ class TagExportAssets(Tag):
         self.count = data.readUI16()
         self.exports = [data.readEXPORT() for i in range(self.count)]
 
+    def publish(self, data, version=1):
+        data.writeUI16(len(self.exports))
+        for export in self.exports:
+            data.writeUI16(export.characterId)
+            data.writeString(export.characterName)
+
     def __str__(self):
         s = super(TagExportAssets, self).__str__()
         s += " exports: %s" % self.exports
@@ -2282,6 +2918,10 @@ class TagProtect(Tag):
         else:
             self.password = None
 
+    def publish(self, data, version=1):
+        if self.password is not None:
+            data.writeString(self.password)
+
     def __str__(self):
         s = super(TagProtect, self).__str__()
         s += " password: %r" % self.password
@@ -2312,6 +2952,9 @@ class TagEnableDebugger(Tag):
     def parse(self, data, length, version=1):
         self.password = data.readString()
 
+    def publish(self, data, version=1):
+        data.writeString(self.password)
+
     def __str__(self):
         s = super(TagEnableDebugger, self).__str__()
         s += " password: %r" % self.password
@@ -2343,6 +2986,10 @@ class TagEnableDebugger2(Tag):
         self.reserved0 = data.readUI16()
         self.password = data.readString()
 
+    def publish(self, data, version=1):
+        data.writeUI16(self.reserved0)
+        data.writeString(self.password)
+
     def __str__(self):
         s = super(TagEnableDebugger2, self).__str__()
         s += " password: %r" % self.password
@@ -2433,7 +3080,7 @@ class TagDefineEditText(DefinitionTag):
         self.useOutlines = data.readUB(1) == 1
 
         # values
-        self.fontId = data.readUI16() if self.hasFont else None
+        self.fontId = data.readCharacterId() if self.hasFont else None
         self.fontClass = data.readString() if self.hasFontClass else None
         self.fontHeight = data.readUI16() if self.hasFont else None
         self.textColor = data.readRGBA() if self.hasTextColor else None
@@ -2567,6 +3214,10 @@ class TagDefineScalingGrid(Tag):
         self.characterId = data.readUI16()
         self.splitter = data.readRECT()
 
+    def publish(self, data, version=1):
+        data.writeUI16(self.characterId)
+        data.writeRECT(self.splitter)
+
 class TagDefineVideoStream(DefinitionTag):
     """
     DefineVideoStream defines a video character that can later be placed on the display list.
@@ -2594,12 +3245,23 @@ class TagDefineVideoStream(DefinitionTag):
         self.videoSmoothing = data.readUB(1)
         self.codec = data.readUI8()
 
+    def publish(self, data, version=1):
+        data.writeUI16(self.characterId)
+        data.writeUI16(self.numFrames)
+        data.writeUI16(self.width)
+        data.writeUI16(self.height)
+        data.writeUB(4, 0)
+        data.writeUB(3, self.videoDeblocking)
+        data.writeUB(1, self.videoSmoothing)
+        data.writeUI8(self.codec)
+
 class TagVideoFrame(Tag):
     """
     VideoFrame provides a single frame of video data for a video character that is already defined
     with DefineVideoStream.
     """
     TYPE = 61
+    videoData = TagPayload('videoData')
 
     def __init__(self):
         super(TagVideoFrame, self).__init__()
@@ -2613,9 +3275,14 @@ class TagVideoFrame(Tag):
         return TagVideoFrame.TYPE
 
     def parse(self, data, length, version=1):
-        self.streamId = data.readUI16()
+        self.streamId = data.readCharacterId()
         self.frameNumber = data.readUI16()
-        self.videoData = data.read(length - 4)
+        self.videoData = data.read_payload(length - 4)
+
+    def publish(self, data, version=1):
+        data.writeUI16(self.streamId)
+        data.writeUI16(self.frameNumber)
+        data.write(self.payload_view('videoData'))
 
 class TagDefineMorphShape2(TagDefineMorphShape):
     """
@@ -2665,6 +3332,24 @@ class TagDefineMorphShape2(TagDefineMorphShape):
         self.startEdges = data.readSHAPE();
         self.endEdges = data.readSHAPE();
 
+# definition tags that only depend on their own bytes, see parse_tags(workers=...)
+PARALLEL_TAG_TYPES = (TagDefineShape, TagDefineFont2, TagDefineBitsLossless, TagDefineMorphShape)
+
+def _decode_bitmap_pixels(tag):
+    """ Returns the decoded pixels of a lossless bitmap tag (runs in executors) """
+    return tag._decode_pixels()
+
+def _parse_tag_payload(tag_type, payload, version):
+    """ Parses a tag from its content bytes (runs in pool workers) """
+    tag = TagFactory.create(tag_type)
+    tag.parse(SWFMemoryStream(payload), len(payload), version)
+    return tag
+
+for _cls in list(globals().values()):
+    if isinstance(_cls, type) and issubclass(_cls, Tag) and 'TYPE' in _cls.__dict__:
+        TagFactory.registry[_cls.TYPE] = _cls
+del _cls
+
 if __name__ == '__main__':
     # some table checks
     for x in range(256):
@@ -0,0 +1,168 @@
+"""
+Playing the display list of a timeline frame by frame
+"""
+from __future__ import absolute_import
+from collections import namedtuple
+from .tag import TagPlaceObject, TagRemoveObject, TagShowFrame
+
+class DisplayObject(namedtuple('DisplayObject', 'depth characterId matrix colorTransform '
+                                                'ratio instanceName clipDepth blendMode '
+                                                'filters bitmapCache')):
+    """
+    The state of the character at a depth of the display list, as the
+    PlaceObject tags up to a frame set it. Fields no tag set are None.
+
+    It has the attributes of TagPlaceObject that the exporters read, so
+    it can be exported in place of a PlaceObject tag.
+    """
+    __slots__ = ()
+    hasCharacter = True
+    hasMove = False
+
+    @property
+    def hasMatrix(self):
+        return self.matrix is not None
+
+    @property
+    def hasColorTransform(self):
+        return self.colorTransform is not None
+
+    @property
+    def hasRatio(self):
+        return self.ratio is not None
+
+    @property
+    def hasName(self):
+        return self.instanceName is not None
+
+    @property
+    def hasClipDepth(self):
+        return self.clipDepth is not None
+
+    @property
+    def hasBlendMode(self):
+        return self.blendMode is not None
+
+    @property
+    def hasFilterList(self):
+        return self.filters is not None
+
+    @property
+    def hasCacheAsBitmap(self):
+        return self.bitmapCache is not None
+
+_EMPTY = DisplayObject(*[None] * len(DisplayObject._fields))
+
+def _placed_fields(tag):
+    """ The DisplayObject fields the PlaceObject tag sets """
+    fields = {}
+    if tag.hasCharacter:
+        fields['characterId'] = tag.characterId
+    if tag.hasMatrix:
+        fields['matrix'] = tag.matrix
+    if tag.hasColorTransform:
+        fields['colorTransform'] = tag.colorTransform
+    if tag.hasRatio:
+        fields['ratio'] = tag.ratio
+    if tag.hasName:
+        fields['instanceName'] = tag.instanceName
+    if tag.hasClipDepth:
+        fields['clipDepth'] = tag.clipDepth
+    if tag.hasBlendMode:
+        fields['blendMode'] = tag.blendMode
+    if tag.hasFilterList:
+        fields['filters'] = tuple(tag.filters)
+    if tag.hasCacheAsBitmap:
+        fields['bitmapCache'] = tag.bitmapCache
+    return fields
+
+class TimelinePlayer(object):
+    """
+    Plays the display list of a timeline (the tags of a SWF or of a
+    DefineSprite) frame by frame.
+
+    Advancing a frame applies the tags of that frame only. display_list
+    is the display list of the current frame, a tuple of DisplayObject
+    sorted by depth. A frame that changes it makes a new tuple, so the
+    display lists of earlier frames stay valid. The tags are not changed.
+
+    A PlaceObject tag that moves a character changes the fields it has
+    and keeps the others. The tags after the last ShowFrame are a frame
+    of their own if they change the display list.
+
+    @param tags: the tags of the timeline.
+    """
+    def __init__(self, tags):
+        self.tags = tags
+        self.frame_count = 0
+        pending = False
+        for tag in tags:
+            if isinstance(tag, TagShowFrame):
+                self.frame_count += 1
+                pending = False
+            elif isinstance(tag, (TagPlaceObject, TagRemoveObject)):
+                pending = True
+        if pending:
+            self.frame_count += 1
+        self.reset()
+
+    def reset(self):
+        """ Go back to before the first frame """
+        self.frame = -1
+        # the frame display_list last changed in
+        self.changed = -1
+        self.display_list = ()
+        self._depths = {}
+        self._next = 0
+
+    def advance(self):
+        """
+        Play the next frame. Returns False (and stays on the last frame)
+        at the end of the timeline.
+        """
+        if self.frame + 1 >= self.frame_count:
+            return False
+        changed = False
+        tags = self.tags
+        i = self._next
+        while i < len(tags) and not isinstance(tags[i], TagShowFrame):
+            changed = self._apply(tags[i]) or changed
+            i += 1
+        self._next = i + 1
+        self.frame += 1
+        if changed:
+            self.changed = self.frame
+            self.display_list = tuple(self._depths[depth] for depth in sorted(self._depths))
+        return True
+
+    def seek(self, frame):
+        """
+        Play up to frame (or the last frame) and return its display list.
+        Seeking backwards starts again at the first frame.
+        """
+        if frame < self.frame:
+            self.reset()
+        while self.frame < frame and self.advance():
+            pass
+        return self.display_list
+
+    def __iter__(self):
+        """ Generator for the display list of each frame, from the next one on """
+        while self.advance():
+            yield self.display_list
+
+    def _apply(self, tag):
+        """ Apply a tag to the display list. Returns whether it changed """
+        if isinstance(tag, TagPlaceObject):
+            current = self._depths.get(tag.depth)
+            fields = _placed_fields(tag)
+            if tag.hasMove and current is not None:
+                self._depths[tag.depth] = current._replace(**fields)
+            elif tag.hasCharacter:
+                self._depths[tag.depth] = _EMPTY._replace(depth=tag.depth, **fields)
+            else:
+                return False
+            return True
+        if isinstance(tag, TagRemoveObject):
+            return self._depths.pop(tag.depth, None) is not None
+        return False
@@ -33,24 +33,22 @@ class ImageUtils(object):
     @classmethod
     def get_image_type(cls, data):
         pos = data.tell()
+        data.seek(0)
+        head = data.read(9)
+        data.seek(pos)
+        return cls.get_image_type_from_bytes(head)
+
+    @classmethod
+    def get_image_type_from_bytes(cls, data):
+        """ Same as get_image_type, for a bytes-like object (e.g. a memoryview) """
         image_type = 0
-        data.seek(0, 2) # moves file pointer to final position
-        if data.tell() > 8:
-            data.seek(0)
-            b0 = ord(data.read(1))
-            b1 = ord(data.read(1))
-            b2 = ord(data.read(1))
-            b3 = ord(data.read(1))
-            b4 = ord(data.read(1))
-            b5 = ord(data.read(1))
-            b6 = ord(data.read(1))
-            b7 = ord(data.read(1))
-            if b0 == 0xff and (b1 == 0xd8 or 1 == 0xd9):
+        if len(data) > 8:
+            b0, b1, b2, b3, b4, b5, b6, b7 = bytearray(data[:8])
+            if b0 == 0xff and (b1 == 0xd8 or b1 == 0xd9):
                 image_type = BitmapType.JPEG
             elif b0 == 0x89 and b1 == 0x50 and b2 == 0x4e and b3 == 0x47 and \
                 b4 == 0x0d and b5 == 0x0a and b6 == 0x1a and b7 == 0x0a:
                 image_type = BitmapType.PNG
             elif b0 == 0x47 and b1 == 0x49 and b2 == 0x46 and b3 == 0x38 and b4 == 0x39 and b5 == 0x61:
                 image_type = BitmapType.GIF89A
-        data.seek(pos)
         return image_type
\ No newline at end of file
@@ -0,0 +1,209 @@
+"""
+Memory benchmark for the data classes.
+
+Parses a font heavy SWF (a generated one with a DefineFont2 of many
+glyphs and a long DefineText, or the SWF given on the command line),
+counts the swf.data objects it produces (including the edges of the
+glyph shapes, which are built on export) and reports, per class, the
+size of a slotted instance against an equivalent instance with a
+__dict__, measured with tracemalloc.
+
+    python test/bench_memory.py [glyphs | file.swf]
+"""
+from __future__ import absolute_import, print_function
+import os
+import struct
+import sys
+import tracemalloc
+from collections import defaultdict
+from io import BytesIO
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from swf.movie import SWF
+from swf.data import _dumb_repr, SWFShape
+from swf.export import DefaultShapeExporter
+
+SAMPLES = 2000
+
+class _Bits(object):
+    """ MSB first bit writer """
+    def __init__(self):
+        self.bits = []
+
+    def ub(self, value, width):
+        self.bits.extend((value >> i) & 1 for i in range(width - 1, -1, -1))
+
+    sb = ub
+
+    def tobytes(self):
+        bits = self.bits + [0] * (-len(self.bits) % 8)
+        return bytes(bytearray(int(''.join(map(str, bits[i:i + 8])), 2)
+                               for i in range(0, len(bits), 8)))
+
+def _rect(xmax, ymax):
+    b = _Bits()
+    b.ub(16, 5)
+    for v in (0, xmax, 0, ymax):
+        b.sb(v, 16)
+    return b.tobytes()
+
+def _tag(tag_type, payload):
+    return struct.pack('<HI', (tag_type << 6) | 0x3f, len(payload)) + payload
+
+def _glyph(i):
+    """ A glyph outline: a move, straight and curved edges, end """
+    b = _Bits()
+    b.ub(1, 4) # fill bits
+    b.ub(0, 4) # line bits
+    b.ub(0, 1)
+    b.ub(0x03, 5) # fill style 0, move to
+    b.ub(12, 5)
+    b.sb(i % 100, 12)
+    b.sb(-(i % 50), 12)
+    b.ub(1, 1)
+    for n in range(12):
+        if n % 3 == 2:
+            b.ub(1, 1); b.ub(0, 1); b.ub(10, 4)
+            for v in (40, 30, -20, 10):
+                b.sb(v, 12)
+        else:
+            b.ub(1, 1); b.ub(1, 1); b.ub(10, 4); b.ub(1, 1)
+            b.sb(50 - n * 7, 12)
+            b.sb(n * 5 - 30, 12)
+    b.ub(0, 6) # end
+    return b.tobytes()
+
+def _define_font2(font_id, glyphs):
+    shapes = [_glyph(i) for i in range(glyphs)]
+    offsets = []
+    offset = 4 * (glyphs + 1)
+    for shape in shapes:
+        offsets.append(offset)
+        offset += len(shape)
+    payload = struct.pack('<HBBB', font_id, 0x80 | 0x08 | 0x04, 0, 5) + b'bench'
+    payload += struct.pack('<H', glyphs)
+    payload += struct.pack('<%dI' % (glyphs + 1), *(offsets + [offset]))
+    payload += b''.join(shapes)
+    payload += struct.pack('<%dH' % glyphs, *range(32, 32 + glyphs))
+    payload += struct.pack('<hhh', 900, 200, 0)
+    payload += struct.pack('<%dh' % glyphs, *[500 + i % 300 for i in range(glyphs)])
+    payload += b''.join(_rect(400, 800) for i in range(glyphs))
+    kerning = [(32 + i, 33 + i, -10) for i in range(glyphs - 1)]
+    payload += struct.pack('<H', len(kerning))
+    payload += b''.join(struct.pack('<HHh', *k) for k in kerning)
+    return _tag(48, payload)
+
+def _define_text(text_id, font_id, glyphs, lines):
+    m = _Bits()
+    m.ub(0, 1); m.ub(0, 1); m.ub(0, 5)
+    payload = struct.pack('<H', text_id) + _rect(20000, 20000) + m.tobytes()
+    payload += struct.pack('<BB', 10, 12)
+    for line in range(lines):
+        if line == 0:
+            payload += struct.pack('<BH', 0x8f, font_id) + b'\x00\x00\x00'
+            payload += struct.pack('<hhH', 0, 0, 240)
+        else:
+            payload += struct.pack('<Bh', 0x82, (line % 100) * 300)
+        b = _Bits()
+        for n in range(60):
+            b.ub((line * 7 + n) % glyphs, 10)
+            b.sb(200 + n % 40, 12)
+        payload += struct.pack('<B', 60) + b.tobytes()
+    return _tag(11, payload + b'\x00')
+
+def font_heavy_swf(glyphs=1000, lines=400):
+    """ Uncompressed SWF bytes with one big font and a text using it """
+    tags = _define_font2(1, glyphs) + _define_text(2, 1, glyphs, lines) + \
+           _tag(1, b'') + b'\x00\x00'
+    body = _rect(11000, 8000) + struct.pack('<HH', 24 << 8, 1) + tags
+    return b'FWS\x0a' + struct.pack('<I', len(body) + 8) + body
+
+def _data_objects(root):
+    """ Returns every swf.data object reachable from root """
+    seen = set()
+    found = []
+    stack = [root]
+    while stack:
+        o = stack.pop()
+        if id(o) in seen:
+            continue
+        seen.add(id(o))
+        if isinstance(o, _dumb_repr):
+            found.append(o)
+            stack.extend(o._attributes().values())
+        elif isinstance(o, (list, tuple)):
+            stack.extend(o)
+        elif isinstance(o, dict):
+            stack.extend(o.values())
+        elif hasattr(o, '__dict__') and not isinstance(o, type):
+            stack.extend(vars(o).values())
+    return found
+
+def _bytes_per_object(make):
+    """ Average traced memory of SAMPLES objects built by make() """
+    keep = [None] * SAMPLES
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    for i in range(SAMPLES):
+        keep[i] = make()
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return used / float(SAMPLES)
+
+def _compare(sample):
+    """ (slotted, dict based) bytes per object of sample's class """
+    cls = type(sample)
+    items = list(sample._attributes().items())
+    plain = type(cls.__name__, (object,), {})
+
+    def make_slotted():
+        o = cls.__new__(cls)
+        for name, value in items:
+            setattr(o, name, value)
+        return o
+
+    def make_plain():
+        o = plain()
+        for name, value in items:
+            setattr(o, name, value)
+        return o
+    return _bytes_per_object(make_slotted), _bytes_per_object(make_plain)
+
+def main():
+    arg = sys.argv[1] if len(sys.argv) > 1 else '1000'
+    if os.path.isfile(arg):
+        raw = open(arg, 'rb').read()
+        label = arg
+    else:
+        raw = font_heavy_swf(int(arg))
+        label = "generated, %s glyphs" % arg
+
+    tracemalloc.start()
+    swf = SWF(BytesIO(raw))
+    parsed = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    objects = _data_objects(swf.tags)
+    for shape in [o for o in objects if isinstance(o, SWFShape)]:
+        shape.export(DefaultShapeExporter())
+    objects = _data_objects(swf.tags)
+
+    by_class = defaultdict(list)
+    for o in objects:
+        by_class[type(o)].append(o)
+
+    print("%s: %d data objects, %.1f KiB traced after parsing" %
+          (label, len(objects), parsed / 1024.0))
+    print("  %-28s %8s %9s %9s %10s" % ("class", "count", "slots", "__dict__", "saved KiB"))
+    total = 0.0
+    for cls, instances in sorted(by_class.items(), key=lambda kv: -len(kv[1])):
+        slotted, plain = _compare(instances[0])
+        saved = (plain - slotted) * len(instances)
+        total += saved
+        print("  %-28s %8d %7.0f B %7.0f B %10.1f" %
+              (cls.__name__, len(instances), slotted, plain, saved / 1024.0))
+    print("  total saved: %.1f KiB" % (total / 1024.0))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""
+Micro benchmark for the bit readers.
+
+Parses the shape tags of test/data/test.swf through the file backed
+SWFStream (byte at a time bit reader) and through SWFMemoryStream
+(64-bit accumulator), then times raw readbits/read_bitfields calls.
+
+    python test/bench_readbits.py [iterations]
+"""
+from __future__ import absolute_import, print_function
+import os
+import struct
+import sys
+import timeit
+from io import BytesIO
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from swf.stream import SWFStream, SWFMemoryStream, SWFDecompressStream
+from swf.tag import TagDefineShape
+
+HERE = os.path.dirname(__file__)
+
+def _load_body(path):
+    """ Returns the uncompressed SWF body (everything after the 8 byte header) """
+    f = open(path, 'rb')
+    header = f.read(8)
+    if header[:3] == b'FWS':
+        return f.read()
+    length = struct.unpack('<I', header[4:8])[0] - 8
+    return SWFDecompressStream(f, lzma=(header[:3] == b'ZWS'), length=length).read()
+
+def _shape_payloads(path):
+    """ Returns the raw payloads of every DefineShape* tag """
+    body = _load_body(path)
+    stream = SWFMemoryStream(body)
+    stream.readRECT()
+    stream.readFIXED8()
+    stream.readUI16()
+    payloads = []
+    while stream.tell() < len(body):
+        header = stream.readtag_header()
+        payload = stream.read(header.content_length)
+        if header.type in (2, 22, 32, 83):
+            payloads.append((header.type, payload))
+        if header.type == 0:
+            break
+    return payloads
+
+def _parse_shapes(payloads, make_stream):
+    for tag_type, payload in payloads:
+        tag = TagDefineShape()
+        version = {2: 1, 22: 2, 32: 3, 83: 4}[tag_type]
+        tag.parse(make_stream(payload), len(payload), version)
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    payloads = _shape_payloads(os.path.join(HERE, 'data', 'test.swf'))
+
+    file_stream = lambda p: SWFStream(BytesIO(p))
+    memory_stream = SWFMemoryStream
+
+    print("shape tags: %d, %d iterations" % (len(payloads), iterations))
+    for name, make_stream in (("SWFStream", file_stream), ("SWFMemoryStream", memory_stream)):
+        t = timeit.timeit(lambda: _parse_shapes(payloads, make_stream), number=iterations)
+        print("  parse shapes  %-16s %8.3f ms/iter" % (name, t * 1000.0 / iterations))
+
+    buf = bytes(bytearray((i * 37 + 11) & 0xff for i in range(4096)))
+    widths = (5, 13, 13, 13, 13) * 256
+    def run_readbits(make_stream):
+        s = make_stream(buf)
+        for w in widths:
+            s.readSB(w)
+    def run_bitfields(make_stream):
+        make_stream(buf).read_bitfields(widths, signed=True)
+    for name, make_stream in (("SWFStream", file_stream), ("SWFMemoryStream", memory_stream)):
+        for label, fn in (("readSB", run_readbits), ("read_bitfields", run_bitfields)):
+            t = timeit.timeit(lambda: fn(make_stream), number=max(1, iterations // 20))
+            print("  %-14s %-16s %8.3f ms/iter" % (label, name, t * 1000.0 / max(1, iterations // 20)))
+
+if __name__ == '__main__':
+    main()
@@ -8,3 +8,982 @@ def test_header():
     swf = SWF(f)
 
     assert swf.header.frame_count == 1
+
+def test_memory_stream_matches_file_stream():
+    from io import BytesIO
+    from swf.stream import SWFStream, SWFMemoryStream
+
+    buf = bytes(bytearray((i * 37 + 11) & 0xff for i in range(256))) + b'name\x00'
+    for s in (SWFStream(BytesIO(buf)), SWFMemoryStream(buf)):
+        values = [s.readUB(5), s.readSB(13), s.readFB(17), s.readUI8(),
+                  s.readUI16(), s.readSI16(), s.readUI32(), s.readEncodedU32(),
+                  s.readRECT().dimensions, s.readMATRIX().to_array(), s.tell()]
+        s.seek(len(buf) - 5)
+        values.append(s.readString())
+        if isinstance(s, SWFMemoryStream):
+            assert values == expected
+        expected = values
+
+def test_read_bitfields():
+    from io import BytesIO
+    from swf.stream import SWFStream, SWFMemoryStream
+
+    buf = bytes(bytearray((i * 91 + 7) & 0xff for i in range(64)))
+    widths = [1, 5, 13, 0, 31, 7, 30, 3, 20, 17, 2, 31, 9]
+    ref = SWFStream(BytesIO(buf))
+    expected = [ref.readSB(w) for w in widths], ref.readUI8(), ref.tell()
+    for s in (SWFStream(BytesIO(buf)), SWFMemoryStream(buf)):
+        assert (s.read_bitfields(widths, signed=True), s.readUI8(), s.tell()) == expected
+
+def _fws_bytes(extra_tags=b'', display_tags=b''):
+    """
+    test.swf as an uncompressed SWF, with extra_tags inserted before End
+    and display_tags before the (only) ShowFrame
+    """
+    import lzma
+    import struct
+    raw = open('./test/data/test.swf', 'rb').read()
+    size = struct.unpack('<I', raw[4:8])[0] - 8
+    body = lzma.decompress(raw[12:17] + struct.pack('<Q', size) + raw[17:],
+                           format=lzma.FORMAT_ALONE)
+    assert body[-4:] == b'\x40\x00\x00\x00'
+    body = body[:-4] + display_tags + body[-4:-2] + extra_tags + body[-2:]
+    return b'FWS' + raw[3:4] + struct.pack('<I', len(body) + 8) + body
+
+def _tag_bytes(tag_type, payload):
+    import struct
+    return struct.pack('<HI', (tag_type << 6) | 0x3f, len(payload)) + payload
+
+def _bit_bytes(fields):
+    """ Pack (value, width) bit fields MSB first, padded to a byte boundary """
+    bits = []
+    for value, width in fields:
+        bits.extend((value >> i) & 1 for i in range(width - 1, -1, -1))
+    bits.extend([0] * (-len(bits) % 8))
+    return bytes(bytearray(int(''.join(map(str, bits[i:i + 8])), 2)
+                           for i in range(0, len(bits), 8)))
+
+def _place_object2(depth, character_id, matrix=None, clip_depth=None, move=False):
+    """
+    PlaceObject2 tag bytes; matrix is ((scaleX, scaleY), (rotateSkew0,
+    rotateSkew1), (translateX, translateY)) with translation in twips.
+    character_id may be None when moving.
+    """
+    import struct
+    flags = (0x02 if character_id is not None else 0) | (0x04 if matrix else 0) | \
+            (0x40 if clip_depth else 0) | (0x01 if move else 0)
+    payload = struct.pack('<BH', flags, depth)
+    if character_id is not None:
+        payload += struct.pack('<H', character_id)
+    if matrix:
+        fields = []
+        for values in matrix[:2]:
+            fields += [(1, 1), (24, 5)] + [(int(round(v * 65536)), 24) for v in values]
+        fields += [(16, 5)] + [(v, 16) for v in matrix[2]]
+        payload += _bit_bytes(fields)
+    if clip_depth:
+        payload += struct.pack('<H', clip_depth)
+    return _tag_bytes(26, payload)
+
+def _display_list_swf_bytes():
+    """
+    test.swf plus a rotated sprite of its shape (id 2), placed rotated,
+    mirrored and unchanged under a mask made of the shape
+    """
+    import struct
+    sprite = _tag_bytes(39, struct.pack('<HH', 2, 1) +
+                        _place_object2(1, 1, ((0.5, 0.5), (0.25, -0.25), (200, -100))) +
+                        b'\x40\x00\x00\x00')
+    display = _place_object2(2, 1, clip_depth=5) + \
+              _place_object2(3, 2, ((1.5, 0.75), (0.3, 0.1), (-401, 37))) + \
+              _place_object2(4, 2, ((-1.25, 2.0), (0, 0), (33, -7))) + \
+              _place_object2(5, 2)
+    return _fws_bytes(display_tags=sprite + display)
+
+def test_streaming_svg_export():
+    from io import BytesIO
+    from swf.export import SVGExporter
+
+    for raw in (_fws_bytes(), _display_list_swf_bytes()):
+        swf = SWF(BytesIO(raw))
+        expected = SVGExporter().export(swf).read()
+        sink = BytesIO()
+        assert SVGExporter().export(swf, sink=sink) is sink
+        assert sink.getvalue() == expected
+    assert b'<mask id="mask1">' in expected and b'fill="#ffffff"' in expected
+
+def test_defs_index():
+    from io import BytesIO
+    from swf.export import SVGExporter, SVG_NS, XLINK_HREF
+
+    exporter = SVGExporter()
+    exporter.export(SWF(BytesIO(_display_list_swf_bytes())))
+    index = exporter.defs_index
+    shape = index.find('c1', 'g')
+    assert shape is exporter.defs.xpath("./svg:g[@id='c1']", namespaces={'svg': SVG_NS})[0]
+    assert index.find('c1', 'image') is None and index.find('c3') is None
+    assert index.find('c2').get('id') == 'c2'
+
+    image = exporter._e.image(id='c9', width='4', height='2')
+    image.set(XLINK_HREF, 'data:image/png;base64,AAAA')
+    index.append(image)
+    exporter.defs.remove(image)
+    index.release([image])
+    stub = index.find('c9', 'image')
+    assert stub is not image and stub.get('width') == '4' and stub.get(XLINK_HREF) is None
+
+def test_geometry_bounds():
+    from io import BytesIO
+    import pytest
+    from swf.export import SVGExporter
+    from swf.tag import TagDefineSprite, TagPlaceObject
+
+    def placed_points(timeline, transform):
+        # the corners of the ShapeBounds of the shapes placed by timeline
+        points = []
+        for tag in timeline.tags:
+            if not isinstance(tag, TagPlaceObject) or not tag.hasCharacter:
+                continue
+            m = tag.matrix if tag.hasMatrix else None
+            def place(p, m=m):
+                if m is not None:
+                    p = (m.scaleX * p[0] + m.rotateSkew1 * p[1] + m.translateX / 20.0,
+                         m.rotateSkew0 * p[0] + m.scaleY * p[1] + m.translateY / 20.0)
+                return transform(p)
+            character = characters[tag.characterId]
+            if isinstance(character, TagDefineSprite):
+                points += placed_points(character, place)
+            else:
+                r = character.shape_bounds
+                points += [place((x / 20.0, y / 20.0))
+                           for x in (r.xmin, r.xmax) for y in (r.ymin, r.ymax)]
+        return points
+
+    for raw in (_fws_bytes(), _display_list_swf_bytes()):
+        swf = SWF(BytesIO(raw))
+        characters = swf.build_dictionary()
+        points = placed_points(swf, lambda p: p)
+        exporter = SVGExporter()
+        exporter.export(swf)
+        bounds = exporter.bounds
+        assert [bounds.minx, bounds.miny, bounds.maxx, bounds.maxy] == pytest.approx(
+            [min(x for x, y in points), min(y for x, y in points),
+             max(x for x, y in points), max(y for x, y in points)])
+
+def test_defs_cache():
+    import copy
+    from io import BytesIO
+    from swf.export import SVGExporter, FrameSVGExporterMixin
+
+    class FrameExporter(FrameSVGExporterMixin, SVGExporter):
+        def export_define_shape(self, tag):
+            self.shapes_exported += 1
+            super(FrameExporter, self).export_define_shape(tag)
+
+    swf = SWF(BytesIO(_display_list_swf_bytes()))
+    for streaming in (False, True):
+        exporter = FrameExporter()
+        exporter.shapes_exported = 0
+        outputs = []
+        for i in range(3):
+            svg = exporter.export(swf, 0, sink=BytesIO() if streaming else None)
+            outputs.append(svg.getvalue())
+        assert exporter.shapes_exported == 1
+        assert outputs[1] == outputs[2] == outputs[0]
+        uncached = FrameExporter(cache_defs=False)
+        uncached.shapes_exported = 0
+        assert uncached.export(swf, 0).getvalue() == outputs[0]
+
+    shape = swf.tags[4]
+    exporter.invalidate(shape.characterId)
+    exporter.export(swf, 0)
+    assert exporter.shapes_exported == 2
+    shape.mark_modified()
+    exporter.export(swf, 0)
+    exporter.export(swf, 0)
+    assert exporter.shapes_exported == 3
+
+    # the defs of a character don't depend on what was exported before it
+    other = copy.copy(shape)
+    other.characterId = 3
+    swf.tags.insert(swf.tags.index(shape), other)
+    expected = FrameExporter(cache_defs=False)
+    expected.shapes_exported = 0
+    assert exporter.export(swf, 0).getvalue() == expected.export(swf, 0).getvalue()
+    assert exporter.shapes_exported == 4
+
+def test_timeline_player():
+    import struct
+    from io import BytesIO
+    from swf.export import SVGExporter, FrameSVGExporterMixin
+    from swf.timeline import TimelinePlayer
+
+    show_frame = b'\x40\x00'
+    frames = [_place_object2(2, 1, ((0.5, 0.5), (0, 0), (100, 0)), clip_depth=3),
+              _place_object2(2, None, ((2.0, 2.0), (0, 0), (0, 50)), move=True),
+              _tag_bytes(28, struct.pack('<H', 1)),
+              b'']
+    swf = SWF(BytesIO(_fws_bytes(display_tags=show_frame.join(frames))))
+    player = TimelinePlayer(swf.tags)
+    display_lists = list(player)
+    assert player.frame_count == len(display_lists) == 4 and player.frame == 3
+    first, moved, removed, same = display_lists
+    assert [(o.depth, o.characterId, o.clipDepth) for o in first] == [(1, 1, None), (2, 1, 3)]
+    assert moved[0] is first[0] and moved[1].matrix.scaleX == 2.0
+    assert moved[1].hasClipDepth and moved[1].clipDepth == 3
+    assert [o.depth for o in removed] == [2] and same is removed
+    assert player.changed == 2 and player.seek(1) == moved
+
+    class FrameExporter(FrameSVGExporterMixin, SVGExporter):
+        pass
+
+    svgs = [svg.read() for svg in FrameExporter().export_frames(swf)]
+    assert svgs == [FrameExporter().export(swf, i).read() for i in range(4)]
+    assert svgs[2] == svgs[3] != svgs[1]
+    assert not any(tag.modified for tag in swf.tags)
+
+def _legacy_connect_edges(sub_path):
+    """ The coord map path assembly SWFShape._clean_edge_map used to do """
+    def equal_point(a, b, tol=0.001):
+        return (a[0] > b[0]-tol and a[0] < b[0]+tol and a[1] > b[1]-tol and a[1] < b[1]+tol)
+    def key(p):
+        return "%0.4f_%0.4f" % (p[0], p[1])
+    coord_map = {}
+    for edge in sub_path:
+        coord_map.setdefault(key(edge.start), []).append(edge)
+    sub_path = list(sub_path)
+    tmp_path = []
+    prev_edge = None
+    while len(sub_path) > 0:
+        idx = 0
+        while idx < len(sub_path):
+            if prev_edge is None or equal_point(prev_edge.to, sub_path[idx].start):
+                edge = sub_path[idx]
+                del sub_path[idx]
+                tmp_path.append(edge)
+                bucket = coord_map[key(edge.start)]
+                if len(bucket) == 1:
+                    del coord_map[key(edge.start)]
+                else:
+                    bucket.remove(edge)
+                prev_edge = edge
+            else:
+                bucket = coord_map.get(key(prev_edge.to))
+                if bucket:
+                    idx = sub_path.index(bucket[0])
+                else:
+                    idx = 0
+                    prev_edge = None
+    return tmp_path
+
+def test_connect_edges():
+    import random
+    from swf.data import SWFShape, SWFStraightEdge, SWFCurvedEdge
+
+    rnd = random.Random(1234)
+    # few distinct points so that edges chain, branch and close; some
+    # are within the point tolerance but round to another 4 decimal key
+    points = [[float(x * 20), float(y * 20)] for x in range(4) for y in range(4)]
+    points += [[p[0] + 0.0004, p[1]] for p in points[:3]] + [[20.00004, 0.0]]
+    shape = SWFShape()
+    for n in list(range(1, 12)) + [40, 200, 1000]:
+        edges = []
+        for i in range(n):
+            start, to = rnd.choice(points), rnd.choice(points)
+            if rnd.random() < 0.3:
+                edges.append(SWFCurvedEdge(start, [0.0, 0.0], to, 0, 1))
+            else:
+                edges.append(SWFStraightEdge(start, to, 0, 1))
+            if rnd.random() < 0.5:
+                # continue from the end of this edge
+                edges.append(SWFStraightEdge(to, rnd.choice(points), 0, 1))
+        expected = [id(e) for e in _legacy_connect_edges(edges)]
+        assert [id(e) for e in shape._connect_edges(edges)] == expected
+
+def test_shape_records():
+    from swf.stream import SWFMemoryStream
+    from swf.data import SWFShape, SWFShapeRecordEnd
+
+    def edge(flags, deltas):
+        return [(1, 1)] + [(f, 1) for f in flags[:1]] + [(4, 4)] + \
+               [(f, 1) for f in flags[1:]] + [(v, 6) for v in deltas]
+    raw = _bit_bytes([(1, 4), (1, 4),
+                      # style change: move to (10, -20), fill style 1
+                      (0, 1), (0x05, 5), (8, 5), (10, 8), (-20, 8), (1, 1)] +
+                     edge((1, 1), (5, -7)) +            # general line
+                     edge((1, 0, 1), (-3,)) +           # vertical line
+                     edge((1, 0, 0), (9,)) +            # horizontal line
+                     edge((0,), (3, 4, -5, 6)) +        # curve
+                     [(0, 1), (0x08, 5), (1, 1)] +      # style change: line style 1
+                     edge((1, 1), (-2, 2)) +
+                     [(0, 1), (0, 5)])
+    records = SWFShape(SWFMemoryStream(raw)).records
+
+    # read the records again, one object per record
+    data = SWFMemoryStream(raw)
+    fill_bits, line_bits = data.readUB(4), data.readUB(4)
+    expected = []
+    while not expected or not isinstance(expected[-1], SWFShapeRecordEnd):
+        if data.readUB(1) == 1:
+            straight = data.readUB(1) == 1
+            num_bits = data.readUB(4) + 2
+            record = data.readSTRAIGHTEDGERECORD(num_bits) if straight \
+                else data.readCURVEDEDGERECORD(num_bits)
+        else:
+            states = data.readUB(5)
+            record = data.readSTYLECHANGERECORD(states, fill_bits, line_bits) \
+                if states else SWFShapeRecordEnd()
+        record.record_id = len(expected)
+        expected.append(record)
+
+    assert len(records) == len(expected) == 8
+    assert [r._attributes() for r in records] == [r._attributes() for r in expected]
+    assert [str(r) for r in records[-3:]] == [str(r) for r in expected[-3:]]
+    assert records[-1].record_id == 7
+
+    # changes to the records are written back before the edges are built
+    shape = SWFShape(SWFMemoryStream(raw))
+    shape.records[1].deltaX += 100
+    shape.records[4].anchor_deltaY = -6
+    shape._create_edge_maps()
+    edges = shape.fill_edge_maps[0][1]
+    assert isinstance(edges[0].start, list) and isinstance(edges[0].to, list)
+    assert [edges[0].start, edges[0].to] == [[10, -20], [115, -27]]
+    assert edges[3].to == [115 + 9 + 3 - 5, -27 - 3 + 4 - 6]
+    assert shape.records[1].record_id == 1 and shape._record_x[1] == 105
+
+def test_image_type():
+    from io import BytesIO
+    from swf.consts import BitmapType
+    from swf.utils import ImageUtils
+
+    # JPEG data in DefineBits tags may start with an EOI marker (FF D9)
+    for head in (b'\xff\xd8\xff\xe0', b'\xff\xd9\xff\xd8'):
+        assert ImageUtils.get_image_type_from_bytes(head + b'\0' * 8) == BitmapType.JPEG
+    png = b'\x89PNG\r\n\x1a\n\0'
+    assert ImageUtils.get_image_type(BytesIO(png)) == BitmapType.PNG
+    assert ImageUtils.get_image_type_from_bytes(memoryview(b'GIF89a\0\0\0')) == BitmapType.GIF89A
+    assert ImageUtils.get_image_type_from_bytes(b'\xff\xd8') == 0
+
+def test_mmap_payloads(tmp_path):
+    import struct
+    from io import BytesIO
+    from swf.tag import TagDefineBinaryData
+
+    blob = bytes(bytearray(range(256))) * 4
+    payload = struct.pack('<HI', 7, 0) + blob
+    tag = struct.pack('<HI', (87 << 6) | 0x3f, len(payload)) + payload
+    path = tmp_path / 'test.swf'
+    path.write_bytes(_fws_bytes(tag))
+
+    swf = SWF()
+    swf.parse_file(str(path), use_mmap=True)
+    binary = [t for t in swf.tags if isinstance(t, TagDefineBinaryData)][0]
+    assert isinstance(binary.payload_view('data'), memoryview)
+    assert binary.characterId == 7
+    assert binary.data == blob
+    assert isinstance(binary.payload_view('data'), memoryview)
+
+    plain = SWF(open(str(path), 'rb'))
+    assert plain.export().read() == swf.export().read()
+
+    # closing copies what is still in the mapping
+    with SWF(open(str(path), 'rb'), use_mmap=True) as mapped:
+        binary = [t for t in mapped.tags if isinstance(t, TagDefineBinaryData)][0]
+        assert isinstance(binary.payload_view('data'), memoryview)
+        out = BytesIO()
+        mapped.save(out, 'none')
+        assert out.getvalue() == path.read_bytes()
+    assert mapped._mmap is None and mapped.data.f.closed
+    assert binary.data == blob and binary.raw_bytes() is None
+
+    # files without a fileno are read as usual
+    swf = SWF(BytesIO(path.read_bytes()), use_mmap=True)
+    assert swf._mmap is None
+    assert [t for t in swf.tags if isinstance(t, TagDefineBinaryData)][0].data == blob
+
+def test_decompress_stream():
+    import lzma
+    import struct
+    import zlib
+    from io import BytesIO
+    from swf.stream import SWFDecompressStream
+
+    fws = _fws_bytes()
+    body = fws[8:]
+    cws = b'CWS' + fws[3:8] + zlib.compress(body)
+    zws = open('./test/data/test.swf', 'rb').read()
+    for raw, is_lzma in ((cws, False), (zws, True)):
+        f = BytesIO(raw)
+        f.seek(8)
+        s = SWFDecompressStream(f, lzma=is_lzma, length=len(body), chunk_size=7)
+        assert s.read(10) == body[:10]
+        s.release(10)
+        assert s.seek(0, 2) == len(body)
+        s.seek(10)
+        assert s.read() == body[10:]
+
+        reference = SWF(BytesIO(fws)).export().read()
+        for streaming in (False, True):
+            assert SWF(BytesIO(raw), streaming=streaming).export().read() == reference
+
+def test_lazy_parse():
+    from swf.tag import LazyTag, TagDefineShape
+
+    swf = SWF(open('./test/data/test.swf', 'rb'), lazy=True)
+    eager = SWF(open('./test/data/test.swf', 'rb'))
+    shape = [t for t in swf.tags if isinstance(t, TagDefineShape)][0]
+    assert isinstance(shape, LazyTag)
+    assert list(swf.build_dictionary().keys()) == [1]
+    assert isinstance(shape, LazyTag)
+
+    expected = eager.build_dictionary()[1]
+    assert shape.shape_bounds.dimensions == expected.shape_bounds.dimensions
+    assert type(shape) is type(expected)
+    assert swf.export().read() == eager.export().read()
+
+def test_lazy_parse_error(monkeypatch):
+    import pytest
+    from swf.tag import LazyTag, TagDefineShape
+
+    swf = SWF(open('./test/data/test.swf', 'rb'), lazy=True)
+    shape = swf.tags[4]
+    parse = TagDefineShape.parse
+    def failing_parse(self, data, length, version=1):
+        self._shape_bounds = data.readRECT()
+        raise IOError("read error")
+    monkeypatch.setattr(TagDefineShape, 'parse', failing_parse)
+    pos = swf._body.tell()
+    with pytest.raises(IOError):
+        shape.shape_bounds
+    # the tag is still lazy and can be parsed once the error is gone
+    assert isinstance(shape, LazyTag) and shape.__dict__['_shape_bounds'] is None
+    assert swf._body.tell() == pos
+    monkeypatch.setattr(TagDefineShape, 'parse', parse)
+    assert shape.shape_bounds.dimensions == \
+        SWF(open('./test/data/test.swf', 'rb')).tags[4].shape_bounds.dimensions
+    assert not isinstance(shape, LazyTag) and not shape.modified
+
+def test_tag_type_filter():
+    from swf.data import SWFRawTag
+    from swf.tag import TagDefineShape, TagEnd, TagPlaceObject2
+
+    f = './test/data/test.swf'
+    swf = SWF(open(f, 'rb'), include_types=(TagDefineShape, 26))
+    assert [type(t) for t in swf.tags] == [TagDefineShape, TagPlaceObject2, TagEnd]
+
+    swf = SWF(open(f, 'rb'), exclude_types=(TagDefineShape,), keep_skipped=True)
+    raw = [t for t in swf.tags if isinstance(t, SWFRawTag)]
+    assert [t.header.type for t in raw] == [TagDefineShape.TYPE]
+    assert len(swf.tags) == len(SWF(open(f, 'rb')).tags)
+
+    # sprites that aren't selected are kept for the selected tags they hold
+    from io import BytesIO
+    from swf.tag import TagDefineSprite
+    raw = _display_list_swf_bytes()
+    swf = SWF(BytesIO(raw), include_types=(TagPlaceObject2,))
+    sprite, = [t for t in swf.tags if isinstance(t, TagDefineSprite)]
+    assert [type(t) for t in sprite.tags] == [TagPlaceObject2, TagEnd]
+    assert len(list(swf.all_tags_of_type(TagPlaceObject2))) == \
+        len(list(SWF(BytesIO(raw)).all_tags_of_type(TagPlaceObject2)))
+    assert bytes(sprite.raw_bytes()) in raw
+    swf = SWF(BytesIO(raw), include_types=(TagDefineShape,), keep_skipped=True)
+    assert not any(isinstance(t, TagDefineSprite) for t in swf.tags)
+    assert len(swf.tags) == len(SWF(BytesIO(raw)).tags)
+
+def test_tag_registry(tmp_path):
+    import struct
+    import pytest
+    from io import BytesIO
+    from swf.data import SWFRawTag
+    from swf.tag import TagFactory, TagDefineShape, SWFUnknownTagException, register_tag
+
+    class HeaderOnlyShape(TagDefineShape):
+        def parse(self, data, length, version=1):
+            self.characterId = data.readUI16()
+
+    original = TagFactory.registry[TagDefineShape.TYPE]
+    register_tag(TagDefineShape.TYPE, HeaderOnlyShape)
+    try:
+        swf = SWF(open('./test/data/test.swf', 'rb'))
+        assert list(swf.build_dictionary().keys()) == [1]
+        assert isinstance(swf.build_dictionary()[1], HeaderOnlyShape)
+    finally:
+        register_tag(TagDefineShape.TYPE, original)
+
+    fws = _fws_bytes(struct.pack('<H', (200 << 6) | 3) + b'abc')
+    assert len(SWF(BytesIO(fws)).tags) == len(SWF(BytesIO(fws), unknown_tags='raw').tags) - 1
+    raw = SWF(BytesIO(fws), unknown_tags='raw').tags[-2]
+    assert isinstance(raw, SWFRawTag) and raw.header.type == 200
+    with pytest.raises(SWFUnknownTagException):
+        SWF(BytesIO(fws), unknown_tags='raise')
+
+def test_tag_index():
+    import struct
+    import zlib
+    from io import BytesIO
+    from swf.export import SVGExporter, SingleShapeSVGExporterMixin
+    from swf.tag import TagDefineShape, TagPlaceObject2, TagShowFrame
+
+    class ShapeExporter(SingleShapeSVGExporterMixin, SVGExporter):
+        pass
+
+    swf = SWF(open('./test/data/test.swf', 'rb'), index_only=True)
+    assert swf.tags == []
+    index = swf.tag_index
+    eager = SWF(open('./test/data/test.swf', 'rb'))
+    assert [e.type for e in index.entries] == [t.type for t in eager.tags]
+    assert [e.characterId for e in index.entries_of_type(TagDefineShape.TYPE)] == [1]
+    place, = index.entries_of_type(TagPlaceObject2.TYPE)
+    show, = index.entries_of_type(TagShowFrame.TYPE)
+    assert place.frame == 0 and index.entries[-1].frame == 1
+    assert show.offset == place.offset + place.length
+
+    shape = swf.load_tag(1)
+    assert isinstance(shape, TagDefineShape) and shape.characterId == 1
+    assert swf.load_tag(1) is shape
+
+    symbol = swf.load_symbol(1)
+    assert symbol.tags == [shape]
+    alone = SWF()
+    alone.tags = [eager.build_dictionary()[1]]
+    expected = ShapeExporter().export(alone, shape=1).read()
+    assert ShapeExporter().export(symbol, shape=1).read() == expected
+
+    # offsets are positions in the uncompressed SWF, compressed or not
+    fws = _fws_bytes(display_tags=_place_object2(2, 1))
+    cws = b'CWS' + fws[3:8] + zlib.compress(fws[8:])
+    offsets = None
+    for raw in (fws, cws):
+        swf = SWF(BytesIO(raw), index_only=True)
+        entries = swf.tag_index.entries
+        assert offsets in (None, [(e.offset, e.content_offset) for e in entries])
+        offsets = [(e.offset, e.content_offset) for e in entries]
+        for e in entries:
+            assert e.offset + e.length == e.content_offset + e.content_length
+            assert struct.unpack('<H', fws[e.offset:e.offset + 2])[0] >> 6 == e.type
+        entry = swf.tag_index.by_character_id[1]
+        shape = swf.load_tag(1)
+        assert shape.characterId == 1 and shape.shape_bounds.xmax == eager.tags[4].shape_bounds.xmax
+        assert bytes(shape.raw_bytes()) == fws[entry.offset:entry.offset + entry.length]
+
+def test_inflate_stream(monkeypatch):
+    import zlib
+    from io import BytesIO
+    import swf.movie
+    from swf.export import SVGExporter
+    from swf.stream import SWFInflateStream
+
+    class SmallChunks(SWFInflateStream):
+        def __init__(self, *args, **kwargs):
+            kwargs['chunk_size'] = 16
+            super(SmallChunks, self).__init__(*args, **kwargs)
+    monkeypatch.setattr(swf.movie, 'SWFInflateStream', SmallChunks)
+
+    fws = _display_list_swf_bytes()
+    cws = b'CWS' + fws[3:8] + zlib.compress(fws[8:])
+    swf = SWF(BytesIO(cws))
+    # the body is parsed as it is inflated, and dropped behind the tags
+    assert isinstance(swf._body, SmallChunks) and swf._body._base > len(fws) - 100
+    assert SVGExporter().export(swf).read() == SVGExporter().export(SWF(BytesIO(fws))).read()
+    # and inflated again to be read again
+    assert bytes(swf.tags[4].raw_bytes()) in fws
+    out = BytesIO()
+    swf.save(out, 'none')
+    assert out.getvalue() == fws
+    assert SWF(BytesIO(cws), streaming=True).tags[4].raw_bytes() is None
+
+def test_tag_index_streaming():
+    import struct
+    import zlib
+    from io import BytesIO
+    from swf.tag import TagDefineSprite
+
+    def sprite(sprite_id, depth):
+        return _tag_bytes(39, struct.pack('<HH', sprite_id, 1) +
+                          _place_object2(depth, 1) + b'\x40\x00\x00\x00')
+
+    fws = _fws_bytes(display_tags=sprite(2, 3) + sprite(3, 4))
+    cws = b'CWS' + fws[3:8] + zlib.compress(fws[8:])
+    for options in (dict(index_only=True), {}):
+        swf = SWF(BytesIO(cws), streaming=True, **options)
+        # loading a sprite doesn't drop the bytes of the ones before it
+        assert swf.load_tag(3).tags[0].depth == 4
+        assert swf.load_tag(2).tags[0].depth == 3
+        symbol = swf.load_symbol(2)
+        assert [t.characterId for t in symbol.tags] == [1, 2]
+        assert isinstance(symbol.tags[1], TagDefineSprite)
+
+def test_parse_cache(tmp_path):
+    import os
+    import zlib
+    import pytest
+    from swf.cache import SWFCache, _MAGIC
+    from swf.stream import SWFMemoryStream
+
+    cache_dir = str(tmp_path / 'cache')
+    f = './test/data/test.swf'
+    reference = SWF(open(f, 'rb')).export().read()
+    first = SWF(open(f, 'rb'), cache_dir=cache_dir)
+    entries = os.listdir(cache_dir)
+    assert len(entries) == 1 and entries[0].endswith(SWFCache.SUFFIX)
+    assert first.export().read() == reference
+
+    cached = SWF(open(f, 'rb'), cache_dir=cache_dir)
+    assert cached._body is None
+    assert cached.header.frame_count == 1
+    assert cached.export().read() == reference
+    # the key is the hash of the bytes, also for memory streams
+    from_memory = SWF()
+    from_memory.parse(SWFMemoryStream(open(f, 'rb').read()), cache_dir=cache_dir)
+    assert from_memory._body is None and from_memory.export().read() == reference
+    with pytest.raises(ValueError):
+        SWF(open(f, 'rb'), cache_dir=cache_dir, lazy=True)
+
+    # entries can only create pyswf tag and data objects
+    path = os.path.join(cache_dir, entries[0])
+    with open(path, 'wb') as entry:
+        entry.write(_MAGIC + zlib.compress(b'\x10\x00\x06\x02os\x06\x06system\x0a\x00'))
+    assert SWFCache(cache_dir).get(entries[0][:-len(SWFCache.SUFFIX)]) is None
+    assert not os.path.exists(path)
+    SWF(open(f, 'rb'), cache_dir=cache_dir)
+
+    # other parse options get their own entry, the oldest is evicted
+    cache = SWFCache(cache_dir, max_size=os.path.getsize(os.path.join(cache_dir, entries[0])))
+    os.utime(os.path.join(cache_dir, entries[0]), (0, 0))
+    SWF(open(f, 'rb'), cache_dir=cache, unknown_tags='raw')
+    assert len(os.listdir(cache_dir)) == 1 and os.listdir(cache_dir) != entries
+
+def test_parallel_parse():
+    from concurrent.futures import ProcessPoolExecutor
+    from swf.tag import Tag, TagDefineShape
+
+    f = './test/data/test.swf'
+    swf = SWF(open(f, 'rb'), workers=2)
+    eager = SWF(open(f, 'rb'))
+    assert [type(t) for t in swf.tags] == [type(t) for t in eager.tags]
+    assert isinstance(swf.build_dictionary()[1], TagDefineShape)
+    assert swf.export().read() == eager.export().read()
+
+    # a pool of the caller is used as it is, and kept open
+    with ProcessPoolExecutor(max_workers=2) as executor:
+        submit = executor.submit
+        submitted = []
+        executor.submit = lambda *args: submitted.append(args[1]) or submit(*args)
+        for i in range(2):
+            shared = SWF(open(f, 'rb'), executor=executor)
+            assert [type(t) for t in shared.tags] == [type(t) for t in eager.tags]
+            assert all(isinstance(t, Tag) for t in shared.tags)
+            assert shared.tags[4].raw_bytes() is not None
+        assert submitted == [TagDefineShape.TYPE] * 2
+
+def test_decode_lossless(monkeypatch):
+    import random
+    import swf.bitmap
+    from swf.bitmap import decode_lossless
+    from swf.consts import BitmapFormat
+
+    def reference(data, fmt, width, height, colors, alpha):
+        data = bytearray(data)
+        out = bytearray()
+        if fmt == BitmapFormat.BIT_8:
+            size = 4 if alpha else 3
+            table = [bytearray(data[i * size:i * size + size]) + (b'' if alpha else b'\xff')
+                     for i in range(colors + 1)]
+            pitch = (width + 3) & ~3
+            for y in range(height):
+                for x in range(width):
+                    out += table[data[(colors + 1) * size + y * pitch + x]]
+        elif fmt == BitmapFormat.BIT_15:
+            pitch = (width * 2 + 3) & ~3
+            for y in range(height):
+                for x in range(width):
+                    v = data[y * pitch + x * 2] << 8 | data[y * pitch + x * 2 + 1]
+                    out += bytearray([(c << 3) | (c >> 2) for c in ((v >> 10) & 31, (v >> 5) & 31, v & 31)] + [255])
+        else:
+            for i in range(width * height):
+                a, r, g, b = data[i * 4:i * 4 + 4]
+                out += bytearray((r, g, b, a if alpha else 255))
+        return bytes(out)
+
+    rnd = random.Random(7)
+    for backend in (swf.bitmap.numpy, None):
+        monkeypatch.setattr(swf.bitmap, 'numpy', backend)
+        for fmt in (BitmapFormat.BIT_8, BitmapFormat.BIT_15, BitmapFormat.BIT_24):
+            for alpha in (False, True):
+                width, height, colors = rnd.randint(1, 9), rnd.randint(1, 5), 16
+                data = bytes(bytearray(rnd.randrange(256) for i in range(width * height * 4 + 16)))
+                if fmt == BitmapFormat.BIT_8:
+                    colormap = bytes(bytearray(rnd.randrange(256) for i in range((colors + 1) * (4 if alpha else 3))))
+                    data = colormap + bytes(bytearray(rnd.randrange(colors + 1) for i in range(height * 12)))
+                expected = reference(data, fmt, width, height, colors, alpha)
+                assert decode_lossless(data, fmt, width, height, colors, alpha) == expected
+
+def test_deferred_lossless_decoding():
+    import struct
+    import zlib
+    from concurrent.futures import ThreadPoolExecutor
+    from io import BytesIO
+    from PIL import Image
+    from swf.tag import TagDefineBitsLossless2
+
+    argb = b'\xff\x10\x20\x30\x80\x40\x50\x60' * 2
+    payload = struct.pack('<HBHH', 9, 5, 2, 2) + zlib.compress(argb)
+    tag = struct.pack('<HI', (36 << 6) | 0x3f, len(payload)) + payload
+    swf = SWF(BytesIO(_fws_bytes(tag)))
+    bitmap = swf.build_dictionary()[9]
+    assert isinstance(bitmap, TagDefineBitsLossless2)
+    assert bitmap._image_buffer is None and bitmap._bitmap_data is None
+
+    with ThreadPoolExecutor(2) as executor:
+        assert swf.decode_bitmaps(executor=executor) == [bitmap]
+    expected = b'\x10\x20\x30\xff\x40\x50\x60\x80' * 2
+    assert bitmap._image_buffer == expected and bitmap._bitmap_data is None
+    assert Image.open(bitmap.bitmapData).tobytes() == expected
+    assert b'id="c9"' in swf.export().read()
+
+def test_jpeg3_alpha_merge():
+    import struct
+    import zlib
+    from io import BytesIO
+    from PIL import Image
+    from swf.tag import TagDefineBitsJPEG3
+
+    jpeg = BytesIO()
+    Image.new("RGB", (3, 2), (200, 100, 50)).save(jpeg, "JPEG")
+    jpeg = jpeg.getvalue()
+    alpha = b'\x00\x40\x80\xc0\xff\x10'
+    payload = struct.pack('<HI', 4, len(jpeg)) + jpeg + zlib.compress(alpha)
+    tag = struct.pack('<HI', (35 << 6) | 0x3f, len(payload)) + payload
+    bits = SWF(BytesIO(_fws_bytes(tag))).build_dictionary()[4]
+    assert isinstance(bits, TagDefineBitsJPEG3)
+
+    image = bits.to_rgba_image()
+    rgb = bytearray(Image.open(BytesIO(jpeg)).convert("RGB").tobytes())
+    expected = b''.join(struct.pack("BBBB", rgb[i * 3], rgb[i * 3 + 1], rgb[i * 3 + 2], a)
+                        for i, a in enumerate(bytearray(alpha)))
+    assert image.mode == "RGBA" and image.tobytes() == expected
+
+def test_data_slots():
+    from swf.data import SWFTextRecord, SWFMatrix, SWFMorphFillStyle
+
+    record = SWFTextRecord()
+    assert not hasattr(record, '__dict__')
+    assert record.fontId == -1 and record.get_dependencies() == set()
+    assert "'fontId': -1" in repr(record)
+    assert SWFMorphFillStyle(None).get_dependencies() == set()
+    matrix = SWFMatrix(None)
+    assert repr(matrix).startswith("<SWFMatrix {'scaleX': 1.0, 'scaleY': 1.0,")
+
+def test_bulk_readers():
+    import struct
+    from io import BytesIO
+    from swf.stream import SWFStream, SWFMemoryStream
+
+    buf = bytes(bytearray((i * 53 + 29) & 0xff for i in range(2048)))
+    widths = [3] + [10, 12, 0, 31, 1] * 300
+    ref = SWFStream(BytesIO(buf))
+    expected = [ref.readSB(w) for w in widths], ref.readUI8(), ref.tell()
+    for s in (SWFStream(BytesIO(buf)), SWFMemoryStream(buf)):
+        assert (s.read_bitfields(widths, signed=True), s.readUI8(), s.tell()) == expected
+
+    for s in (SWFStream(BytesIO(buf)), SWFMemoryStream(buf)):
+        s.readUB(3)
+        assert list(s.read_array('h', 20)) == list(struct.unpack_from('<20h', buf, 1))
+        assert list(s.read_array('I', 5)) == list(struct.unpack_from('<5I', buf, 41))
+        kerning = s.readKERNINGRECORDs(4, True)
+        assert [(k.code1, k.code2, k.adjustment) for k in kerning] == \
+            [struct.unpack_from('<HHh', buf, 61 + 6 * i) for i in range(4)]
+        entries = s.readGLYPHENTRYs(30, 9, 7)
+        ref = SWFStream(BytesIO(buf))
+        ref.seek(85)
+        assert [(g.index, g.advance) for g in entries] == \
+            [(ref.readUB(9), ref.readSB(7)) for i in range(30)]
+
+def test_writer():
+    from io import BytesIO
+    from swf.data import SWFRectangle, SWFMatrix, SWFColorTransformWithAlpha
+    from swf.stream import SWFStream, SWFWriter
+
+    rect = SWFRectangle()
+    rect.xmin, rect.xmax, rect.ymin, rect.ymax = -20, 11000, 0, 8000
+    matrix = SWFMatrix(None)
+    matrix.scaleX, matrix.rotateSkew1, matrix.translateX = 1.5, -0.25, -401
+    cxform = SWFColorTransformWithAlpha()
+    cxform.hasAddTerms, cxform.hasMultTerms = True, False
+    cxform.rAdd, cxform.gAdd, cxform.bAdd, cxform.aAdd = -255, 0, 17, 255
+
+    w = SWFWriter()
+    w.writeUB(3, 5)
+    w.writeSB(7, -33)
+    w.writeFB(20, -1.5)
+    w.writeRECT(rect)
+    w.writeMATRIX(matrix)
+    w.writeCXFORMWITHALPHA(cxform)
+    w.writeEncodedU32(0x12345678)
+    w.writeString(u'sc\xe8ne')
+    w.writeRGBA(0x80ff0010)
+    s = SWFStream(BytesIO(w.getvalue()))
+    assert (s.readUB(3), s.readSB(7), s.readFB(20)) == (5, -33, -1.5)
+    r = s.readRECT()
+    assert (r.xmin, r.xmax, r.ymin, r.ymax) == (-20, 11000, 0, 8000)
+    assert s.readMATRIX().to_array() == [1.5, 0.0, -0.25, 1.0, -401, 0]
+    c = s.readCXFORMWITHALPHA()
+    assert (c.hasMultTerms, c.rAdd, c.gAdd, c.bAdd, c.aAdd) == (False, -255, 0, 17, 255)
+    assert s.readEncodedU32() == 0x12345678
+    assert s.readString() == u'sc\xe8ne'
+    assert s.readRGBA() == 0x80ff0010
+    assert s.read() == b''
+
+def test_save():
+    import pytest
+    from io import BytesIO
+    from swf.movie import SWF
+    from swf.tag import TagDefineSprite, TagSetBackgroundColor
+
+    fws = _fws_bytes()
+    out = BytesIO()
+    SWF(open('./test/data/test.swf', 'rb')).save(out, compression='none')
+    assert out.getvalue() == fws
+    for compression, signature in (('zlib', b'CWS'), ('lzma', b'ZWS')):
+        out = BytesIO()
+        SWF(BytesIO(fws), lazy=True).save(out, compression)
+        assert out.getvalue()[:3] == signature
+        again = BytesIO()
+        SWF(BytesIO(out.getvalue())).save(again, 'none')
+        assert again.getvalue() == fws
+
+    # modified tags (here one inside a sprite) are encoded, the others copied
+    raw = _display_list_swf_bytes()
+    swf = SWF(BytesIO(raw))
+    background = [t for t in swf.tags if isinstance(t, TagSetBackgroundColor)][0]
+    background.color = 0xff123456
+    sprite = [t for t in swf.tags if isinstance(t, TagDefineSprite)][0]
+    sprite.tags[0].matrix.translateX = -1234
+    sprite.tags[0].mark_modified()
+    out = BytesIO()
+    swf.save(out)
+    saved = SWF(BytesIO(out.getvalue()))
+    assert [t.name for t in saved.all_tags_of_type(object)] == \
+        [t.name for t in swf.all_tags_of_type(object)]
+    assert [t for t in saved.tags if isinstance(t, TagSetBackgroundColor)][0].color == 0xff123456
+    placed = [t for t in saved.tags if isinstance(t, TagDefineSprite)][0].tags[0]
+    assert placed.matrix.to_array() == [0.5, 0.25, -0.25, 0.5, -1234, -100]
+    shape = swf.tags[4]
+    assert shape.name == 'DefineShape'
+    assert bytes(shape.raw_bytes()) in out.getvalue()
+
+    # tags without an encoder can only be written unmodified
+    shape.mark_modified()
+    out = BytesIO()
+    with pytest.raises(NotImplementedError) as error:
+        swf.save(out)
+    assert 'DefineShape' in str(error.value) and out.getvalue() == b''
+
+def test_raw_bytes(tmp_path):
+    from io import BytesIO
+    from swf.movie import SWF
+    from swf.tag import TagDefineSprite
+
+    raw = _display_list_swf_bytes()
+    path = str(tmp_path / 'display.swf')
+    with open(path, 'wb') as f:
+        f.write(raw)
+    for swf, in_memory in ((SWF(BytesIO(raw)), False),
+                           (SWF(open(path, 'rb'), use_mmap=True), True),
+                           (SWF(open(path, 'rb'), lazy=True), False)):
+        tags = list(swf.all_tags_of_type(object))
+        assert not any(t.modified for t in tags)
+        assert b''.join(bytes(t.raw_bytes()) for t in swf.tags) == raw[raw.index(b'\x44\x11'):]
+        sprite = [t for t in swf.tags if isinstance(t, TagDefineSprite)][0]
+        assert bytes(sprite.raw_bytes(header=False))[:4] == b'\x02\x00\x01\x00'
+        assert isinstance(swf.tags[0].raw_bytes(), memoryview) == in_memory
+
+        # setting an attribute flips the tag (and the sprite holding it)
+        sprite.tags[0].depth = 7
+        assert sprite.tags[0].modified and sprite.modified
+        assert sprite.tags[0].raw_bytes() is None
+        assert [t for t in tags if t.modified] == [sprite, sprite.tags[0]]
+        swf.tags[0].mark_modified()
+        assert swf.tags[0].modified
+        sprite.tags.append(sprite.tags.pop())
+        out = BytesIO()
+        swf.save(out)
+        saved = SWF(BytesIO(out.getvalue()))
+        assert [t for t in saved.tags if isinstance(t, TagDefineSprite)][0].tags[0].depth == 7
+
+    # changes in place are only found by save when asked to look
+    swf = SWF(BytesIO(raw))
+    sprite = [t for t in swf.tags if isinstance(t, TagDefineSprite)][0]
+    sprite.tags[0].matrix.translateX = 999
+    assert not sprite.tags[0].modified and sprite.tags[0].changed_in_place()
+    unchecked = BytesIO()
+    swf.save(unchecked, 'none')
+    assert unchecked.getvalue() == raw
+    out = BytesIO()
+    swf.save(out, 'none', check=True)
+    assert sprite.modified and not swf.tags[0].modified
+    saved = SWF(BytesIO(out.getvalue()))
+    assert [t for t in saved.tags if isinstance(t, TagDefineSprite)][0].tags[0].matrix.translateX == 999
+
+    # a streamed body is gone after parsing
+    streamed = SWF(open('./test/data/test.swf', 'rb'), streaming=True)
+    assert all(t.modified for t in streamed.tags)
+
+def test_asset_fingerprints(tmp_path, monkeypatch):
+    from io import BytesIO
+    from swf.movie import SWF
+    from swf.assets import SWFAssetIndex
+
+    shape = SWF(open('./test/data/test.swf', 'rb')).tags[4]
+    content = bytes(shape.raw_bytes(header=False))
+    # the shape again as character 9, and a variant of it as 10
+    copies = _tag_bytes(2, b'\x09\x00' + content[2:]) + \
+             _tag_bytes(2, b'\x0a\x00' + content[2:-1] + b'\x01')
+    swf = SWF(BytesIO(_fws_bytes(extra_tags=copies)))
+    fingerprints = swf.asset_fingerprints()
+    assert fingerprints[1] == fingerprints[9] != fingerprints[10]
+    # the sprite depends on shape 1
+    display = SWF(BytesIO(_display_list_swf_bytes()))
+    assert display.asset_fingerprints()[1] == fingerprints[1]
+    variant = _display_list_swf_bytes().replace(content, content[:-1] + b'\x01')
+    changed = SWF(BytesIO(variant)).asset_fingerprints()
+    assert changed[1] == fingerprints[10]
+    assert changed[2] != display.asset_fingerprints()[2]
+
+    # a sprite of the shape, with both renumbered
+    import struct
+    def sprite(sprite_id, shape_id):
+        return _tag_bytes(39, struct.pack('<HH', sprite_id, 1) +
+                          _place_object2(1, shape_id, ((0.5, 0.5), (0, 0), (20, 0))) +
+                          b'\x40\x00\x00\x00')
+    first = SWF(BytesIO(_fws_bytes(extra_tags=sprite(5, 1)))).asset_fingerprints()
+    renumbered = SWF(BytesIO(_fws_bytes(extra_tags=copies + sprite(6, 9) + sprite(7, 10))),
+                     lazy=True).asset_fingerprints()
+    assert first[5] == renumbered[6] != renumbered[7]
+
+    # buttons too, whether or not get_dependencies knows their records
+    from swf.tag import DefinitionTag, TagDefineButton
+    def button(button_id, shape_id):
+        return _tag_bytes(7, struct.pack('<HBHHB', button_id, 0x01, shape_id, 1, 0) +
+                          b'\x00\x00')
+    def check_buttons():
+        first = SWF(BytesIO(_fws_bytes(extra_tags=button(5, 1)))).asset_fingerprints()
+        renumbered = SWF(BytesIO(_fws_bytes(extra_tags=copies + button(6, 9) +
+                                            button(7, 10)))).asset_fingerprints()
+        assert first[5] == renumbered[6] != renumbered[7]
+    check_buttons()
+    monkeypatch.setattr(TagDefineButton, 'get_dependencies', DefinitionTag.get_dependencies)
+    check_buttons()
+
+    path = str(tmp_path / 'assets.db')
+    with SWFAssetIndex(path) as index:
+        assert index.add('copies.swf', swf) == {1: fingerprints[1], 10: fingerprints[10]}
+        assert index.add('display.swf', display) == {2: display.asset_fingerprints()[2]}
+        assert len(index) == 3
+    with SWFAssetIndex(path) as index:
+        assert fingerprints[10] in index
+        assert index.lookup(fingerprints[1]) == [('copies.swf', 1), ('copies.swf', 9), ('display.swf', 1)]
+        assert [f for f, where in index.duplicates()] == [fingerprints[1]]
+        index.remove('copies.swf')
+        assert fingerprints[10] not in index